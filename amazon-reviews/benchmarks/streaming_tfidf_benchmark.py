@@ -0,0 +1,117 @@
+"""
+Benchmark: in-memory TfidfVectorizer vs out-of-core StreamingTfidfVectorizer
+Writes a synthetic corpus of processed reviews to CSV, then computes the
+notebook's feature importance ranking both ways in separate processes and
+reports throughput and peak resident memory (ru_maxrss) of each.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+VOCABULARY_SIZE = 20000
+
+
+def make_corpus_csv(path, n_documents, seed=42, min_words=10, max_words=80):
+    """Write synthetic processed review texts with a Zipf-like vocabulary"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(VOCABULARY_SIZE)])
+    weights = 1.0 / np.arange(1, VOCABULARY_SIZE + 1)
+    weights /= weights.sum()
+    lengths = rng.integers(min_words, max_words, size=n_documents)
+    texts = [" ".join(rng.choice(vocabulary, size=length, p=weights)) for length in lengths]
+    pd.DataFrame({'processed_text': texts}).to_csv(path, index=False)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_in_memory(csv_path, chunksize):
+    """The notebook's path: load every text, then fit_transform at once"""
+    import numpy as np
+    import pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    texts = pd.read_csv(csv_path)['processed_text'].fillna('').tolist()
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+    tfidf_matrix = vectorizer.fit_transform(texts)
+    importance = tfidf_matrix.sum(axis=0).A1
+    top = np.argsort(-importance)[:15]
+    return len(texts), vectorizer.get_feature_names_out()[top].tolist()
+
+
+def run_streaming(csv_path, chunksize):
+    from streaming_tfidf import TfidfStore, iter_csv_chunks
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = TfidfStore(store_dir)
+        for texts in iter_csv_chunks(csv_path, 'processed_text', chunksize):
+            store.append(texts)
+        ranking = store.feature_importance(top_k=15)
+        return store.n_docs, ranking['feature'].tolist()
+
+
+MODES = {'in-memory': run_in_memory, 'streaming': run_streaming}
+
+
+def worker(mode, csv_path, chunksize):
+    start = time.perf_counter()
+    n_docs, top_features = MODES[mode](csv_path, chunksize)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'docs': n_docs,
+        'seconds': elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+        'top_features': top_features
+    }))
+
+
+def measure(mode, csv_path, chunksize):
+    """Run one mode in a fresh process so peak RSS is not shared"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', mode, csv_path, '--chunksize', str(chunksize)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "CSV"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], args.worker[1], args.chunksize)
+        return
+
+    print(f"{'docs':>8} | {'mode':>9} | {'throughput':>13} | {'peak RSS':>10} | top-15 overlap")
+    print("-" * 66)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            csv_path = os.path.join(tmp, f"corpus-{size}.csv")
+            make_corpus_csv(csv_path, size)
+            results = {mode: measure(mode, csv_path, args.chunksize) for mode in MODES}
+            reference = set(results['in-memory']['top_features'])
+            for mode, result in results.items():
+                overlap = len(reference.intersection(result['top_features']))
+                print(f"{size:>8} | {mode:>9} | {size / result['seconds']:>9,.0f} d/s | "
+                      f"{result['peak_rss_mb']:>7,.0f} MB | {overlap}/15")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Parallel, cached preprocessing pipeline for the Amazon Reviews Laboratory
+
+This module packages the preprocessing steps from `amazon_reviews_analysis.ipynb`
+(cleaning, tokenization, stopword removal and lemmatization) so they can run on
+large review datasets:
+
+- Reviews are processed in chunks on a multiprocessing pool that uses all cores.
+- NLTK resources are loaded once per worker process, not once per review.
+- Lemmatization is memoized per token, since review vocabularies repeat heavily.
+- Processed tokens are cached on disk as Parquet, keyed by a hash of the review
+  text, so re-runs only process new or changed reviews.
+
+Usage:
+    from review_pipeline import preprocess_dataframe
+    df['processed_tokens'] = preprocess_dataframe(df, nltk_data_dir='nltk_data')
+"""
+
+import hashlib
+import os
+import re
+import time
+from functools import lru_cache
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+import pandas as pd
+
+# Bump when the preprocessing logic changes so cached tokens are recomputed
+PIPELINE_VERSION = "1"
+
+DEFAULT_CACHE_DIR = os.path.join("data", "token_cache")
+DEFAULT_CHUNK_SIZE = 1000
+
+_NON_LETTERS = re.compile(r'[^a-zA-Z\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+# Per-process NLTK state, populated by _init_nltk()
+_STOP_WORDS = None
+_LEMMATIZER = None
+_WORD_TOKENIZE = None
+
+
+def _init_nltk(nltk_data_dir=None):
+    """Load NLTK resources once for the current process"""
+    global _STOP_WORDS, _LEMMATIZER, _WORD_TOKENIZE
+
+    import nltk
+    if nltk_data_dir and nltk_data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, nltk_data_dir)
+
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    from nltk.tokenize import word_tokenize
+
+    _STOP_WORDS = frozenset(stopwords.words('english'))
+    _LEMMATIZER = WordNetLemmatizer()
+    _WORD_TOKENIZE = word_tokenize
+    _lemmatize.cache_clear()
+
+
+@lru_cache(maxsize=200000)
+def _lemmatize(token):
+    """Memoized WordNet lemmatization of a single token"""
+    return _LEMMATIZER.lemmatize(token)
+
+
+def clean_text(text):
+    """
+    Clean text by removing special characters, converting to lowercase,
+    and removing extra whitespace.
+    """
+    text = text.lower()
+    text = _NON_LETTERS.sub('', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def preprocess_text(text):
+    """
+    Complete preprocessing pipeline: clean, tokenize, remove stopwords,
+    lemmatize and drop tokens of two characters or fewer.
+
+    Produces the same tokens as the notebook's preprocess_text.
+    """
+    if _LEMMATIZER is None:
+        _init_nltk()
+
+    # clean_text leaves only letters and single spaces, so there is nothing
+    # for the sentence splitter to do; preserve_line skips it
+    tokens = _WORD_TOKENIZE(clean_text(text), preserve_line=True)
+    stop_words = _STOP_WORDS
+    lemmas = [_lemmatize(token) for token in tokens if token not in stop_words]
+    return [token for token in lemmas if len(token) > 2]
+
+
+def _preprocess_chunk(texts):
+    return [preprocess_text(text) for text in texts]
+
+
+def _chunks(items, chunk_size):
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def preprocess_texts(texts, processes=None, chunk_size=DEFAULT_CHUNK_SIZE, nltk_data_dir=None):
+    """
+    Preprocess a list of texts, in order, on a pool of worker processes.
+
+    processes defaults to the number of CPU cores; with processes=1 (or fewer
+    texts than one chunk) everything runs in the current process.
+    """
+    texts = list(texts)
+    processes = processes or cpu_count()
+
+    if processes <= 1 or len(texts) <= chunk_size:
+        _init_nltk(nltk_data_dir)
+        return _preprocess_chunk(texts)
+
+    results = []
+    with Pool(processes, initializer=_init_nltk, initargs=(nltk_data_dir,)) as pool:
+        for chunk_tokens in pool.imap(_preprocess_chunk, _chunks(texts, chunk_size)):
+            results.extend(chunk_tokens)
+    return results
+
+
+def content_hash(text):
+    """Cache key for a review: hash of the pipeline version and the raw text"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(PIPELINE_VERSION.encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class TokenCache:
+    """
+    On-disk cache of processed tokens keyed by content hash.
+
+    The cache is a directory of Parquet part files with two columns,
+    content_hash and tokens. New results are written as a new part file, so
+    saving never rewrites what is already cached.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._tokens = {}
+        self._pending = {}
+        self.load()
+
+    def load(self):
+        self._tokens = {}
+        if not os.path.isdir(self.cache_dir):
+            return
+        parts = sorted(f for f in os.listdir(self.cache_dir) if f.endswith('.parquet'))
+        for part in parts:
+            table = pd.read_parquet(os.path.join(self.cache_dir, part))
+            for key, tokens in zip(table['content_hash'], table['tokens']):
+                self._tokens[key] = list(tokens)
+
+    def __contains__(self, key):
+        return key in self._tokens or key in self._pending
+
+    def __len__(self):
+        return len(self._tokens) + len(self._pending)
+
+    def get(self, key):
+        tokens = self._pending.get(key)
+        return tokens if tokens is not None else self._tokens.get(key)
+
+    def put(self, key, tokens):
+        if key not in self._tokens:
+            self._pending[key] = tokens
+
+    def save(self):
+        """Write pending entries as a new Parquet part file"""
+        if not self._pending:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        part = pd.DataFrame({
+            'content_hash': list(self._pending.keys()),
+            'tokens': list(self._pending.values())
+        })
+        name = f"part-{time.time_ns()}-{os.getpid()}.parquet"
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = path + '.tmp'
+        part.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self._tokens.update(self._pending)
+        self._pending = {}
+        return path
+
+
+def preprocess_dataframe(df, text_column='review_text', cache_dir=DEFAULT_CACHE_DIR,
+                         processes=None, chunk_size=DEFAULT_CHUNK_SIZE, nltk_data_dir=None,
+                         verbose=True):
+    """
+    Return a Series of processed token lists aligned with df.index.
+
+    Only reviews whose content hash is not already cached are processed;
+    duplicates within df are processed once. Pass cache_dir=None to disable
+    the on-disk cache.
+    """
+    texts = df[text_column].fillna('').astype(str)
+    keys = [content_hash(text) for text in texts]
+    cache = TokenCache(cache_dir) if cache_dir else None
+
+    unique = dict(zip(keys, texts))
+    todo = {key: text for key, text in unique.items() if cache is None or key not in cache}
+
+    if verbose:
+        print(f"Reviews: {len(keys)} | unique: {len(unique)} | "
+              f"cached: {len(unique) - len(todo)} | to process: {len(todo)}")
+
+    processed = dict(zip(todo.keys(), preprocess_texts(list(todo.values()), processes,
+                                                       chunk_size, nltk_data_dir)))
+
+    if cache is not None:
+        for key, tokens in processed.items():
+            cache.put(key, tokens)
+        cache.save()
+        lookup = cache.get
+    else:
+        lookup = processed.get
+
+    return pd.Series([lookup(key) for key in keys], index=df.index, name='processed_tokens')
+
+
+def sentiment_word_counts(token_lists, positive_words, negative_words):
+    """
+    Count positive and negative words for every review in a single pass.
+
+    Returns two integer arrays (positive, negative) aligned with token_lists.
+    """
+    positive = frozenset(positive_words)
+    negative = frozenset(negative_words)
+    n = len(token_lists)
+    positive_counts = np.zeros(n, dtype=np.int32)
+    negative_counts = np.zeros(n, dtype=np.int32)
+
+    for i, tokens in enumerate(token_lists):
+        pos = neg = 0
+        for token in tokens:
+            if token in positive:
+                pos += 1
+            if token in negative:
+                neg += 1
+        positive_counts[i] = pos
+        negative_counts[i] = neg
+
+    return positive_counts, negative_counts
@@ -0,0 +1,267 @@
+"""
+Out-of-core TF-IDF for the Amazon Reviews Laboratory
+
+The notebook builds its TF-IDF matrix with `TfidfVectorizer.fit_transform` over
+the full in-memory list of processed texts, which does not scale past RAM and
+has to be refit from scratch whenever new reviews arrive. This module vectorizes
+reviews chunk by chunk instead:
+
+- Terms are hashed into a fixed number of columns (the hashing trick), so no
+  vocabulary has to be fitted up front.
+- Document frequencies are maintained incrementally with `partial_fit`, so new
+  chunks update the IDF weights without touching earlier data.
+- Raw term counts are persisted per chunk as CSR arrays (`.npy`), which can be
+  memory-mapped back; TF-IDF weights are applied with the current IDF at read time.
+- Feature importance (summed TF-IDF per feature, as in the notebook) is
+  accumulated one stored chunk at a time.
+
+Usage:
+    from streaming_tfidf import TfidfStore, iter_csv_chunks
+
+    store = TfidfStore('data/tfidf_store')
+    for texts in iter_csv_chunks('data/processed_amazon_reviews.csv', 'processed_text'):
+        store.append(texts)
+    print(store.feature_importance(top_k=15))
+"""
+
+import json
+import os
+import pickle
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+DEFAULT_N_FEATURES = 2 ** 20
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class StreamingTfidfVectorizer:
+    """
+    Hashing TF-IDF vectorizer with an incrementally maintained document frequency.
+
+    Tokenization matches TfidfVectorizer's defaults (lowercase, word n-grams
+    with token_pattern r"(?u)\\b\\w\\w+\\b"), and the weighting matches
+    TfidfTransformer with smooth_idf=True and norm='l2'. Apart from hash
+    collisions, the result is the same as refitting TfidfVectorizer on all the
+    documents seen so far.
+    """
+
+    def __init__(self, n_features=DEFAULT_N_FEATURES, ngram_range=(1, 1), lowercase=True,
+                 stop_words=None, norm='l2', smooth_idf=True, sublinear_tf=False, track_terms=True):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.norm = norm
+        self.smooth_idf = smooth_idf
+        self.sublinear_tf = sublinear_tf
+        self.track_terms = track_terms
+
+        self._analyzer = HashingVectorizer(
+            n_features=n_features, ngram_range=self.ngram_range, lowercase=lowercase,
+            stop_words=stop_words, alternate_sign=False, norm=None
+        ).build_analyzer()
+        self._hasher = FeatureHasher(n_features=n_features, input_type='string', alternate_sign=False)
+
+        self.n_docs = 0
+        self.document_frequency = np.zeros(n_features, dtype=np.int64)
+        # Hashed column -> first term seen in it, so rankings can be read
+        self.terms = {}
+
+    def count(self, texts):
+        """Hash a chunk of texts into a CSR matrix of raw term counts"""
+        token_lists = [self._analyzer(text) for text in texts]
+        counts = self._hasher.transform(token_lists).tocsr()
+        counts.sum_duplicates()
+
+        if self.track_terms:
+            new_terms = set().union(*token_lists).difference(self.terms.values()) if token_lists else set()
+            if new_terms:
+                new_terms = sorted(new_terms)
+                columns = self._hasher.transform([[term] for term in new_terms]).indices
+                for column, term in zip(columns, new_terms):
+                    self.terms.setdefault(int(column), term)
+
+        return counts
+
+    def partial_fit_counts(self, counts):
+        """Update document frequencies from a chunk of raw counts"""
+        self.n_docs += counts.shape[0]
+        self.document_frequency += np.bincount(counts.indices, minlength=self.n_features)
+        return self
+
+    def partial_fit(self, texts):
+        """Update document frequencies from a chunk of texts; returns its raw counts"""
+        counts = self.count(texts)
+        self.partial_fit_counts(counts)
+        return counts
+
+    @property
+    def idf_(self):
+        df = self.document_frequency
+        n = self.n_docs
+        if self.smooth_idf:
+            return np.log((1 + n) / (1 + df)) + 1
+        with np.errstate(divide='ignore'):
+            return np.log(n / np.maximum(df, 1)) + 1
+
+    def transform_counts(self, counts, idf=None):
+        """Apply TF-IDF weighting and normalization to raw counts"""
+        idf = self.idf_ if idf is None else idf
+        tfidf = counts.astype(np.float64, copy=True)
+        if self.sublinear_tf:
+            np.log(tfidf.data, out=tfidf.data)
+            tfidf.data += 1
+        tfidf.data *= idf[tfidf.indices]
+        if self.norm:
+            tfidf = normalize(tfidf, norm=self.norm, copy=False)
+        return tfidf
+
+    def transform(self, texts):
+        return self.transform_counts(self.count(texts))
+
+    def feature_names(self, columns):
+        """Best-effort term for each hashed column"""
+        return [self.terms.get(int(column), f"<hash:{int(column)}>") for column in columns]
+
+
+class TfidfStore:
+    """
+    Directory of raw term-count chunks plus the vectorizer state.
+
+    Layout:
+        manifest.json            vectorizer settings, document count, chunk list
+        document_frequency.npy   per-feature document frequency
+        chunk-00000.{data,indices,indptr}.npy   CSR arrays, memory-mappable
+        chunk-00000.terms.json   hashed columns first seen in the chunk -> term
+
+    Appending a chunk writes only that chunk's files plus the manifest and
+    the document frequencies; existing chunks and their terms are never
+    rewritten. Stores written before per-chunk terms keep their `terms.pkl`,
+    which is still read.
+    """
+
+    def __init__(self, path, vectorizer=None):
+        self.path = path
+        self.chunks = []
+        os.makedirs(path, exist_ok=True)
+
+        if os.path.exists(self._file('manifest.json')):
+            self._load_state()
+        else:
+            self.vectorizer = vectorizer or StreamingTfidfVectorizer(ngram_range=(1, 2))
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load_state(self):
+        with open(self._file('manifest.json')) as f:
+            manifest = json.load(f)
+        self.vectorizer = StreamingTfidfVectorizer(**manifest['vectorizer'])
+        self.vectorizer.n_docs = manifest['n_docs']
+        self.vectorizer.document_frequency = np.load(self._file('document_frequency.npy'))
+        self.chunks = manifest['chunks']
+
+        terms = {}
+        if os.path.exists(self._file('terms.pkl')):
+            with open(self._file('terms.pkl'), 'rb') as f:
+                terms = pickle.load(f)
+        for chunk in self.chunks:
+            terms_file = self._file(f"{chunk['name']}.terms.json")
+            if os.path.exists(terms_file):
+                with open(terms_file) as f:
+                    for column, term in json.load(f):
+                        terms.setdefault(column, term)
+        self.vectorizer.terms = terms
+
+    def _save_state(self):
+        vec = self.vectorizer
+        manifest = {
+            'vectorizer': {
+                'n_features': vec.n_features,
+                'ngram_range': list(vec.ngram_range),
+                'norm': vec.norm,
+                'smooth_idf': vec.smooth_idf,
+                'sublinear_tf': vec.sublinear_tf,
+                'track_terms': vec.track_terms
+            },
+            'n_docs': vec.n_docs,
+            'chunks': self.chunks
+        }
+        np.save(self._file('document_frequency.npy.tmp.npy'), vec.document_frequency)
+        os.replace(self._file('document_frequency.npy.tmp.npy'), self._file('document_frequency.npy'))
+        # The manifest is written last, so a crash never references missing chunks
+        with open(self._file('manifest.json.tmp'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self._file('manifest.json.tmp'), self._file('manifest.json'))
+
+    @property
+    def n_docs(self):
+        return self.vectorizer.n_docs
+
+    def append(self, texts):
+        """Vectorize a chunk of texts, persist its counts and update the IDF state"""
+        known_terms = len(self.vectorizer.terms)
+        counts = self.vectorizer.count(list(texts))
+        name = f"chunk-{len(self.chunks):05d}"
+        for part in ('data', 'indices', 'indptr'):
+            np.save(self._file(f"{name}.{part}.npy"), getattr(counts, part))
+        # terms only grows, in insertion order, so the tail holds this chunk's new terms
+        new_terms = list(islice(self.vectorizer.terms.items(), known_terms, None))
+        with open(self._file(f"{name}.terms.json"), 'w') as f:
+            json.dump(new_terms, f)
+        self.vectorizer.partial_fit_counts(counts)
+        self.chunks.append({'name': name, 'n_docs': counts.shape[0]})
+        self._save_state()
+        return counts.shape[0]
+
+    def iter_counts(self, mmap=True):
+        """Yield the raw count matrix of each stored chunk"""
+        mmap_mode = 'r' if mmap else None
+        for chunk in self.chunks:
+            name = chunk['name']
+            data, indices, indptr = (np.load(self._file(f"{name}.{part}.npy"), mmap_mode=mmap_mode)
+                                     for part in ('data', 'indices', 'indptr'))
+            yield sp.csr_matrix((data, indices, indptr),
+                                shape=(chunk['n_docs'], self.vectorizer.n_features), copy=False)
+
+    def iter_tfidf(self, mmap=True):
+        """Yield the TF-IDF matrix of each stored chunk, weighted with the current IDF"""
+        idf = self.vectorizer.idf_
+        for counts in self.iter_counts(mmap):
+            yield self.vectorizer.transform_counts(counts, idf)
+
+    def tfidf_matrix(self):
+        """The full TF-IDF matrix (only for data that fits in memory)"""
+        blocks = list(self.iter_tfidf())
+        if not blocks:
+            return sp.csr_matrix((0, self.vectorizer.n_features))
+        return sp.vstack(blocks, format='csr')
+
+    def feature_importance(self, top_k=15):
+        """
+        Summed TF-IDF weight per feature, ranked, as in the notebook's
+        feature_importance. Accumulated one chunk at a time in O(n_features) memory.
+        """
+        totals = np.zeros(self.vectorizer.n_features, dtype=np.float64)
+        for tfidf in self.iter_tfidf():
+            totals += np.bincount(tfidf.indices, weights=tfidf.data, minlength=self.vectorizer.n_features)
+
+        k = min(top_k, np.count_nonzero(totals))
+        if k == 0:
+            return pd.DataFrame({'feature': [], 'importance': []})
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top], kind='stable')]
+        return pd.DataFrame({
+            'feature': self.vectorizer.feature_names(top),
+            'importance': totals[top]
+        })
+
+
+def iter_csv_chunks(csv_path, text_column, chunksize=DEFAULT_CHUNK_SIZE):
+    """Read one text column of a CSV file in chunks of chunksize rows"""
+    for frame in pd.read_csv(csv_path, usecols=[text_column], chunksize=chunksize):
+        yield frame[text_column].fillna('').astype(str).tolist()
@@ -0,0 +1,452 @@
+"""
+Benchmark suite for the repository's hot paths
+Runs a fixed set of offline, CPU-only benchmarks and reports throughput,
+per-call latency percentiles and peak traced memory for each:
+
+- tools.*: execute_tool dispatch, TextAnalysisTool.analyze_batch on synthetic
+  corpora of growing size and extract_tool_call parsing (llm-tool-calling);
+- ollama.*: OllamaClient and OllamaSession against a local stub of the Ollama
+  HTTP API with zero simulated model cost, so only client overhead is measured;
+- env.*: PortfolioEnv and ArrayPortfolioEnv steps on synthetic prices
+  (rl-asset-allocation).
+
+Inputs are generated from fixed seeds and BLAS/OpenMP pools are limited to
+--threads threads. Each timed sample runs a batch of calls lasting about
+1 ms; the samples are split into several repeats, run round-robin across
+the cases, and the fastest repeat is reported. Results can be saved as a
+JSON baseline; later runs are compared against it, and any case whose
+throughput, median latency or peak memory is worse by more than --threshold
+(plus a small absolute noise floor) is flagged (exit status 1).
+
+Usage:
+    python benchmarks/suite.py --save-baseline           # record benchmarks/baselines/baseline.json
+    python benchmarks/suite.py                           # compare against it
+    python benchmarks/suite.py --only tools. --quick     # a subset, shorter runs
+    python benchmarks/suite.py --list
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'baselines', 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+# Peak memory changes smaller than this are noise, whatever the ratio
+MEMORY_SLACK_KIB = 64
+# Same for the time per call (throughput and p50 latency)
+LATENCY_SLACK_MS = 0.005
+# Each timed sample runs enough calls to take this long; the timed calls are split into REPEATS runs
+SAMPLE_TIME = 1e-3
+REPEATS = 10
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+for path in ('llm-tool-calling/tools', 'llm-tool-calling/benchmarks', 'rl-asset-allocation'):
+    sys.path.append(os.path.join(REPO_ROOT, path))
+
+
+# Benchmark registry
+# Each case is a generator function decorated with @case. It does its setup,
+# yields (operation, units per call, unit name) and cleans up after the yield.
+
+CASES = {}
+
+
+def case(name, quick=True):
+    """Register a benchmark case; quick=False cases are skipped with --quick"""
+
+    def decorator(func):
+        CASES[name] = {'setup': contextmanager(func), 'quick': quick, 'doc': (func.__doc__ or '').strip()}
+        return func
+
+    return decorator
+
+
+@case('tools.execute_tool.calculator_add')
+def bench_execute_tool():
+    """Registry lookup, parameter filtering and call for a trivial tool"""
+    from custom_tools import disable_tool_cache, execute_tool
+
+    disable_tool_cache()
+    parameters = {'a': 2, 'b': 3}
+    yield (lambda: execute_tool('calculator_add', parameters)), 1, 'calls'
+
+
+@case('tools.execute_tools_batch.8_calls')
+def bench_execute_tools_batch():
+    """Eight independent tool calls on a thread pool"""
+    from custom_tools import disable_tool_cache, execute_tools_batch
+
+    disable_tool_cache()
+    calls = [{'name': 'calculator_multiply', 'parameters': {'a': i, 'b': 3}} for i in range(8)]
+    yield (lambda: execute_tools_batch(calls, max_workers=4)), len(calls), 'calls'
+
+
+def _analyze_batch_case(n_documents):
+    def bench():
+        from custom_tools import TextAnalysisTool
+        from text_analysis_benchmark import make_corpus
+
+        corpus = make_corpus(n_documents, seed=42)
+        yield (lambda: sum(1 for _ in TextAnalysisTool.analyze_batch(corpus))), n_documents, 'docs'
+
+    bench.__doc__ = f"TextAnalysisTool.analyze_batch over {n_documents:,} synthetic reviews"
+    return bench
+
+
+for _size, _quick in ((1_000, True), (10_000, True), (100_000, False)):
+    case(f'tools.analyze_batch.{_size}_docs', quick=_quick)(_analyze_batch_case(_size))
+
+
+@case('tools.extract_tool_call.10k_chars')
+def bench_extract_tool_call():
+    """extract_tool_calls on ~10k-character responses (prose, braces, several calls)"""
+    from ollama_client import extract_tool_calls
+    from tool_call_parser_benchmark import make_scenarios
+
+    texts = [text for text, _ in make_scenarios(10_000).values()]
+    yield (lambda: [extract_tool_calls(text) for text in texts]), len(texts), 'responses'
+
+
+@contextmanager
+def _stub_ollama():
+    from ollama_client import OllamaClient
+    from ollama_session_benchmark import StubModel, start_stub_server
+
+    # No simulated load, prompt-eval or generation time: only the client and HTTP stack are measured
+    server, base_url = start_stub_server(StubModel(0.0, 0.0, 0.0, float('inf')))
+    try:
+        with OllamaClient(base_url=base_url, model_name='stub') as client:
+            yield client
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@case('ollama.client.generate')
+def bench_ollama_generate():
+    """OllamaClient.generate round trip on a pooled keep-alive session"""
+    from custom_tools import TOOL_SCHEMAS
+    from ollama_client import format_tool_call_prompt
+
+    with _stub_ollama() as client:
+        prompt = format_tool_call_prompt("What's the weather like in Rome?", list(TOOL_SCHEMAS.values()))
+        yield (lambda: client.generate(prompt)), 1, 'requests'
+
+
+@case('ollama.client.chat')
+def bench_ollama_chat():
+    """OllamaClient.chat round trip with a four-message conversation"""
+    messages = [{'role': 'system', 'content': 'You are a helpful assistant.'},
+                {'role': 'user', 'content': 'Add 1234 and 5678.'},
+                {'role': 'assistant', 'content': '6912'},
+                {'role': 'user', 'content': 'Now multiply it by 3.'}]
+    with _stub_ollama() as client:
+        yield (lambda: client.chat(messages)), 1, 'requests'
+
+
+@case('ollama.session.generate')
+def bench_ollama_session():
+    """OllamaSession.generate turns with context reuse and trimming"""
+    from custom_tools import TOOL_SCHEMAS
+    from ollama_client import OllamaSession
+
+    with _stub_ollama() as client:
+        session = OllamaSession(client, tools=list(TOOL_SCHEMAS.values()))
+
+        def turn():
+            session.generate("Summarize the last review.")
+            if len(session.turns) >= 1000:
+                session.turns.clear()
+
+        yield turn, 1, 'turns'
+
+
+def _portfolio_env_case(class_name):
+    def bench():
+        import numpy as np
+        import portfolio_env
+
+        prices = portfolio_env.synthetic_prices(1500, ('SPY', 'AAPL', 'MSFT', 'GOOGL'), seed=42)
+        returns, tech_indicators = portfolio_env.compute_features(prices)
+        env = getattr(portfolio_env, class_name)(prices, returns, tech_indicators, lookback_window=10)
+        actions = np.random.default_rng(0).random((4096, 4)).astype(np.float32)
+        state = {'i': 0}
+        env.reset(seed=0)
+
+        def steps(n=100):
+            for _ in range(n):
+                _, _, terminated, truncated, _ = env.step(actions[state['i'] % len(actions)])
+                state['i'] += 1
+                if terminated or truncated:
+                    env.reset()
+
+        yield steps, 100, 'steps'
+
+    bench.__doc__ = f"{class_name}.step with random actions, 1500 days x 4 assets"
+    return bench
+
+
+for _class_name in ('PortfolioEnv', 'ArrayPortfolioEnv'):
+    case(f'env.{_class_name}.step')(_portfolio_env_case(_class_name))
+
+
+# Measurement
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def calibrate(operation, sample_time):
+    """Number of calls per timed sample so that one sample takes at least sample_time"""
+    inner = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(inner):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= sample_time:
+            return inner
+        # Aim 20% past sample_time, growing at most 10x per round
+        inner = min(inner * 10, max(inner + 1, int(inner * sample_time * 1.2 / elapsed) if elapsed else inner * 10))
+
+
+class Measurement:
+    """
+    Timing and peak memory of one case.
+
+    Peak memory is traced on the second call, before any timing, so
+    stateful operations are traced in the same state on every run. Each
+    timed sample runs enough calls back to back to last sample_time, so
+    timer resolution and scheduler jitter are spread over many calls.
+    Throughput and p50 are taken from the fastest repeat, since interference
+    from other processes only ever slows a repeat down; p90/p99 are taken
+    over all samples.
+    """
+
+    def __init__(self, operation, units, sample_time=SAMPLE_TIME, min_samples=5, warmup_time=0.1):
+        self.operation = operation
+        self.units = units
+        self.min_samples = min_samples
+        operation()
+        tracemalloc.start()
+        try:
+            operation()
+            _, self.peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        deadline = time.perf_counter() + warmup_time
+        while time.perf_counter() < deadline:
+            operation()
+        self.inner = calibrate(operation, sample_time)
+        self.throughputs, self.medians, self.samples = [], [], []
+        self.elapsed = 0.0
+
+    def repeat(self, duration):
+        """One repeat: samples for at least duration seconds"""
+        operation, inner = self.operation, self.inner
+        samples = []
+        start = time.perf_counter()
+        while len(samples) < self.min_samples or time.perf_counter() - start < duration:
+            sample_start = time.perf_counter()
+            for _ in range(inner):
+                operation()
+            samples.append((time.perf_counter() - sample_start) / inner)
+        elapsed = time.perf_counter() - start
+        self.elapsed += elapsed
+        self.throughputs.append(len(samples) * inner * self.units / elapsed)
+        self.medians.append(statistics.median(samples))
+        self.samples.extend(samples)
+
+    def result(self):
+        samples = sorted(self.samples)
+        calls = len(samples) * self.inner
+        return {
+            'calls': calls,
+            'inner_calls': self.inner,
+            'repeats': len(self.throughputs),
+            'throughput': max(self.throughputs),
+            'mean_ms': self.elapsed / calls * 1e3,
+            'min_ms': samples[0] * 1e3,
+            'p50_ms': min(self.medians) * 1e3,
+            'p90_ms': percentile(samples, 0.9) * 1e3,
+            'p99_ms': percentile(samples, 0.99) * 1e3,
+            'peak_kib': self.peak / 1024,
+            'units': self.units
+        }
+
+
+def run_cases(names, min_time, repeats=REPEATS):
+    """
+    Results of the named cases. All cases are set up first and their repeats
+    run round-robin, so a slow spell of the machine hits a few repeats of
+    every case rather than every repeat of one case.
+    """
+    results = {}
+    with ExitStack() as stack:
+        measurements = {}
+        for name in names:
+            print(f"preparing {name} ...", file=sys.stderr, flush=True)
+            try:
+                operation, units, unit = stack.enter_context(CASES[name]['setup']())
+            except ImportError as e:
+                results[name] = {'skipped': f"missing dependency: {e.name or e}"}
+                continue
+            measurements[name] = (Measurement(operation, units), unit)
+        # Keep the other cases' inputs out of the collector's full passes
+        gc.collect()
+        gc.freeze()
+        for i in range(repeats):
+            print(f"repeat {i + 1}/{repeats} ...", file=sys.stderr, flush=True)
+            for measurement, _ in measurements.values():
+                measurement.repeat(min_time / repeats)
+        for name, (measurement, unit) in measurements.items():
+            results[name] = {**measurement.result(), 'unit': unit}
+    gc.unfreeze()
+    return {name: results[name] for name in names}
+
+
+def environment(threads):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'threads': threads,
+        'commit': commit
+    }
+
+
+# Baselines
+
+def _slower(before_ms, after_ms, threshold):
+    return after_ms > before_ms * (1 + threshold) + LATENCY_SLACK_MS
+
+
+def compare(results, baseline, threshold):
+    """Regressions of results against baseline: throughput, p50 latency and peak memory"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if 'skipped' in result or not reference or 'skipped' in reference:
+            continue
+        # Throughput is compared as time per call, so the same noise floor applies
+        if _slower(result['units'] / reference['throughput'] * 1e3, result['units'] / result['throughput'] * 1e3,
+                   threshold):
+            regressions.append((name, 'throughput', reference['throughput'], result['throughput']))
+        if _slower(reference['p50_ms'], result['p50_ms'], threshold):
+            regressions.append((name, 'p50_ms', reference['p50_ms'], result['p50_ms']))
+        if result['peak_kib'] > reference['peak_kib'] * (1 + threshold) + MEMORY_SLACK_KIB:
+            regressions.append((name, 'peak_kib', reference['peak_kib'], result['peak_kib']))
+    return regressions
+
+
+def write_json(path, payload):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def print_results(results, baseline):
+    reference = baseline.get('results', {}) if baseline else {}
+    print(f"{'case':<38} | {'throughput':>16} | {'p50 ms':>9} | {'p99 ms':>9} | {'peak KiB':>9} | {'vs baseline':>11}")
+    print("-" * 107)
+    for name, result in results.items():
+        if 'skipped' in result:
+            print(f"{name:<38} | skipped ({result['skipped']})")
+            continue
+        ratio = ''
+        if name in reference and 'throughput' in reference[name]:
+            ratio = f"{result['throughput'] / reference[name]['throughput']:.2f}x"
+        rate = f"{result['throughput']:,.0f} {result['unit']}/s"
+        print(f"{name:<38} | {rate:>16} | {result['p50_ms']:>9.3f} | {result['p99_ms']:>9.3f} | "
+              f"{result['peak_kib']:>9.0f} | {ratio:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", default=[], help="run cases whose name starts with any of these")
+    parser.add_argument("--quick", action="store_true", help="skip the largest cases and shorten timing")
+    parser.add_argument("--min-time", type=float, default=None, help="seconds of timed calls per case")
+    parser.add_argument("--threads", type=int, default=1, help="BLAS/OpenMP threads")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown or memory growth flagged as a regression")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args()
+
+    names = [name for name in CASES
+             if (not args.only or any(name.startswith(prefix) for prefix in args.only))
+             and (CASES[name]['quick'] or not args.quick)]
+    if args.list:
+        for name in names:
+            print(f"{name:<38} {CASES[name]['doc']}")
+        return 0
+
+    # Set before any case imports NumPy, so thread pools are sized consistently
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(args.threads)
+    min_time = args.min_time if args.min_time is not None else (0.3 if args.quick else 1.0)
+
+    results = run_cases(names, min_time)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print()
+    print_results(results, baseline)
+    payload = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment(args.threads),
+               'min_time': min_time, 'results': results}
+    if args.output:
+        write_json(args.output, payload)
+    if args.save_baseline:
+        write_json(args.baseline, payload)
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nno baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    if baseline.get('environment', {}).get('machine') != platform.machine():
+        print("\nwarning: the baseline was recorded on a different machine type")
+    regressions = compare(results, baseline, args.threshold)
+    if not regressions:
+        print(f"\nno regressions beyond {args.threshold:.0%} against {args.baseline}")
+        return 0
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+    for name, metric, before, after in regressions:
+        print(f"  {name}: {metric} {before:,.3f} -> {after:,.3f}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark: load_word2vec_format vs the memory-mapped EmbeddingStore
+Writes a synthetic word2vec binary, converts it once, then measures in fresh
+processes the time from start to the first most_similar answer and the
+private (anonymous) memory each process ends up holding. Memory-mapped
+vectors live in the shared page cache, so they do not count as private.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def private_memory_mb():
+    """RssAnon from /proc/self/status: memory no other process can share"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def run_word2vec(model_path, store_dir):
+    from gensim.models import KeyedVectors
+
+    word_vectors = KeyedVectors.load_word2vec_format(model_path, binary=True)
+    return word_vectors, word_vectors.most_similar('word1', topn=5)
+
+
+def run_store(model_path, store_dir):
+    from embedding_store import EmbeddingStore
+
+    index = EmbeddingStore(store_dir).index()
+    return index, index.most_similar('word1', topn=5)
+
+
+def run_store_keyed_vectors(model_path, store_dir):
+    from embedding_store import EmbeddingStore
+
+    word_vectors = EmbeddingStore(store_dir).keyed_vectors()
+    return word_vectors, word_vectors.most_similar('word1', topn=5)
+
+
+MODES = {
+    'load_word2vec_format': run_word2vec,
+    'store.index()': run_store,
+    'store.keyed_vectors()': run_store_keyed_vectors,
+}
+
+
+def worker(mode, model_path, store_dir):
+    start = time.perf_counter()
+    # Keep the loaded vectors alive until memory is measured
+    vectors, neighbours = MODES[mode](model_path, store_dir)
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        'seconds': seconds,
+        'private_mb': private_memory_mb(),
+        'neighbours': [word for word, _ in neighbours]
+    }))
+
+
+def measure(mode, model_path, store_dir):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', mode, model_path, store_dir],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=300000)
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--worker", nargs=3, metavar=("MODE", "MODEL", "STORE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    from embedding_store import EmbeddingStore
+    from vector_index_benchmark import synthetic_keyed_vectors
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'vectors.bin')
+        store_dir = os.path.join(tmp, 'store')
+        synthetic_keyed_vectors(args.words, args.dim).save_word2vec_format(model_path, binary=True)
+
+        start = time.perf_counter()
+        EmbeddingStore.convert(model_path, store_dir)
+        print(f"{args.words} words x {args.dim} dims; one-time conversion: {time.perf_counter() - start:.1f}s")
+
+        print(f"{'mode':>22} | {'first answer':>12} | {'private memory':>14} | same neighbours")
+        print("-" * 72)
+        results = {mode: measure(mode, model_path, store_dir) for mode in MODES}
+        reference = results['load_word2vec_format']['neighbours']
+        for mode, result in results.items():
+            print(f"{mode:>22} | {result['seconds']:>11.2f}s | {result['private_mb']:>11,.0f} MB | "
+                  f"{result['neighbours'] == reference}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: the lab's pairwise similarity loop vs SimilarityEngine
+For growing word sets, finds the 10 most and least similar pairs the lab's way
+(list comprehension, full cosine_similarity matrix, Python loop over pairs,
+sort) and with the blocked engine, checks they agree, and times the cached
+projections on the largest set.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from projection import project
+from similarity import SimilarityEngine
+from vector_index_benchmark import synthetic_keyed_vectors
+
+
+def notebook_extreme_pairs(word_vectors, words, k=10):
+    """Steps 5-7 of the lab: matrix, similarity matrix, then every pair in Python"""
+    word_vectors_matrix = np.array([word_vectors[word] for word in words])
+    similarity_matrix = cosine_similarity(word_vectors_matrix)
+    pairs = []
+    for i in range(len(words)):
+        for j in range(i + 1, len(words)):
+            pairs.append(((words[i], words[j]), similarity_matrix[i, j]))
+    sorted_pairs = sorted(pairs, key=lambda x: x[1], reverse=True)
+    return sorted_pairs[:k], sorted_pairs[-k:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 10000, 50000])
+    parser.add_argument("--notebook-max", type=int, default=2000,
+                        help="largest set to run the notebook loop on (it needs O(N^2) memory)")
+    parser.add_argument("--dim", type=int, default=300)
+    args = parser.parse_args()
+
+    word_vectors = synthetic_keyed_vectors(max(args.sizes), args.dim)
+    print(f"{'words':>7} | {'notebook loop':>13} | {'engine':>8} | same top-10")
+    print("-" * 48)
+
+    for size in args.sizes:
+        words = word_vectors.index_to_key[:size]
+        start = time.perf_counter()
+        engine = SimilarityEngine.from_model(word_vectors, words)
+        most, least = engine.extreme_pairs(k=10)
+        engine_seconds = time.perf_counter() - start
+
+        if size <= args.notebook_max:
+            start = time.perf_counter()
+            top, _ = notebook_extreme_pairs(word_vectors, words)
+            notebook = f"{time.perf_counter() - start:>12.2f}s"
+            same = [pair for pair, _ in top] == list(zip(most['word1'], most['word2']))
+        else:
+            notebook, same = f"{'skipped':>13}", '-'
+        print(f"{size:>7} | {notebook} | {engine_seconds:>7.2f}s | {same}")
+
+    matrix = engine.vectors
+    print(f"\nprojections of {len(matrix)} words:")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for method in ('pca', 'svd', 'tsne'):
+            start = time.perf_counter()
+            projection = project(matrix, method, cache_dir=cache_dir)
+            fit_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            project(matrix, method, cache_dir=cache_dir)
+            print(f"{method:>6}: fit {fit_seconds:6.2f}s on {len(projection.indices)} points, "
+                  f"cached {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: KeyedVectors.most_similar vs VectorIndex / IVFIndex
+Builds a synthetic clustered embedding matrix, answers the same nearest-
+neighbour queries with gensim (one call per word) and with the batched
+indexes, and reports queries per second and recall@k against gensim.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from gensim.models import KeyedVectors
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from vector_index import IVFIndex, VectorIndex
+
+
+def synthetic_keyed_vectors(n_words, dim, n_topics=1000, noise=1.5, seed=0):
+    """Word vectors scattered around topic centres, loosely like real embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, n_topics, n_words)]
+    vectors += rng.normal(scale=noise, size=(n_words, dim)).astype(np.float32)
+    keyed_vectors = KeyedVectors(dim)
+    keyed_vectors.add_vectors([f"word{i}" for i in range(n_words)], vectors)
+    return keyed_vectors
+
+
+def recall(expected, found):
+    """Mean fraction of gensim's neighbours that an index also returned"""
+    return np.mean([len({w for w, _ in e} & {w for w, _ in f}) / len(e) for e, f in zip(expected, found)])
+
+
+def report(name, seconds, n_queries, expected, found):
+    print(f"{name:>26} | {n_queries / seconds:>10.0f} | {recall(expected, found):>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--topn", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    keyed_vectors = synthetic_keyed_vectors(args.words, args.dim)
+    rng = np.random.default_rng(1)
+    words = [keyed_vectors.index_to_key[i] for i in rng.choice(args.words, args.queries, replace=False)]
+    print(f"{args.words} words x {args.dim} dims, {args.queries} queries, top {args.topn}")
+
+    keyed_vectors.fill_norms()
+    start = time.perf_counter()
+    expected = [keyed_vectors.most_similar(word, topn=args.topn) for word in words]
+    gensim_seconds = time.perf_counter() - start
+
+    print(f"{'method':>26} | {'queries/s':>10} | {'recall@' + str(args.topn):>9}")
+    print("-" * 52)
+    report("KeyedVectors.most_similar", gensim_seconds, len(words), expected, expected)
+
+    for quantize in (None, 'int8'):
+        index = VectorIndex.from_keyed_vectors(keyed_vectors, quantize=quantize)
+        start = time.perf_counter()
+        found = index.most_similar_batch(words, topn=args.topn)
+        report(f"VectorIndex {quantize or 'float32'}", time.perf_counter() - start, len(words), expected, found)
+
+    start = time.perf_counter()
+    index = IVFIndex.from_keyed_vectors(keyed_vectors)
+    print(f"IVFIndex: {index.n_lists} lists, built in {time.perf_counter() - start:.1f}s")
+    for n_probe in args.n_probe:
+        index.n_probe = n_probe
+        start = time.perf_counter()
+        found = index.most_similar_batch(words, topn=args.topn)
+        report(f"IVFIndex n_probe={n_probe}", time.perf_counter() - start, len(words), expected, found)
+
+
+if __name__ == "__main__":
+    main()
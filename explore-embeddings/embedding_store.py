@@ -0,0 +1,237 @@
+"""
+Memory-mapped word embedding store
+
+`KeyedVectors.load_word2vec_format` parses the 3.6 GB Google News binary on
+every start and copies the whole matrix into each process. This module
+converts the model once into plain NumPy files and opens them with
+`mmap_mode='r'`:
+
+- Opening a store takes milliseconds. Pages are read from disk the first time
+  they are used.
+- Every process that opens the same store shares one copy in the OS page
+  cache. A pickled store only carries its path, so worker processes reattach
+  instead of copying vectors.
+- `restrict_vocab` opens only the first (most frequent) words, e.g. the top
+  200k, as views of the same files.
+
+The vocabulary is stored compactly (one UTF-8 byte array plus offsets and a
+sorted order for binary search), so looking up a word needs no 3M-entry dict.
+
+Usage:
+    from embedding_store import load_embeddings
+
+    store = load_embeddings('data/word2vec-google-news-300.bin')   # converts once
+    store = load_embeddings('data/word2vec-google-news-300.bin', restrict_vocab=200000)
+    word_vectors = store.keyed_vectors()     # gensim KeyedVectors over the mmap
+    index = store.index()                    # VectorIndex over the mmap
+"""
+
+import json
+import os
+
+import numpy as np
+
+DEFAULT_STORE_DIR = 'data/word2vec_store'
+
+
+class Vocabulary:
+    """Words of an EmbeddingStore, in row order, read from memory-mapped arrays"""
+
+    def __init__(self, blob, offsets, sorted_ids, size=None):
+        self.blob = blob
+        self.offsets = offsets
+        self.sorted_ids = sorted_ids
+        self.size = len(offsets) - 1 if size is None else size
+        self.key_to_index = KeyToIndex(self)
+
+    def __len__(self):
+        return self.size
+
+    def _bytes(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.size))]
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return self._bytes(i).decode('utf-8')
+
+    def __iter__(self):
+        # Decode the byte array once instead of slicing the mmap per word
+        text = self.blob[:self.offsets[self.size]].tobytes()
+        offsets = self.offsets[:self.size + 1].tolist()
+        for start, stop in zip(offsets[:-1], offsets[1:]):
+            yield text[start:stop].decode('utf-8')
+
+    def find(self, word):
+        """Row of word, or -1; a binary search over the byte-sorted vocabulary"""
+        target = word.encode('utf-8')
+        low, high = 0, len(self.sorted_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(self.sorted_ids[middle]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.sorted_ids):
+            row = int(self.sorted_ids[low])
+            if row < self.size and self._bytes(row) == target:
+                return row
+        return -1
+
+
+class KeyToIndex:
+    """Read-only word -> row mapping backed by Vocabulary.find"""
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def __contains__(self, word):
+        return isinstance(word, str) and self.vocabulary.find(word) >= 0
+
+    def __getitem__(self, word):
+        row = self.vocabulary.find(word)
+        if row < 0:
+            raise KeyError(f"Key '{word}' not present")
+        return row
+
+    def get(self, word, default=None):
+        row = self.vocabulary.find(word)
+        return default if row < 0 else row
+
+
+class EmbeddingStore:
+    """
+    Word vectors stored as memory-mappable .npy files.
+
+    Layout of a store directory:
+        vectors.npy          (n_words, vector_size) float32, in model order
+        norms.npy            (n_words,) float32 L2 norms
+        vocab.npy            UTF-8 bytes of all words, concatenated
+        vocab_offsets.npy    (n_words + 1,) start of each word in vocab.npy
+        vocab_sorted.npy     rows ordered by word bytes, for lookups
+        manifest.json        sizes and source; written last
+    """
+
+    ARRAYS = ('vectors', 'norms', 'vocab', 'vocab_offsets', 'vocab_sorted')
+
+    def __init__(self, path=DEFAULT_STORE_DIR, restrict_vocab=None):
+        self.path = path
+        self.restrict_vocab = restrict_vocab
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in self.ARRAYS}
+        n = min(restrict_vocab or self.manifest['n_words'], self.manifest['n_words'])
+        self.vectors = arrays['vectors'][:n]
+        self.norms = arrays['norms'][:n]
+        self.vocabulary = Vocabulary(arrays['vocab'], arrays['vocab_offsets'], arrays['vocab_sorted'], n)
+
+    def __getstate__(self):
+        # Workers reopen the memory maps instead of receiving a copy of the vectors
+        return {'path': self.path, 'restrict_vocab': self.restrict_vocab}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['restrict_vocab'])
+
+    @staticmethod
+    def exists(path=DEFAULT_STORE_DIR):
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+    @classmethod
+    def from_keyed_vectors(cls, keyed_vectors, path=DEFAULT_STORE_DIR, source=None):
+        """Write a gensim KeyedVectors to a store directory and open it"""
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, 'manifest.json')
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+        words = [word.encode('utf-8') for word in keyed_vectors.index_to_key]
+        vectors = np.asarray(keyed_vectors.vectors, dtype=np.float32)
+        arrays = {
+            'vectors': vectors,
+            'norms': np.linalg.norm(vectors, axis=1).astype(np.float32),
+            'vocab': np.frombuffer(b''.join(words), dtype=np.uint8),
+            'vocab_offsets': np.concatenate([[0], np.cumsum([len(word) for word in words])]).astype(np.int64),
+            'vocab_sorted': np.array(sorted(range(len(words)), key=words.__getitem__), dtype=np.int64),
+        }
+        for name, array in arrays.items():
+            array_path = os.path.join(path, f'{name}.npy')
+            np.save(array_path + '.tmp.npy', array)
+            os.replace(array_path + '.tmp.npy', array_path)
+
+        manifest = {'n_words': len(words), 'vector_size': int(vectors.shape[1]), 'source': source}
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        return cls(path)
+
+    @classmethod
+    def convert(cls, model_path, path=DEFAULT_STORE_DIR, binary=True, limit=None):
+        """One-time conversion of a word2vec-format file"""
+        from gensim.models import KeyedVectors
+
+        keyed_vectors = KeyedVectors.load_word2vec_format(model_path, binary=binary, limit=limit)
+        return cls.from_keyed_vectors(keyed_vectors, path, source=os.path.abspath(model_path))
+
+    @property
+    def vector_size(self):
+        return self.vectors.shape[1]
+
+    @property
+    def key_to_index(self):
+        return self.vocabulary.key_to_index
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def __contains__(self, word):
+        return word in self.vocabulary.key_to_index
+
+    def get_vector(self, word, norm=False):
+        row = self.vocabulary.key_to_index[word]
+        vector = np.array(self.vectors[row])
+        return vector / self.norms[row] if norm else vector
+
+    __getitem__ = get_vector
+
+    def keyed_vectors(self):
+        """
+        A gensim KeyedVectors whose vectors and norms are the memory maps.
+
+        gensim needs the vocabulary as a list and dict, which takes a second
+        or two for all 3M words; restrict_vocab keeps this fast.
+        """
+        from gensim.models import KeyedVectors
+
+        keyed_vectors = KeyedVectors(self.vector_size)
+        keyed_vectors.index_to_key = list(self.vocabulary)
+        keyed_vectors.key_to_index = {word: i for i, word in enumerate(keyed_vectors.index_to_key)}
+        keyed_vectors.vectors = self.vectors
+        keyed_vectors.norms = self.norms
+        return keyed_vectors
+
+    def index(self, **kwargs):
+        """An exact VectorIndex that scores the memory-mapped vectors in place"""
+        from vector_index import VectorIndex
+
+        return VectorIndex(self.vectors, self.vocabulary, norms=self.norms, **kwargs)
+
+
+def load_embeddings(model_path, store_dir=DEFAULT_STORE_DIR, restrict_vocab=None, binary=True):
+    """
+    Open the store for model_path, converting the model on first use.
+
+    The conversion parses the word2vec file once (minutes for Google News);
+    later calls only memory-map the store.
+    """
+    if not EmbeddingStore.exists(store_dir):
+        print(f"Converting {model_path} to {store_dir} (one-time)...")
+        EmbeddingStore.convert(model_path, store_dir, binary=binary)
+    return EmbeddingStore(store_dir, restrict_vocab)
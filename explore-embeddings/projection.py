@@ -0,0 +1,132 @@
+"""
+Cached 2-D projections of word vectors
+
+PCA and t-SNE in the lab are refit on every run. For large word sets this
+module:
+
+- caches each projection on disk, keyed by a hash of the vectors and the
+  parameters, so re-running a cell loads it instead of refitting;
+- uses randomized SVD (`method='svd'`) or sklearn's fast PCA solvers, and
+  keeps the fitted components so new words can be placed with
+  `Projection.transform` without refitting;
+- runs t-SNE on at most `max_points` sampled words (after a 50-dimension PCA)
+  instead of all N, since its cost grows superlinearly with N. The projected
+  rows are returned in `Projection.indices`.
+
+Usage:
+    from projection import project
+
+    pca = project(matrix, 'pca', cache_dir='data/projections')
+    tsne = project(matrix, 'tsne', max_points=5000, cache_dir='data/projections')
+    plt.scatter(tsne.coords[:, 0], tsne.coords[:, 1])
+    labels = [words[i] for i in tsne.indices]
+"""
+
+import hashlib
+import os
+
+import numpy as np
+from sklearn.decomposition import PCA, TruncatedSVD
+from sklearn.manifold import TSNE
+
+DEFAULT_CACHE_DIR = 'data/projections'
+METHODS = ('pca', 'svd', 'tsne')
+
+# Above this many points t-SNE runs on a random sample
+TSNE_MAX_POINTS = 5000
+
+# t-SNE input is first reduced to this many dimensions with PCA
+TSNE_PCA_COMPONENTS = 50
+
+
+class Projection:
+    """
+    Low-dimensional coordinates of the rows listed in indices.
+
+    Linear methods (pca, svd) also keep components and mean, so transform()
+    can project vectors that were not part of the fit.
+    """
+
+    def __init__(self, coords, indices, explained_variance_ratio=None, components=None, mean=None):
+        self.coords = coords
+        self.indices = indices
+        self.explained_variance_ratio = explained_variance_ratio
+        self.components = components
+        self.mean = mean
+
+    def transform(self, vectors):
+        if self.components is None:
+            raise ValueError("Only linear projections (pca, svd) can transform new vectors")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.mean is not None:
+            vectors = vectors - self.mean
+        return vectors @ self.components.T
+
+    def save(self, path):
+        arrays = {name: value for name, value in vars(self).items() if value is not None}
+        np.savez(path + '.tmp.npz', **arrays)
+        os.replace(path + '.tmp.npz', path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+
+def fingerprint(vectors, **params):
+    """Hash of the vectors and the projection parameters, used as the cache key"""
+    digest = hashlib.sha1(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()[:16]
+
+
+def _fit(vectors, method, n_components, max_points, perplexity, seed):
+    n = len(vectors)
+    if method == 'pca':
+        # fit then transform, so coords and transform() agree even with randomized solvers
+        pca = PCA(n_components=n_components, random_state=seed).fit(vectors)
+        coords = pca.transform(vectors)
+        return Projection(coords, np.arange(n), pca.explained_variance_ratio_, pca.components_, pca.mean_)
+
+    if method == 'svd':
+        # Randomized SVD without centering: the cheapest option for very large N
+        svd = TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=seed).fit(vectors)
+        coords = svd.transform(vectors)
+        return Projection(coords, np.arange(n), svd.explained_variance_ratio_, svd.components_)
+
+    indices = np.arange(n)
+    if n > max_points:
+        indices = np.sort(np.random.default_rng(seed).choice(n, size=max_points, replace=False))
+    sample = vectors[indices]
+    if sample.shape[1] > TSNE_PCA_COMPONENTS and len(sample) > TSNE_PCA_COMPONENTS:
+        sample = PCA(n_components=TSNE_PCA_COMPONENTS, random_state=seed).fit_transform(sample)
+    tsne = TSNE(n_components=n_components, perplexity=min(perplexity, len(sample) - 1),
+                init='pca', random_state=seed)
+    return Projection(tsne.fit_transform(sample), indices)
+
+
+def project(vectors, method='pca', n_components=2, max_points=TSNE_MAX_POINTS, perplexity=30,
+            seed=42, cache_dir=None):
+    """
+    Project an (N, dim) matrix with PCA, randomized SVD or (sampled) t-SNE.
+
+    With cache_dir, results are stored as .npz files and reused when the same
+    vectors are projected with the same parameters.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown projection method: {method}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    params = dict(method=method, n_components=n_components, seed=seed)
+    if method == 'tsne':
+        params.update(max_points=max_points, perplexity=perplexity)
+
+    if cache_dir is None:
+        return _fit(vectors, method, n_components, max_points, perplexity, seed)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{method}-{fingerprint(vectors, **params)}.npz")
+    if os.path.exists(path):
+        return Projection.load(path)
+    projection = _fit(vectors, method, n_components, max_points, perplexity, seed)
+    projection.save(path)
+    return projection
@@ -0,0 +1,181 @@
+"""
+Blocked pairwise similarity for large word sets
+
+The lab builds `word_vectors_matrix` word by word, computes the full
+`cosine_similarity` matrix and sorts every (i, j) pair in Python. That is
+N^2 memory and N^2 / 2 Python iterations: fine for 15 words, unusable for 50k.
+`SimilarityEngine` instead scores the upper triangle one block pair at a time
+and keeps only running top-k / bottom-k pairs, so memory stays at
+O(block_size^2) whatever N is.
+
+Usage:
+    from similarity import SimilarityEngine
+
+    engine = SimilarityEngine.from_model(word_vectors, business_vocabulary)
+    most, least = engine.extreme_pairs(k=10)      # DataFrames: word1, word2, similarity
+    engine.similar_to('profit', k=10)             # within the word set
+    for rows, cols, sims in engine.pairs_above(0.7):
+        ...
+"""
+
+import numpy as np
+import pandas as pd
+
+from vector_index import normalize_rows, top_k
+
+DEFAULT_BLOCK_SIZE = 4096
+
+
+def word_matrix(model, words):
+    """
+    Vectors for the in-vocabulary words, gathered with one fancy index.
+
+    model is a gensim KeyedVectors or an EmbeddingStore. Returns
+    (matrix, kept_words); out-of-vocabulary words are dropped.
+    """
+    key_to_index = model.key_to_index
+    kept = [word for word in words if word in key_to_index]
+    rows = np.array([key_to_index[word] for word in kept], dtype=np.int64)
+    # Sorted reads are friendlier to memory-mapped vectors
+    order = np.argsort(rows)
+    matrix = np.empty((len(rows), model.vectors.shape[1]), dtype=np.float32)
+    matrix[order] = model.vectors[rows[order]]
+    return matrix, kept
+
+
+class _RunningPairs:
+    """The k best (row, col, score) pairs seen so far, largest scores first"""
+
+    def __init__(self, k):
+        self.k = k
+        self.rows = np.empty(0, dtype=np.int64)
+        self.cols = np.empty(0, dtype=np.int64)
+        self.scores = np.empty(0, dtype=np.float32)
+
+    @property
+    def threshold(self):
+        return self.scores.min() if len(self.scores) == self.k else -np.inf
+
+    def push(self, scores, row_offset, col_offset):
+        """Merge the candidates of one block of scores"""
+        flat = scores.ravel()
+        candidates = np.flatnonzero(flat > self.threshold)
+        if len(candidates) > self.k:
+            candidates = candidates[np.argpartition(-flat[candidates], self.k - 1)[:self.k]]
+        rows, cols = np.divmod(candidates, scores.shape[1])
+
+        self.rows = np.concatenate([self.rows, rows + row_offset])
+        self.cols = np.concatenate([self.cols, cols + col_offset])
+        self.scores = np.concatenate([self.scores, flat[candidates]])
+        if len(self.scores) > self.k:
+            keep = np.argpartition(-self.scores, self.k - 1)[:self.k]
+            self.rows, self.cols, self.scores = self.rows[keep], self.cols[keep], self.scores[keep]
+
+    def sorted(self):
+        order = np.argsort(-self.scores, kind='stable')
+        return self.rows[order], self.cols[order], self.scores[order]
+
+
+class SimilarityEngine:
+    """Cosine similarities within one set of N vectors, computed block by block"""
+
+    def __init__(self, vectors, words=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.vectors = normalize_rows(vectors)
+        self.words = list(words) if words is not None else [str(i) for i in range(len(self.vectors))]
+        self.word_to_index = {word: i for i, word in enumerate(self.words)}
+        self.block_size = block_size
+
+    @classmethod
+    def from_model(cls, model, words, **kwargs):
+        """Engine over the in-vocabulary words of a KeyedVectors or EmbeddingStore"""
+        matrix, kept = word_matrix(model, words)
+        return cls(matrix, kept, **kwargs)
+
+    def __len__(self):
+        return len(self.words)
+
+    def _blocks(self):
+        """Yield (row_start, col_start, scores) over the upper triangle, diagonal excluded"""
+        n = len(self)
+        for row_start in range(0, n, self.block_size):
+            rows = self.vectors[row_start:row_start + self.block_size]
+            for col_start in range(row_start, n, self.block_size):
+                scores = rows @ self.vectors[col_start:col_start + self.block_size].T
+                if col_start == row_start:
+                    scores[np.tril_indices(len(rows), m=scores.shape[1])] = np.nan
+                yield row_start, col_start, scores
+
+    def _frame(self, rows, cols, scores):
+        return pd.DataFrame({
+            'word1': [self.words[i] for i in rows],
+            'word2': [self.words[j] for j in cols],
+            'similarity': scores.astype(np.float64),
+        })
+
+    def extreme_pairs(self, k=10):
+        """The k most and k least similar pairs, from a single pass over the blocks"""
+        most, least = _RunningPairs(k), _RunningPairs(k)
+        for row_start, col_start, scores in self._blocks():
+            # NaN (the masked lower triangle) never compares greater than a threshold
+            most.push(scores, row_start, col_start)
+            least.push(-scores, row_start, col_start)
+        rows, cols, scores = least.sorted()
+        return self._frame(*most.sorted()), self._frame(rows, cols, -scores)
+
+    def top_pairs(self, k=10):
+        return self.extreme_pairs(k)[0]
+
+    def bottom_pairs(self, k=10):
+        return self.extreme_pairs(k)[1]
+
+    def pairs_above(self, threshold):
+        """Yield (word1 indices, word2 indices, similarities) of every pair above threshold, per block"""
+        for row_start, col_start, scores in self._blocks():
+            rows, cols = np.nonzero(scores > threshold)
+            if len(rows):
+                yield rows + row_start, cols + col_start, scores[rows, cols]
+
+    def similarities(self, vector):
+        """Cosine similarity of one vector with every word in the set"""
+        return self.vectors @ normalize_rows(np.atleast_2d(vector))[0]
+
+    def similar_to(self, word, k=10):
+        """The k words of the set closest to word (itself excluded)"""
+        scores = self.similarities(self.vectors[self.word_to_index[word]])
+        scores[self.word_to_index[word]] = -np.inf
+        indices, best = top_k(scores[None, :], k)
+        return [(self.words[i], float(s)) for i, s in zip(indices[0], best[0])]
+
+    def nearest_neighbours(self, k=5):
+        """
+        (N, k) indices and similarities of each word's neighbours within the set.
+
+        Scores one block_size x block_size tile at a time and merges each
+        tile's top k into the running top k of its rows, as extreme_pairs does.
+        """
+        n = len(self)
+        k = min(k, n)
+        indices = np.empty((n, k), dtype=np.int64)
+        scores = np.empty((n, k), dtype=np.float32)
+        for row_start in range(0, n, self.block_size):
+            rows = self.vectors[row_start:row_start + self.block_size]
+            local = np.arange(len(rows))
+            best_indices = np.empty((len(rows), 0), dtype=np.int64)
+            best_scores = np.empty((len(rows), 0), dtype=np.float32)
+            for col_start in range(0, n, self.block_size):
+                block = rows @ self.vectors[col_start:col_start + self.block_size].T
+                # Each word's similarity with itself
+                own = (row_start + local >= col_start) & (row_start + local < col_start + block.shape[1])
+                block[local[own], row_start + local[own] - col_start] = -np.inf
+
+                block_indices, block_scores = top_k(block, k)
+                candidates = np.concatenate([best_indices, block_indices + col_start], axis=1)
+                positions, best_scores = top_k(np.concatenate([best_scores, block_scores], axis=1), k)
+                best_indices = np.take_along_axis(candidates, positions, axis=1)
+            indices[row_start:row_start + len(rows)] = best_indices
+            scores[row_start:row_start + len(rows)] = best_scores
+        return indices, scores
+
+    def matrix(self):
+        """The full N x N similarity matrix; only sensible for small sets such as the heatmap"""
+        return self.vectors @ self.vectors.T
@@ -0,0 +1,74 @@
+"""
+Benchmark: cost of the instrumentation layer on a tool-calling turn
+Runs an offline turn (format_tool_call_prompt, extract_tool_call on a canned
+model response, execute_tool) with instrumentation disabled and enabled,
+prints the per-turn overhead and the per-stage summary, exports the metrics
+as JSON and Prometheus text and profiles one turn with profile_turn.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+from custom_tools import TOOL_SCHEMAS, execute_tool
+from instrumentation import disable_instrumentation, enable_instrumentation, profile_turn
+from ollama_client import extract_tool_call, format_tool_call_prompt
+
+TEXT = "The battery life is great but the screen scratches easily and support was slow. " * 20
+
+
+def canned_response(i):
+    call = {"tool_call": {"name": "analyze_text", "parameters": {"text": f"{TEXT} review {i}", "max_keywords": 5}}}
+    return "I will analyze the review with the text analysis tool.\n" + json.dumps(call)
+
+
+def run_turn(i):
+    format_tool_call_prompt(f"Analyze review {i}", list(TOOL_SCHEMAS.values()))
+    call = extract_tool_call(canned_response(i))
+    return execute_tool(call["name"], call["parameters"])
+
+
+def turns_per_second(turns):
+    start = time.perf_counter()
+    for i in range(turns):
+        run_turn(i)
+    return turns / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    disable_instrumentation()
+    off = max(turns_per_second(args.turns) for _ in range(args.repeat))
+    metrics = enable_instrumentation()
+    on = max(turns_per_second(args.turns) for _ in range(args.repeat))
+    print(f"{args.turns} offline turns: {off:.0f} turns/s disabled, {on:.0f} turns/s enabled "
+          f"({(1 / on - 1 / off) * 1e6:.1f} us overhead per turn)\n")
+
+    print(f"{'stage':<14} {'tool':<14} | {'count':>6} | {'mean ms':>8} | {'p50 ms':>8} | {'p99 ms':>8}")
+    print("-" * 72)
+    for row in metrics.summary():
+        print(f"{row['stage']:<14} {row.get('tool', ''):<14} | {row['count']:>6} | {row['mean_ms']:>8.3f} | "
+              f"{row['p50_ms']:>8.3f} | {row['p99_ms']:>8.3f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = metrics.export_json(os.path.join(tmp, "metrics.json"))
+        prom_path = metrics.export_prometheus(os.path.join(tmp, "metrics.prom"))
+        print(f"\nexported {os.path.getsize(json_path)} bytes of JSON, {os.path.getsize(prom_path)} bytes of Prometheus text")
+
+        with profile_turn(output_path=os.path.join(tmp, "turn.prof")) as turn:
+            run_turn(0)
+    print(f"\nprofiled turn: {turn.elapsed * 1e3:.2f} ms, peak traced memory {turn.peak_memory / 1024:.0f} KiB")
+    print(turn.stats_text(limit=10))
+
+
+if __name__ == "__main__":
+    main()
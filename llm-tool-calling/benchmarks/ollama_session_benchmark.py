@@ -0,0 +1,231 @@
+"""
+Benchmark: OllamaSession vs re-sending the full prompt every turn
+Runs multi-turn tool-calling conversations against a local stub of the Ollama
+API and compares prompt-eval tokens, prompt-eval time and model loads per turn:
+- baseline: OllamaClient.chat with every user message wrapped in
+  format_tool_call_prompt and the whole history re-sent, no keep_alive;
+- OllamaSession.generate: context reuse, stable prefix, keep_alive;
+- OllamaSession.chat: stable system prefix, trimmed history, keep_alive.
+
+The stub tokenizes on words, keeps one KV cache per loaded model (a request
+only evaluates the tokens after its longest common prefix with that cache),
+unloads the model after keep_alive of idle time and sleeps for model loads,
+prompt eval and generation at configurable per-token rates. Token counts are
+exact for the stub's template; timings follow the configured rates.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+from custom_tools import TOOL_SCHEMAS
+from ollama_client import OllamaClient, OllamaSession, format_tool_call_prompt
+
+ROLE_TOKENS = {"system": -1, "user": -2, "assistant": -3}
+DURATION_UNITS = {"ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+
+QUESTIONS = [
+    "What's the weather like in Rome?",
+    "Add 1234 and 5678 for me.",
+    "Analyze this review: the battery lasts two days and the screen is sharp.",
+    "Now multiply the previous result by 3.",
+    "Summarize what we discussed so far.",
+    "Is it going to rain in Paris tomorrow?",
+]
+
+
+def tokenize(text):
+    return [zlib.crc32(token.encode("utf-8")) & 0xFFFFFF for token in re.findall(r"\w+|[^\w\s]", text)]
+
+
+def parse_keep_alive(value, default):
+    """Seconds from an Ollama keep_alive value ("30m", "5s", 300, -1)"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    match = re.fullmatch(r"(-?[\d.]+)(ms|s|m|h)?", value.strip())
+    seconds = float(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+    return float("inf") if seconds < 0 else seconds
+
+
+class StubModel:
+    """One model slot: load state, KV cache and simulated compute"""
+
+    def __init__(self, load_s, prompt_token_s, eval_token_s, default_keep_alive_s):
+        self.load_s = load_s
+        self.prompt_token_s = prompt_token_s
+        self.eval_token_s = eval_token_s
+        self.default_keep_alive_s = default_keep_alive_s
+        self.loaded_until = 0.0
+        self.kv = []
+        self.lock = threading.Lock()
+
+    def run(self, tokens, keep_alive, reply=None):
+        with self.lock:
+            start = time.perf_counter()
+            load = 0.0
+            if time.monotonic() > self.loaded_until:
+                load = self.load_s
+                time.sleep(load)
+                self.kv = []
+
+            common = 0
+            for cached, token in zip(self.kv, tokens):
+                if cached != token:
+                    break
+                common += 1
+            evaluated = len(tokens) - common
+            time.sleep(evaluated * self.prompt_token_s)
+
+            reply = reply or f"Noted, {len(tokens)} tokens in context."
+            reply_tokens = tokenize(reply)
+            time.sleep(len(reply_tokens) * self.eval_token_s)
+
+            self.kv = tokens + reply_tokens
+            self.loaded_until = time.monotonic() + parse_keep_alive(keep_alive, self.default_keep_alive_s)
+            return reply, {
+                "prompt_eval_count": evaluated,
+                "prompt_eval_duration": int(evaluated * self.prompt_token_s * 1e9),
+                "eval_count": len(reply_tokens),
+                "eval_duration": int(len(reply_tokens) * self.eval_token_s * 1e9),
+                "load_duration": int(load * 1e9),
+                "total_duration": int((time.perf_counter() - start) * 1e9),
+                "context": self.kv,
+            }
+
+
+def make_handler(model):
+    class StubOllamaHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._reply({"models": [{"name": "stub"}]})
+
+        def do_POST(self):
+            data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            keep_alive = data.get("keep_alive")
+            if self.path == "/api/generate":
+                if "prompt" not in data:
+                    # Load or unload request, as in the Ollama API
+                    if parse_keep_alive(keep_alive, model.default_keep_alive_s) == 0:
+                        model.loaded_until = 0.0
+                        return self._reply({"done": True, "done_reason": "unload"})
+                    model.run([], keep_alive)
+                    return self._reply({"done": True, "done_reason": "load"})
+                tokens = list(data.get("context") or [])
+                if data.get("system"):
+                    tokens += [ROLE_TOKENS["system"]] + tokenize(data["system"])
+                tokens += [ROLE_TOKENS["user"]] + tokenize(data["prompt"]) + [ROLE_TOKENS["assistant"]]
+                reply, stats = model.run(tokens, keep_alive)
+                return self._reply({"response": reply, "done": True, **stats})
+
+            tokens = []
+            for message in data["messages"]:
+                tokens += [ROLE_TOKENS[message["role"]]] + tokenize(message["content"])
+            reply, stats = model.run(tokens + [ROLE_TOKENS["assistant"]], keep_alive)
+            stats.pop("context")
+            self._reply({"message": {"role": "assistant", "content": reply}, "done": True, **stats})
+
+    return StubOllamaHandler
+
+
+def start_stub_server(model):
+    server = HTTPServer(("127.0.0.1", 0), make_handler(model))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def baseline_turns(client, tools, conversations, turns, idle):
+    """The pattern the lab supports today: full prompt and history every turn"""
+    stats = []
+    for c in range(conversations):
+        messages = []
+        for t in range(turns):
+            messages.append({"role": "user", "content": format_tool_call_prompt(QUESTIONS[t % len(QUESTIONS)], tools)})
+            record, error = client.request_json("chat", {"model": client.model_name, "messages": messages,
+                                                         "stream": False})
+            assert error is None, error
+            messages.append(record["message"])
+            stats.append(record)
+            time.sleep(idle)
+    return stats
+
+
+def session_turns(client, tools, conversations, turns, idle, mode, max_context_tokens):
+    sessions = []
+    for c in range(conversations):
+        session = OllamaSession(client, tools=tools, max_context_tokens=max_context_tokens)
+        send = session.generate if mode == "generate" else session.chat
+        for t in range(turns):
+            send(QUESTIONS[t % len(QUESTIONS)])
+            time.sleep(idle)
+        sessions.append(session)
+    return [turn.as_dict() for session in sessions for turn in session.turns]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--idle", type=float, default=0.3, help="seconds between turns")
+    parser.add_argument("--server-keep-alive", type=float, default=0.2,
+                        help="stub's default keep_alive in seconds (Ollama's is 5 minutes)")
+    parser.add_argument("--load-ms", type=float, default=500)
+    parser.add_argument("--prompt-token-ms", type=float, default=0.5)
+    parser.add_argument("--eval-token-ms", type=float, default=5)
+    parser.add_argument("--max-context-tokens", type=int, default=2048)
+    args = parser.parse_args()
+
+    model = StubModel(args.load_ms / 1e3, args.prompt_token_ms / 1e3, args.eval_token_ms / 1e3,
+                      args.server_keep_alive)
+    server, base_url = start_stub_server(model)
+    tools = list(TOOL_SCHEMAS.values())
+    try:
+        with OllamaClient(base_url=base_url, model_name="stub") as client:
+            runs = {"baseline chat": None, "session generate": "generate", "session chat": "chat"}
+            print(f"{args.conversations} conversations x {args.turns} turns, {args.idle}s between turns\n")
+            print(f"{'method':<18} | {'prompt tok/turn':>15} | {'prompt ms/turn':>14} | {'loads':>5} | "
+                  f"{'reused tok/turn':>15} | {'saved ms/turn':>13}")
+            print("-" * 98)
+            for name, mode in runs.items():
+                model.loaded_until = 0.0
+                if mode is None:
+                    records = baseline_turns(client, tools, args.conversations, args.turns, args.idle)
+                    prompt_tokens = [r["prompt_eval_count"] for r in records]
+                    prompt_ms = [r["prompt_eval_duration"] / 1e6 for r in records]
+                    loads = sum(1 for r in records if r["load_duration"])
+                    reused = saved = "-"
+                else:
+                    turns = session_turns(client, tools, args.conversations, args.turns, args.idle, mode,
+                                          args.max_context_tokens)
+                    prompt_tokens = [t["prompt_eval_count"] for t in turns]
+                    prompt_ms = [t["prompt_eval_ms"] for t in turns]
+                    loads = sum(1 for t in turns if t["load_ms"])
+                    reused = f"{sum(t['reused_tokens'] for t in turns) / len(turns):.0f}"
+                    saved = f"{sum(t['saved_ms'] or 0 for t in turns) / len(turns):.1f}"
+                print(f"{name:<18} | {sum(prompt_tokens) / len(prompt_tokens):>15.0f} | "
+                      f"{sum(prompt_ms) / len(prompt_ms):>14.1f} | {loads:>5} | {reused:>15} | {saved:>13}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: ReviewIndex BM25 search vs scanning the corpus
+Builds an index over a synthetic review corpus in appended chunks, then times
+top-k queries against a linear scan that tokenizes every review per query
+(what a model reading the CSV through read_file would force). Also reports
+the index size on disk and the cost of appending a small batch.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+from review_search import ReviewIndex, index_terms
+from text_analysis_benchmark import make_corpus
+
+QUERIES = ["battery life", "terrible customer service", "fast shipping", "waste of money", "screen size easy"]
+
+
+def scan_search(corpus, query, top_k):
+    """Documents containing any query term, ranked by summed term frequency"""
+    terms = set(index_terms(query))
+    scored = []
+    for doc_id, text in enumerate(corpus):
+        counts = index_terms(text)
+        score = sum(counts[term] for term in terms if term in counts)
+        if score:
+            scored.append((score, doc_id))
+    scored.sort(reverse=True)
+    return scored[:top_k]
+
+
+def directory_size_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--scan-documents", type=int, default=20_000,
+                        help="corpus size for the linear scan, which is much slower")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.documents)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ReviewIndex(os.path.join(tmp, "index"))
+        start = time.perf_counter()
+        for i in range(0, len(corpus), args.chunk_size):
+            index.add(corpus[i:i + args.chunk_size])
+        build = time.perf_counter() - start
+        print(f"indexed {len(index)} reviews in {build:.1f}s ({len(index) / build:.0f} docs/s), "
+              f"{len(index.segments)} segments, {directory_size_mb(index.path):.1f} MB on disk")
+
+        rng = random.Random(1)
+        start = time.perf_counter()
+        index.add(make_corpus(100, seed=rng.randint(0, 10 ** 6)))
+        print(f"appended 100 reviews in {(time.perf_counter() - start) * 1e3:.1f} ms\n")
+
+        print(f"{'query':<28} | {'hits':>7} | {'index ms':>8} | {'scan ms':>8} ({args.scan_documents} docs)")
+        print("-" * 75)
+        scan_corpus = corpus[:args.scan_documents]
+        for query in QUERIES:
+            index.search(query, args.top_k)  # warm the page cache
+            start = time.perf_counter()
+            result = index.search(query, args.top_k)
+            took = time.perf_counter() - start
+            start = time.perf_counter()
+            scan_search(scan_corpus, query, args.top_k)
+            scan = time.perf_counter() - start
+            print(f"{query:<28} | {result['total_hits']:>7} | {took * 1e3:>8.2f} | {scan * 1e3:>8.1f}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: TextAnalysisTool batch API vs per-document functions
+Compares calling count_words, count_characters and extract_keywords on each
+document (three tokenizations) with analyze_batch (one tokenization), in a
+single process and with a worker pool, on synthetic review corpora.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+from custom_tools import TextAnalysisTool
+
+VOCABULARY = (
+    "great product quality fast shipping love it terrible broke after one day "
+    "waste of money excellent customer service would not recommend the price "
+    "is too high works perfectly as described, arrived late! disappointed (again) "
+    "amazing value; five stars. battery life screen size easy to use"
+).split()
+
+
+def make_corpus(n_documents: int, seed: int = 42, min_words: int = 20, max_words: int = 120):
+    """Generate synthetic review-like documents"""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(min_words, max_words)))
+        for _ in range(n_documents)
+    ]
+
+
+def per_document(corpus, max_keywords):
+    """The original path: three separate passes over each document"""
+    return [
+        {
+            "word_count": TextAnalysisTool.count_words(text),
+            "character_count": TextAnalysisTool.count_characters(text),
+            "keywords": TextAnalysisTool.extract_keywords(text, max_keywords),
+            "text_length": len(text)
+        }
+        for text in corpus
+    ]
+
+
+def batch(corpus, max_keywords, processes=None):
+    return list(TextAnalysisTool.analyze_batch(corpus, max_keywords, processes=processes, chunk_size=512))
+
+
+def time_call(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--max-keywords", type=int, default=10)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} | {'per-document':>13} | {'batch':>13} | {'batch x' + str(args.processes):>13} | speedup")
+    print("-" * 70)
+
+    for size in args.sizes:
+        corpus = make_corpus(size)
+        t_single, expected = time_call(per_document, corpus, args.max_keywords)
+        t_batch, result = time_call(batch, corpus, args.max_keywords)
+        t_pool, pooled = time_call(batch, corpus, args.max_keywords, args.processes)
+
+        assert result == expected and pooled == expected, "batch results differ from per-document results"
+
+        rate = lambda t: f"{size / t:>9,.0f} d/s"
+        print(f"{size:>8} | {rate(t_single)} | {rate(t_batch)} | {rate(t_pool)} | "
+              f"{t_single / t_batch:.2f}x / {t_single / t_pool:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
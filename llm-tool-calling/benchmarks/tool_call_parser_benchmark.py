@@ -0,0 +1,88 @@
+"""
+Benchmark: ToolCallParser vs the original find/rfind extraction
+Times both approaches on large synthetic model responses and reports how many
+of the expected tool calls each one recovers.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+from tool_call_parser import ToolCallParser, parse_tool_calls
+
+
+def legacy_extract_tool_call(response):
+    """The original extract_tool_call: first '{' to last '}' and json.loads"""
+    try:
+        start_idx = response.find("{")
+        end_idx = response.rfind("}") + 1
+        if start_idx != -1 and end_idx != 0:
+            parsed = json.loads(response[start_idx:end_idx])
+            if "tool_call" in parsed:
+                return parsed["tool_call"]
+    except Exception:
+        pass
+    return None
+
+
+def tool_call_json(i, payload_size=0):
+    call = {"tool_call": {"name": "analyze_text",
+                          "parameters": {"text": "x" * payload_size + f" call {i}", "max_keywords": 5}}}
+    return json.dumps(call)
+
+
+def make_scenarios(size):
+    prose = "The model reasons about the request and explains its plan. " * (size // 60)
+    braced = "Use a set like {1, 2} or a dict {'k': v} here. " * (size // 48)
+    return {
+        "prose + 1 call": (prose + tool_call_json(0), 1),
+        "1 call, large payload": ("Calling now: " + tool_call_json(0, size), 1),
+        "prose with braces + 1 call": (braced + tool_call_json(0), 1),
+        "10 calls in prose": ("".join(prose[:size // 10] + tool_call_json(i) for i in range(10)), 10),
+    }
+
+
+def best_of(func, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def streamed(text, chunk_size=16):
+    """Feed the parser the way a token stream would"""
+    parser = ToolCallParser()
+    calls = []
+    for i in range(0, len(text), chunk_size):
+        calls += parser.feed(text[i:i + chunk_size])
+    calls += parser.close()
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<28} {'size':>9} | {'legacy ms':>9} found | {'parser ms':>9} found | {'stream ms':>9}")
+    print("-" * 90)
+    for size in args.sizes:
+        for name, (text, expected) in make_scenarios(size).items():
+            t_legacy, legacy = best_of(legacy_extract_tool_call, text, args.repeat)
+            t_parser, (calls, errors) = best_of(parse_tool_calls, text, args.repeat)
+            t_stream, stream_calls = best_of(streamed, text, 1)
+            assert stream_calls == calls
+            legacy_found = 0 if legacy is None else 1
+            print(f"{name:<28} {len(text):>9} | {t_legacy * 1e3:>9.2f} {legacy_found:>2}/{expected:<2} | "
+                  f"{t_parser * 1e3:>9.2f} {len(calls):>2}/{expected:<2} | {t_stream * 1e3:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,27 @@ Custom tools for Mistral Tool Calling Laboratory
 This module contains various tool definitions that can be used with Mistral's function calling capability.
 """
 
+import codecs
+import heapq
+import inspect
 import json
 import math
+import mmap
+import tempfile
+import time
 import requests
-from typing import Dict, Any, List
+from collections import Counter
+from concurrent.futures import ALL_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
+from functools import partial
+from operator import itemgetter
+from multiprocessing import Pool
 import os
 
+from instrumentation import count, observe, timed
+from result_cache import LRUCache, canonical_key
+
 class CalculatorTool:
     """Basic calculator operations"""
     
@@ -103,14 +117,121 @@ class FileOperationsTool:
     
     @staticmethod
     def write_file(file_path: str, content: str) -> str:
-        """Write content to a file"""
+        """Write content to a file atomically (temp file + rename)"""
+        tmp_path = None
         try:
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'w', encoding='utf-8') as file:
+            directory = os.path.dirname(file_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(file_path))
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
                 file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            # mkstemp creates the file as 0600; keep the mode open() would give
+            try:
+                mode = os.stat(file_path).st_mode & 0o7777
+            except FileNotFoundError:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, file_path)
             return f"Successfully wrote to {file_path}"
         except Exception as e:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
             return f"Error writing file: {str(e)}"
+
+    @staticmethod
+    def append_file(file_path: str, content: str) -> str:
+        """Append content to the end of a file"""
+        try:
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(file_path, 'a', encoding='utf-8') as file:
+                file.write(content)
+            return f"Successfully appended to {file_path}"
+        except Exception as e:
+            return f"Error appending to file: {str(e)}"
+
+    @staticmethod
+    def read_file_range(file_path: str, offset: int = 0, length: int = 65536) -> Dict[str, Any]:
+        """Read ``length`` bytes starting at byte ``offset``
+
+        Only the requested slice is read from disk. Bytes that split a UTF-8
+        character at the range edges are replaced rather than raising.
+        """
+        try:
+            file_size = os.path.getsize(file_path)
+            offset = max(0, min(offset, file_size))
+            with open(file_path, 'rb') as file:
+                file.seek(offset)
+                data = file.read(max(0, length))
+            next_offset = offset + len(data)
+            return {
+                "content": data.decode('utf-8', errors='replace'),
+                "offset": offset,
+                "next_offset": next_offset,
+                "file_size": file_size,
+                "eof": next_offset >= file_size
+            }
+        except FileNotFoundError:
+            return {"error": f"File not found: {file_path}"}
+        except Exception as e:
+            return {"error": f"Error reading file: {str(e)}"}
+
+    @staticmethod
+    def iter_lines(file_path: str, encoding: str = 'utf-8') -> Iterator[str]:
+        """Yield lines (without newline) from a memory-mapped file
+
+        The OS pages the file in on demand, so memory use stays flat no matter
+        how large the file is.
+        """
+        if os.path.getsize(file_path) == 0:
+            return
+        with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for line in iter(mapped.readline, b""):
+                yield line.rstrip(b"\r\n").decode(encoding, errors='replace')
+
+    @staticmethod
+    def iter_chunks(file_path: str, chunk_size: int = 1 << 20, encoding: str = 'utf-8') -> Iterator[str]:
+        """Yield the file as text chunks of about ``chunk_size`` bytes
+
+        An incremental decoder carries partial multi-byte characters over to
+        the next chunk, so chunks always decode cleanly.
+        """
+        if os.path.getsize(file_path) == 0:
+            return
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), chunk_size):
+                text = decoder.decode(mapped[start:start + chunk_size])
+                if text:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+
+    @staticmethod
+    def read_lines(file_path: str, start_line: int = 0, max_lines: int = 100) -> Dict[str, Any]:
+        """Read a page of lines so large files can be consumed incrementally"""
+        try:
+            lines = []
+            line_iter = FileOperationsTool.iter_lines(file_path)
+            for line_number, line in enumerate(line_iter):
+                if line_number < start_line:
+                    continue
+                if len(lines) == max_lines:
+                    return {"lines": lines, "start_line": start_line,
+                            "next_line": start_line + len(lines), "has_more": True}
+                lines.append(line)
+            return {"lines": lines, "start_line": start_line,
+                    "next_line": start_line + len(lines), "has_more": False}
+        except FileNotFoundError:
+            return {"error": f"File not found: {file_path}"}
+        except Exception as e:
+            return {"error": f"Error reading file: {str(e)}"}
     
     @staticmethod
     def list_directory(directory_path: str) -> List[str]:
@@ -122,6 +243,39 @@ class FileOperationsTool:
         except Exception as e:
             return [f"Error listing directory: {str(e)}"]
 
+    @staticmethod
+    def list_directory_page(directory_path: str, offset: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """List one page of a directory with size and modification time
+
+        Uses ``os.scandir`` so entries are streamed and stat data comes from the
+        directory scan where the OS provides it; only ``offset + limit`` entries
+        are visited. Order is the filesystem's, which is stable between calls
+        as long as the directory does not change.
+        """
+        try:
+            entries = []
+            has_more = False
+            with os.scandir(directory_path) as scanner:
+                for index, entry in enumerate(scanner):
+                    if index < offset:
+                        continue
+                    if len(entries) == limit:
+                        has_more = True
+                        break
+                    stat = entry.stat(follow_symlinks=False)
+                    entries.append({
+                        "name": entry.name,
+                        "is_dir": entry.is_dir(follow_symlinks=False),
+                        "size": stat.st_size,
+                        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
+                    })
+            return {"entries": entries, "offset": offset,
+                    "next_offset": offset + len(entries), "has_more": has_more}
+        except FileNotFoundError:
+            return {"error": f"Directory not found: {directory_path}"}
+        except Exception as e:
+            return {"error": f"Error listing directory: {str(e)}"}
+
 class TextAnalysisTool:
     """Text analysis and processing tools"""
     
@@ -155,98 +309,406 @@ class TextAnalysisTool:
         sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
         return [word for word, freq in sorted_words[:max_keywords]]
 
-# Tool schema definitions for Mistral
-TOOL_SCHEMAS = {
-    "calculator_add": {
-        "type": "function",
-        "function": {
-            "name": "calculator_add",
-            "description": "Add two numbers together",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "a": {"type": "number", "description": "First number"},
-                    "b": {"type": "number", "description": "Second number"}
-                },
-                "required": ["a", "b"]
-            }
-        }
-    },
-    "calculator_multiply": {
-        "type": "function",
-        "function": {
-            "name": "calculator_multiply", 
-            "description": "Multiply two numbers",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "a": {"type": "number", "description": "First number"},
-                    "b": {"type": "number", "description": "Second number"}
-                },
-                "required": ["a", "b"]
-            }
-        }
-    },
-    "get_weather": {
-        "type": "function",
-        "function": {
-            "name": "get_weather",
-            "description": "Get current weather information for a city",
-            "parameters": {
-                "type": "object", 
-                "properties": {
-                    "city": {"type": "string", "description": "City name"},
-                    "country": {"type": "string", "description": "Country code (optional)", "default": "US"}
-                },
-                "required": ["city"]
-            }
-        }
-    },
-    "analyze_text": {
-        "type": "function",
-        "function": {
-            "name": "analyze_text",
-            "description": "Analyze text and extract keywords and statistics",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "text": {"type": "string", "description": "Text to analyze"},
-                    "max_keywords": {"type": "integer", "description": "Maximum number of keywords to extract", "default": 10}
-                },
-                "required": ["text"]
-            }
+    # Batch API
+    # The methods below produce the same numbers as count_words,
+    # count_characters and extract_keywords, but tokenize each document once
+    # and count with Counter/heapq instead of a dict and a full sort.
+
+    KEYWORD_STOPWORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'})
+    KEYWORD_STRIP_CHARS = '.,!?;:"()[]'
+    # Below this many distinct words a full sort beats heapq.nlargest
+    TOP_K_SORT_THRESHOLD = 1000
+
+    @staticmethod
+    def keyword_counts(tokens: Iterable[str]) -> Counter:
+        """Count keyword candidates from lowercased whitespace tokens"""
+        stopwords = TextAnalysisTool.KEYWORD_STOPWORDS
+        strip_chars = TextAnalysisTool.KEYWORD_STRIP_CHARS
+        return Counter([token.strip(strip_chars) for token in tokens
+                        if len(token) > 2 and token not in stopwords])
+
+    @staticmethod
+    def top_keywords(counts: Counter, max_keywords: int = 10) -> List[str]:
+        """Top-k keywords by frequency; ties keep first-seen order"""
+        if len(counts) <= TextAnalysisTool.TOP_K_SORT_THRESHOLD:
+            top = sorted(counts.items(), key=itemgetter(1), reverse=True)[:max_keywords]
+        else:
+            top = heapq.nlargest(max_keywords, counts.items(), key=itemgetter(1))
+        return [word for word, freq in top]
+
+    @staticmethod
+    def analyze_document(text: str, max_keywords: int = 10, include_spaces: bool = True) -> Dict[str, Any]:
+        """Word count, character count and keywords from a single tokenization"""
+        tokens = text.lower().split()
+        counts = TextAnalysisTool.keyword_counts(tokens)
+        char_count = len(text) if include_spaces else len(text) - text.count(' ')
+
+        return {
+            "word_count": len(tokens),
+            "character_count": char_count,
+            "keywords": TextAnalysisTool.top_keywords(counts, max_keywords),
+            "text_length": len(text)
         }
-    }
-}
 
-def execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Any:
-    """Execute a tool with given parameters"""
-    
-    if tool_name == "calculator_add":
-        return CalculatorTool.add(parameters["a"], parameters["b"])
-    
-    elif tool_name == "calculator_multiply":
-        return CalculatorTool.multiply(parameters["a"], parameters["b"])
-    
-    elif tool_name == "get_weather":
-        city = parameters["city"]
-        country = parameters.get("country", "US")
-        return WeatherTool.get_current_weather(city, country)
-    
-    elif tool_name == "analyze_text":
-        text = parameters["text"]
-        max_keywords = parameters.get("max_keywords", 10)
-        
-        word_count = TextAnalysisTool.count_words(text)
-        char_count = TextAnalysisTool.count_characters(text)
-        keywords = TextAnalysisTool.extract_keywords(text, max_keywords)
-        
+    @staticmethod
+    def analyze_batch(documents: Iterable[str], max_keywords: int = 10, include_spaces: bool = True,
+                      processes: int = None, chunk_size: int = 256) -> Iterator[Dict[str, Any]]:
+        """Analyze a stream of documents, yielding one result per document in order
+
+        ``documents`` can be any iterable, such as a generator or an open file
+        with one document per line, so the corpus never has to fit in memory.
+        With ``processes > 1`` documents are sent to a worker pool in chunks of
+        ``chunk_size``.
+        """
+        analyze = partial(TextAnalysisTool.analyze_document, max_keywords=max_keywords,
+                          include_spaces=include_spaces)
+        if processes and processes > 1:
+            with Pool(processes) as pool:
+                yield from pool.imap(analyze, documents, chunksize=chunk_size)
+        else:
+            for text in documents:
+                yield analyze(text)
+
+    @staticmethod
+    def summarize_corpus(documents: Iterable[str], max_keywords: int = 10) -> Dict[str, Any]:
+        """Corpus totals and top keywords over a stream of documents in one pass"""
+        keyword_totals = Counter()
+        document_count = word_count = char_count = 0
+
+        for text in documents:
+            tokens = text.lower().split()
+            keyword_totals.update(TextAnalysisTool.keyword_counts(tokens))
+            document_count += 1
+            word_count += len(tokens)
+            char_count += len(text)
+
         return {
+            "document_count": document_count,
             "word_count": word_count,
             "character_count": char_count,
-            "keywords": keywords,
-            "text_length": len(text)
+            "keywords": TextAnalysisTool.top_keywords(keyword_totals, max_keywords)
         }
-    
-    else:
+
+# Tool registry
+# Each tool is registered with the @tool decorator, which derives its JSON schema
+# from the function signature and makes dispatch a single dictionary lookup.
+
+JSON_SCHEMA_TYPES = {
+    float: "number",
+    int: "integer",
+    str: "string",
+    bool: "boolean",
+    list: "array",
+    dict: "object"
+}
+
+DEFAULT_TOOL_TIMEOUT = 30.0
+
+# How often execute_tools_batch checks whether queued calls have started
+QUEUED_CALL_POLL_INTERVAL = 0.05
+
+
+class ToolSpec:
+    """A registered tool: the callable, its schema and dispatch settings"""
+
+    def __init__(self, name: str, func: Callable, description: str,
+                 param_descriptions: Dict[str, str] = None, timeout: float = None,
+                 cacheable: bool = False, cache_ttl: float = None):
+        self.name = name
+        self.func = func
+        self.description = description
+        self.timeout = timeout
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
+        self.signature = inspect.signature(func)
+        self.parameter_names = frozenset(self.signature.parameters)
+        self.schema = self._build_schema(param_descriptions or {})
+
+    def _build_schema(self, param_descriptions: Dict[str, str]) -> Dict[str, Any]:
+        """Build the function-calling schema from the signature"""
+        properties = {}
+        required = []
+
+        for param in self.signature.parameters.values():
+            prop = {"type": JSON_SCHEMA_TYPES.get(param.annotation, "string")}
+            if param.name in param_descriptions:
+                prop["description"] = param_descriptions[param.name]
+            if param.default is inspect.Parameter.empty:
+                required.append(param.name)
+            else:
+                prop["default"] = param.default
+            properties[param.name] = prop
+
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": required
+                }
+            }
+        }
+
+    def __call__(self, parameters: Dict[str, Any]) -> Any:
+        # Ignore extra keys the model may add, as the original dispatcher did
+        kwargs = {k: v for k, v in parameters.items() if k in self.parameter_names}
+        return self.func(**kwargs)
+
+
+TOOL_REGISTRY: Dict[str, ToolSpec] = {}
+
+# Tool schema definitions for Mistral (kept in sync with TOOL_REGISTRY)
+TOOL_SCHEMAS: Dict[str, Dict[str, Any]] = {}
+
+
+def tool(name: str, description: str, param_descriptions: Dict[str, str] = None,
+         timeout: float = None, cacheable: bool = False, cache_ttl: float = None) -> Callable:
+    """Decorator that registers a function as a tool
+
+    Only deterministic, side-effect-free tools should set ``cacheable=True``;
+    tools that write files or otherwise change state must never be cached.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        spec = ToolSpec(name, func, description, param_descriptions, timeout, cacheable, cache_ttl)
+        TOOL_REGISTRY[name] = spec
+        TOOL_SCHEMAS[name] = spec.schema
+        return func
+
+    return decorator
+
+
+@tool("calculator_add", "Add two numbers together",
+      {"a": "First number", "b": "Second number"}, cacheable=True)
+def calculator_add(a: float, b: float) -> float:
+    return CalculatorTool.add(a, b)
+
+
+@tool("calculator_multiply", "Multiply two numbers",
+      {"a": "First number", "b": "Second number"}, cacheable=True)
+def calculator_multiply(a: float, b: float) -> float:
+    return CalculatorTool.multiply(a, b)
+
+
+@tool("get_weather", "Get current weather information for a city",
+      {"city": "City name", "country": "Country code (optional)"},
+      cacheable=True, cache_ttl=300)
+def get_weather(city: str, country: str = "US") -> Dict[str, Any]:
+    return WeatherTool.get_current_weather(city, country)
+
+
+@tool("analyze_text", "Analyze text and extract keywords and statistics",
+      {"text": "Text to analyze", "max_keywords": "Maximum number of keywords to extract"},
+      cacheable=True)
+def analyze_text(text: str, max_keywords: int = 10) -> Dict[str, Any]:
+    return TextAnalysisTool.analyze_document(text, max_keywords)
+
+
+@tool("search_reviews", "Find the reviews most relevant to a keyword query (BM25 ranking)",
+      {"query": "Keywords to search for", "top_k": "Maximum number of reviews to return"})
+def search_reviews(query: str, top_k: int = 5) -> Dict[str, Any]:
+    # Imported here because review_search reuses TextAnalysisTool from this module
+    from review_search import DEFAULT_INDEX_PATH, open_index
+
+    index = open_index(DEFAULT_INDEX_PATH)
+    if index is None:
+        return {"error": f"No review index at {DEFAULT_INDEX_PATH}; build it with review_search.py add <csv>"}
+    return index.search(query, max(1, min(int(top_k), 50)))
+
+
+@tool("read_file_range", "Read a byte range of a file, for paging through large files",
+      {"file_path": "Path to the file",
+       "offset": "Byte offset to start reading from",
+       "length": "Maximum number of bytes to read"})
+def read_file_range(file_path: str, offset: int = 0, length: int = 65536) -> Dict[str, Any]:
+    return FileOperationsTool.read_file_range(file_path, offset, length)
+
+
+@tool("read_file_lines", "Read a page of lines from a text file",
+      {"file_path": "Path to the file",
+       "start_line": "Zero-based line number to start from",
+       "max_lines": "Maximum number of lines to return"})
+def read_file_lines(file_path: str, start_line: int = 0, max_lines: int = 100) -> Dict[str, Any]:
+    return FileOperationsTool.read_lines(file_path, start_line, max_lines)
+
+
+@tool("list_directory", "List a page of directory entries with size and modification time",
+      {"directory_path": "Path to the directory",
+       "offset": "Number of entries to skip",
+       "limit": "Maximum number of entries to return"})
+def list_directory(directory_path: str, offset: int = 0, limit: int = 100) -> Dict[str, Any]:
+    return FileOperationsTool.list_directory_page(directory_path, offset, limit)
+
+
+# Optional result cache consulted by execute_tool for cacheable tools
+TOOL_CACHE = None
+
+
+def enable_tool_cache(cache=None):
+    """Turn on result caching for cacheable tools
+
+    ``cache`` may be any backend from ``result_cache`` (``LRUCache`` or
+    ``SQLiteCache``); an in-memory LRU is used by default. Returns the cache so
+    its ``stats`` can be inspected.
+    """
+    global TOOL_CACHE
+    TOOL_CACHE = cache if cache is not None else LRUCache(max_size=1024)
+    return TOOL_CACHE
+
+
+def disable_tool_cache() -> None:
+    """Turn off result caching"""
+    global TOOL_CACHE
+    TOOL_CACHE = None
+
+
+def _tool_cache_key(spec: ToolSpec, parameters: Dict[str, Any]) -> str:
+    kwargs = {k: v for k, v in parameters.items() if k in spec.parameter_names}
+    return canonical_key("tool", spec.name, kwargs)
+
+
+def _cached_result(spec: ToolSpec, parameters: Dict[str, Any]) -> Tuple[bool, Any, Optional[str]]:
+    """Look up a tool result; returns ``(found, value, key)``"""
+    if TOOL_CACHE is None or not spec.cacheable:
+        return False, None, None
+    key = _tool_cache_key(spec, parameters)
+    found, value = TOOL_CACHE.get(key)
+    return found, value, key
+
+
+def _get_tool(tool_name: str) -> ToolSpec:
+    spec = TOOL_REGISTRY.get(tool_name)
+    if spec is None:
         raise ValueError(f"Unknown tool: {tool_name}")
+    return spec
+
+
+def execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Any:
+    """Execute a tool with given parameters"""
+    spec = _get_tool(tool_name)
+    found, value, key = _cached_result(spec, parameters)
+    if found:
+        count("tool_cache_hits_total", tool=tool_name)
+        return value
+
+    with timed("tool", tool=tool_name):
+        result = spec(parameters)
+    if key is not None:
+        TOOL_CACHE.set(key, result, ttl=spec.cache_ttl)
+    return result
+
+
+def _execute_tool_call(tool_name: str, parameters: Dict[str, Any]) -> Any:
+    """Module-level entry point so process pools can pickle the task
+
+    Returns ``(result, seconds)`` so the tool's own run time can be recorded
+    in the calling process, excluding time spent queued in the pool.
+    """
+    spec = _get_tool(tool_name)
+    start = time.perf_counter()
+    result = spec(parameters)
+    return result, time.perf_counter() - start
+
+
+def execute_tools_batch(tool_calls: List[Dict[str, Any]], max_workers: int = None,
+                        use_processes: bool = False, timeout: float = DEFAULT_TOOL_TIMEOUT) -> List[Dict[str, Any]]:
+    """Execute independent tool calls concurrently, returning results in call order
+
+    Each call is a ``{"name": ..., "parameters": ...}`` dict, the same shape
+    returned by ``extract_tool_call``. Each result is ``{"name", "result"}`` on
+    success or ``{"name", "error"}`` on failure or timeout. A tool's own
+    ``timeout`` (set at registration) overrides the batch-wide ``timeout``.
+    Use ``use_processes=True`` for CPU-bound tools; threads suit I/O-bound ones.
+
+    A call's timeout counts from when a worker starts running it, not from
+    when it was queued, so calls waiting for a free worker are never reported
+    as timed out. Running threads cannot be cancelled: a tool that times out
+    keeps running in the background and occupies its worker until it
+    returns. Queued calls that cannot start because every worker is held by
+    such a tool are reported as errors instead of waiting for them.
+    """
+    if not tool_calls:
+        return []
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    max_workers = max_workers or min(len(tool_calls), (os.cpu_count() or 1) * 4)
+    results: List[Dict[str, Any]] = [None] * len(tool_calls)
+
+    executor = executor_class(max_workers=max_workers)
+    try:
+        # The cache is consulted here, in the calling process, so that hits
+        # skip the pool entirely and process-pool results are stored too
+        pending = {}
+        for i, call in enumerate(tool_calls):
+            name = call.get("name")
+            parameters = call.get("parameters", {})
+            spec = TOOL_REGISTRY.get(name)
+            cache_key = None
+            if spec is not None:
+                found, value, cache_key = _cached_result(spec, parameters)
+                if found:
+                    count("tool_cache_hits_total", tool=name)
+                    results[i] = {"name": name, "result": value}
+                    continue
+            tool_timeout = spec.timeout if spec is not None and spec.timeout is not None else timeout
+            future = executor.submit(_execute_tool_call, name, parameters)
+            pending[future] = (i, tool_timeout, spec, cache_key)
+
+        # Futures turn running when a worker picks them up (for process
+        # pools, when they are handed to the pool's small call queue)
+        started: Dict[Any, float] = {}
+        timed_out = []
+        while pending:
+            now = time.monotonic()
+            for future in pending:
+                if future not in started and (future.running() or future.done()):
+                    started[future] = now
+
+            deadlines = [started[f] + pending[f][1] for f in pending if f in started and pending[f][1] is not None]
+            wait_timeout = max(0.0, min(deadlines) - now) if deadlines else None
+            if any(f not in started for f in pending):
+                wait_timeout = QUEUED_CALL_POLL_INTERVAL if wait_timeout is None \
+                    else min(wait_timeout, QUEUED_CALL_POLL_INTERVAL)
+            # Wakes when everything is done, at the nearest deadline or to check queued calls
+            done, _ = wait(list(pending), timeout=wait_timeout, return_when=ALL_COMPLETED)
+
+            for future in done:
+                i, tool_timeout, spec, cache_key = pending.pop(future)
+                name = tool_calls[i].get("name")
+                try:
+                    result, seconds = future.result()
+                    observe("tool", seconds, tool=name)
+                    if cache_key is not None:
+                        TOOL_CACHE.set(cache_key, result, ttl=spec.cache_ttl)
+                    results[i] = {"name": name, "result": result}
+                except Exception as e:
+                    count("errors_total", stage="tool", tool=name)
+                    results[i] = {"name": name, "error": str(e)}
+
+            now = time.monotonic()
+            for future in [f for f in pending if f in started and pending[f][1] is not None]:
+                i, tool_timeout, _, _ = pending[future]
+                if now >= started[future] + tool_timeout:
+                    del pending[future]
+                    timed_out.append(future)
+                    name = tool_calls[i].get("name")
+                    count("tool_timeouts_total", tool=name)
+                    results[i] = {"name": name, "error": f"Tool timed out after {tool_timeout}s"}
+
+            timed_out = [f for f in timed_out if not f.done()]
+            if len(timed_out) >= max_workers:
+                for future in [f for f in pending if f not in started]:
+                    if future.cancel():
+                        i = pending.pop(future)[0]
+                        name = tool_calls[i].get("name")
+                        count("errors_total", stage="tool", tool=name)
+                        results[i] = {"name": name,
+                                      "error": "Tool not started: every worker is busy with a timed-out tool"}
+    finally:
+        # Do not block on tools that timed out
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
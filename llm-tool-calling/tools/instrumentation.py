@@ -0,0 +1,384 @@
+"""
+Opt-in instrumentation for the tool-calling stack
+This module times the stages of a tool-calling turn (prompt formatting, the LLM
+request, tool call parsing and tool execution) into latency histograms and
+counters, exports them as JSON or Prometheus text, and profiles single turns
+with cProfile and tracemalloc.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Histogram upper bounds in seconds, from 1us (prompt formatting, parsing) to 60s (LLM calls)
+DEFAULT_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "tool_calling"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    """Latency histogram with fixed bucket bounds
+
+    Observations are counted in the first bucket whose bound is >= the value;
+    anything above the last bound goes to an overflow bucket. Quantiles are
+    interpolated within buckets, so they are estimates.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile (0 <= q <= 1)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)}
+        }
+
+
+class _StageTimer:
+    """Context manager recording its wall time into a histogram"""
+
+    __slots__ = ("metrics", "stage", "labels", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str, labels: Labels):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self) -> "_StageTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.metrics._observe(self.stage, self.labels, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.metrics._increment("errors_total", (("stage", self.stage),) + self.labels, 1)
+
+
+class _NullTimer:
+    """Shared no-op timer returned while instrumentation is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Thread-safe registry of stage latency histograms and event counters
+
+    Histograms are keyed by stage name plus labels (for example
+    ``stage="tool", tool="analyze_text"``), counters by name plus labels.
+    A stage that raises is timed as usual and also counted in
+    ``errors_total``.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.created = time.time()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    def timer(self, stage: str, **labels: Any) -> _StageTimer:
+        """Context manager timing one execution of ``stage``"""
+        return _StageTimer(self, stage, _labels(labels))
+
+    def observe(self, stage: str, seconds: float, **labels: Any) -> None:
+        """Record a duration measured elsewhere, e.g. in a worker process"""
+        self._observe(stage, _labels(labels), seconds)
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        self._increment(name, _labels(labels), value)
+
+    def _observe(self, stage: str, labels: Labels, seconds: float) -> None:
+        key = (stage, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def _increment(self, name: str, labels: Labels, value: float) -> None:
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def histogram(self, stage: str, **labels: Any) -> Optional[Histogram]:
+        return self._histograms.get((stage, _labels(labels)))
+
+    def counter(self, name: str, **labels: Any) -> float:
+        return self._counters.get((name, _labels(labels)), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Snapshot of every histogram and counter"""
+        with self._lock:
+            histograms = [{"stage": stage, "labels": dict(labels), **histogram.as_dict()}
+                          for (stage, labels), histogram in sorted(self._histograms.items())]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+        return {"created": self.created, "exported": time.time(),
+                "histograms": histograms, "counters": counters}
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per stage and label set with count, total and latency percentiles in ms"""
+        rows = []
+        for entry in self.as_dict()["histograms"]:
+            rows.append({
+                "stage": entry["stage"],
+                **entry["labels"],
+                "count": entry["count"],
+                "total_ms": entry["sum"] * 1000,
+                "mean_ms": entry["mean"] * 1000,
+                "p50_ms": entry["p50"] * 1000,
+                "p99_ms": entry["p99"] * 1000
+            })
+        return rows
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format"""
+        histogram_name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [f"# HELP {histogram_name} Wall time of each tool-calling stage",
+                 f"# TYPE {histogram_name} histogram"]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        for (stage, labels), histogram in histograms:
+            labels = (("stage", stage),) + labels
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{histogram_name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{histogram_name}_sum{_format_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{histogram_name}_count{_format_labels(labels)} {histogram.count}")
+
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export_json(self, path: str) -> str:
+        return _write_atomic(path, json.dumps(self.as_dict(), indent=2))
+
+    def export_prometheus(self, path: str) -> str:
+        """Write the Prometheus text format, e.g. for node_exporter's textfile collector"""
+        return _write_atomic(path, self.to_prometheus())
+
+
+def _write_atomic(path: str, text: str) -> str:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Registry used by the instrumented call sites; None means instrumentation is off
+METRICS = None
+
+
+def enable_instrumentation(metrics: Metrics = None) -> Metrics:
+    """Turn on stage timing and counters
+
+    Returns the active registry so it can be inspected or exported.
+    """
+    global METRICS
+    METRICS = metrics if metrics is not None else Metrics()
+    return METRICS
+
+
+def disable_instrumentation() -> None:
+    global METRICS
+    METRICS = None
+
+
+def get_metrics() -> Optional[Metrics]:
+    return METRICS
+
+
+def timed(stage: str, **labels: Any):
+    """Time ``stage`` when instrumentation is on; a shared no-op otherwise"""
+    metrics = METRICS
+    if metrics is None:
+        return _NULL_TIMER
+    return metrics.timer(stage, **labels)
+
+
+def observe(stage: str, seconds: float, **labels: Any) -> None:
+    metrics = METRICS
+    if metrics is not None:
+        metrics.observe(stage, seconds, **labels)
+
+
+def count(name: str, value: float = 1, **labels: Any) -> None:
+    metrics = METRICS
+    if metrics is not None:
+        metrics.increment(name, value, **labels)
+
+
+class TurnProfile:
+    """Result of :func:`profile_turn`
+
+    ``stats`` holds the ``pstats.Stats`` of the turn (None without cProfile);
+    ``memory_top`` lists the source lines that allocated the most memory still
+    held at the end of the turn, and ``peak_memory`` the traced peak in bytes.
+    """
+
+    def __init__(self):
+        self.elapsed = None
+        self.stats: Optional[pstats.Stats] = None
+        self.memory_top: List[Dict[str, Any]] = []
+        self.peak_memory = None
+
+    def stats_text(self, sort_by: str = "cumulative", limit: int = 25) -> str:
+        if self.stats is None:
+            return ""
+        stream = io.StringIO()
+        self.stats.stream = stream
+        self.stats.sort_stats(sort_by).print_stats(limit)
+        return stream.getvalue()
+
+    def as_dict(self, limit: int = 25) -> Dict[str, Any]:
+        return {
+            "elapsed": self.elapsed,
+            "peak_memory": self.peak_memory,
+            "memory_top": self.memory_top,
+            "profile": self.stats_text(limit=limit)
+        }
+
+
+@contextmanager
+def profile_turn(cpu: bool = True, memory: bool = True, memory_top: int = 10,
+                 output_path: str = None) -> Iterator[TurnProfile]:
+    """Profile the code in the block, typically one tool-calling turn
+
+    ``cpu`` runs cProfile and ``memory`` runs tracemalloc (which slows Python
+    allocation down noticeably, so use it on single turns only). With
+    ``output_path`` the cProfile data is dumped there for snakeviz or
+    ``pstats``, and a ``.json`` summary is written next to it.
+
+    Usage::
+
+        with profile_turn() as turn:
+            response = client.chat(messages, tools)
+            call = extract_tool_call(response)
+            execute_tool(call["name"], call["parameters"])
+        print(turn.stats_text())
+    """
+    result = TurnProfile()
+    profiler = cProfile.Profile() if cpu else None
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield result
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        result.elapsed = time.perf_counter() - start
+
+        if memory:
+            after = tracemalloc.take_snapshot()
+            _, result.peak_memory = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+            result.memory_top = [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                                  "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                                 for stat in diff[:memory_top]]
+
+        if profiler is not None:
+            result.stats = pstats.Stats(profiler)
+            if output_path:
+                result.stats.dump_stats(output_path)
+        if output_path:
+            _write_atomic(os.path.splitext(output_path)[0] + ".json", json.dumps(result.as_dict(), indent=2))
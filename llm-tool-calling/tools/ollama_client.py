@@ -3,99 +3,679 @@ Ollama client helper for Mistral Tool Calling
 This module provides a simple interface to interact with Ollama-hosted Mistral models
 """
 
+import asyncio
 import json
+import random
+import time
 import requests
-from typing import Dict, Any, List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from instrumentation import count, timed
+from result_cache import canonical_key
+from tool_call_parser import ToolCallParseError, ToolCallParser, parse_tool_calls
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+DEFAULT_MODEL = "mistral:7b-instruct"
+DEFAULT_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9
+}
+
+# HTTP status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Generation is neither idempotent nor cheap, so POSTs are only re-sent when
+# the server turned them away before doing any work
+POST_RETRY_STATUS_CODES = (429, 503)
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class _PostSafeRetry(Retry):
+    """Retry policy that re-sends a POST only on POST_RETRY_STATUS_CODES
+
+    POST is not in ``allowed_methods``, so read errors (such as a read
+    timeout during a long generation) are never retried for it; connection
+    errors still are, since the request never reached the server.
+    """
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method.upper() == "POST":
+            return status_code in POST_RETRY_STATUS_CODES
+        return super().is_retry(method, status_code, has_retry_after)
+
+# Ollama accepts a duration string ("30m") or seconds; a negative value keeps the model loaded
+KeepAlive = Union[str, float]
+
+
+def _build_generate_payload(model_name: str, prompt: str, system_prompt: str = None,
+                            stream: bool = False, context: List[int] = None,
+                            keep_alive: KeepAlive = None) -> Dict[str, Any]:
+    """Build the JSON body for /api/generate"""
+    data = {
+        "model": model_name,
+        "prompt": prompt,
+        "stream": stream,
+        "options": dict(DEFAULT_OPTIONS)
+    }
+
+    if system_prompt:
+        data["system"] = system_prompt
+    if context:
+        data["context"] = context
+    if keep_alive is not None:
+        data["keep_alive"] = keep_alive
+
+    return data
+
+
+def _build_chat_payload(model_name: str, messages: List[Dict[str, str]], tools: List[Dict] = None,
+                        stream: bool = False, keep_alive: KeepAlive = None) -> Dict[str, Any]:
+    """Build the JSON body for /api/chat"""
+    data = {
+        "model": model_name,
+        "messages": messages,
+        "stream": stream,
+        "options": dict(DEFAULT_OPTIONS)
+    }
+
+    if tools:
+        # Format tools for Ollama (simplified)
+        data["tools"] = tools
+    if keep_alive is not None:
+        data["keep_alive"] = keep_alive
+
+    return data
+
+
+def _payload_cache_key(endpoint: str, data: Dict[str, Any]) -> str:
+    """Cache key over everything that determines a non-streamed response"""
+    return canonical_key(endpoint, {k: v for k, v in data.items() if k not in ("stream", "keep_alive")})
+
+
+class StreamStats:
+    """Timing and token statistics for one streamed call
+
+    ``time_to_first_token`` is measured on the client from ``start()``, which
+    the stream calls just before sending its request, so time spent before
+    the caller starts iterating is not counted. ``tokens_per_second`` uses
+    the server-side ``eval_count``/``eval_duration`` reported in the final
+    NDJSON record when available, and falls back to chunks per wall-clock
+    second otherwise. ``chunk_count`` counts text chunks, not the final
+    ``done`` record.
+    """
+
+    def __init__(self):
+        self.start_time = None
+        self.first_token_time = None
+        self.end_time = None
+        self.chunk_count = 0
+        self.eval_count = None
+        self.eval_duration_ns = None
+        self.prompt_eval_count = None
+        self.prompt_eval_duration_ns = None
+
+    def start(self) -> None:
+        """Mark the moment the request is sent"""
+        self.start_time = time.perf_counter()
+
+    def record_chunk(self, record: Dict[str, Any]) -> None:
+        """Update statistics from one decoded NDJSON record"""
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+        if not record.get("done"):
+            self.chunk_count += 1
+        else:
+            self.end_time = time.perf_counter()
+            self.eval_count = record.get("eval_count")
+            self.eval_duration_ns = record.get("eval_duration")
+            self.prompt_eval_count = record.get("prompt_eval_count")
+            self.prompt_eval_duration_ns = record.get("prompt_eval_duration")
+
+    def finish(self) -> None:
+        """Mark the end of the stream if the server did not send a done record"""
+        if self.end_time is None:
+            self.end_time = time.perf_counter()
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Seconds from sending the request to receiving the first chunk"""
+        if self.first_token_time is None or self.start_time is None:
+            return None
+        return self.first_token_time - self.start_time
+
+    @property
+    def total_time(self) -> Optional[float]:
+        """Seconds from sending the request to the end of the stream"""
+        if self.end_time is None or self.start_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Generation throughput for this call"""
+        if self.eval_count and self.eval_duration_ns:
+            return self.eval_count / (self.eval_duration_ns / 1e9)
+        if self.first_token_time is not None and self.end_time is not None:
+            elapsed = self.end_time - self.first_token_time
+            if elapsed > 0:
+                return self.chunk_count / elapsed
+        return None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the statistics as a plain dictionary"""
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "total_time": self.total_time,
+            "tokens_per_second": self.tokens_per_second,
+            "chunk_count": self.chunk_count,
+            "eval_count": self.eval_count,
+            "prompt_eval_count": self.prompt_eval_count
+        }
+
+
+def _chunk_text(record: Dict[str, Any]) -> str:
+    """Extract the incremental text from a /api/generate or /api/chat record"""
+    if "response" in record:
+        return record["response"]
+    return record.get("message", {}).get("content", "")
+
+
+class TokenStream:
+    """Iterator over the incremental text chunks of a streamed call
+
+    Iterating yields text as it arrives. While iterating, the accumulated
+    ``text``, the per-call ``stats`` and the list of complete ``tool_calls``
+    (each added as soon as its JSON object closes) are kept up to date.
+    ``on_tool_call`` is invoked with every tool call the moment it is
+    detected, so it can be dispatched before the rest of the response has been
+    generated.
+    """
+
+    def __init__(self, records: Iterator[Dict[str, Any]], stats: StreamStats,
+                 on_tool_call: Callable[[Dict[str, Any]], Any] = None):
+        self._records = records
+        self.stats = stats
+        self.on_tool_call = on_tool_call
+        self.tool_calls: List[Dict[str, Any]] = []
+        self._parser = ToolCallParser()
+        self._chunks = []
+
+    @property
+    def tool_call(self) -> Optional[Dict[str, Any]]:
+        """First tool call seen so far"""
+        return self.tool_calls[0] if self.tool_calls else None
+
+    @property
+    def parse_errors(self) -> List[ToolCallParseError]:
+        """Tool call candidates that could not be decoded"""
+        return self._parser.errors
+
+    @property
+    def text(self) -> str:
+        """Text received so far"""
+        return "".join(self._chunks)
+
+    def _consume(self, record: Dict[str, Any]) -> str:
+        self.stats.record_chunk(record)
+        chunk = _chunk_text(record)
+        self._chunks.append(chunk)
+        if chunk:
+            self._add_tool_calls(self._parser.feed(chunk))
+        return chunk
+
+    def _add_tool_calls(self, calls: List[Dict[str, Any]]) -> None:
+        for call in calls:
+            self.tool_calls.append(call)
+            if self.on_tool_call is not None:
+                self.on_tool_call(call)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for record in self._records:
+                chunk = self._consume(record)
+                if chunk:
+                    yield chunk
+            self._add_tool_calls(self._parser.close())
+        finally:
+            self.stats.finish()
+
+    def read(self) -> str:
+        """Consume the rest of the stream and return the full text"""
+        for _ in self:
+            pass
+        return self.text
+
+    def first_tool_call(self) -> Optional[Dict[str, Any]]:
+        """Consume the stream until a tool call closes and return it"""
+        if self.tool_call is None:
+            for _ in self:
+                if self.tool_call is not None:
+                    break
+        return self.tool_call
+
+
+class AsyncTokenStream(TokenStream):
+    """Async iterator counterpart of :class:`TokenStream`"""
+
+    def __init__(self, records: AsyncIterator[Dict[str, Any]], stats: StreamStats,
+                 on_tool_call: Callable[[Dict[str, Any]], Any] = None):
+        super().__init__(records, stats, on_tool_call)
+
+    def __iter__(self):
+        raise TypeError("AsyncTokenStream must be consumed with 'async for'")
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        try:
+            async for record in self._records:
+                chunk = self._consume(record)
+                if chunk:
+                    yield chunk
+            self._add_tool_calls(self._parser.close())
+        finally:
+            self.stats.finish()
+
+    async def read(self) -> str:
+        """Consume the rest of the stream and return the full text"""
+        async for _ in self:
+            pass
+        return self.text
+
+    async def first_tool_call(self) -> Optional[Dict[str, Any]]:
+        """Consume the stream until a tool call closes and return it"""
+        if self.tool_call is None:
+            async for _ in self:
+                if self.tool_call is not None:
+                    break
+        return self.tool_call
+
 
 class OllamaClient:
-    """Simple client for Ollama API"""
-    
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    """Client for the Ollama API backed by a pooled, keep-alive HTTP session
+
+    All calls share one ``requests.Session`` so TCP connections are reused
+    between requests. Every request has a timeout, and transient failures
+    are retried with exponential backoff: connection errors, plus read errors
+    and 429/5xx responses for GETs. Generation POSTs are only re-sent after
+    connection errors and 429/503 responses, never after a read timeout.
+
+    Pass a ``result_cache`` backend as ``cache`` to memoize successful
+    ``generate``/``chat`` responses keyed by model, options and prompt or
+    messages. Streaming calls are never cached. ``keep_alive`` is sent with
+    every request to control how long the server keeps the model loaded;
+    ``None`` leaves the server default.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, model_name: str = DEFAULT_MODEL,
+                 pool_size: int = 10, timeout: Timeout = (5.0, 120.0),
+                 max_retries: int = 3, backoff_factor: float = 0.5, cache=None,
+                 keep_alive: KeepAlive = None):
         self.base_url = base_url
-        self.model_name = "mistral:7b-instruct"
-    
+        self.model_name = model_name
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+        self.keep_alive = keep_alive
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        """Create a session with a connection pool and retry policy"""
+        retry = _PostSafeRetry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=retry,
+            pool_block=True
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self) -> None:
+        """Release pooled connections"""
+        self.session.close()
+
+    def __enter__(self) -> "OllamaClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     def is_available(self) -> bool:
         """Check if Ollama is running and accessible"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
             return response.status_code == 200
-        except:
+        except requests.RequestException:
             return False
-    
+
     def list_models(self) -> List[str]:
         """List available models"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags")
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=self.timeout)
             if response.status_code == 200:
                 data = response.json()
                 return [model["name"] for model in data.get("models", [])]
             return []
-        except:
+        except (requests.RequestException, ValueError):
             return []
-    
+
+    def request_json(self, endpoint: str, data: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """POST a non-streamed request to /api/<endpoint>
+
+        Returns ``(record, None)`` with the decoded response, which includes
+        the server's ``context`` and timing fields, or ``(None, error)`` with
+        the same error text ``generate``/``chat`` return.
+        """
+        try:
+            with timed("llm_request", endpoint=endpoint):
+                response = self.session.post(f"{self.base_url}/api/{endpoint}", json=data, timeout=self.timeout)
+                record = response.json() if response.status_code == 200 else None
+            count("llm_requests_total", endpoint=endpoint, status=response.status_code)
+            if record is None:
+                return None, f"Error: {response.status_code} - {response.text}"
+            return record, None
+        except Exception as e:
+            return None, f"Connection error: {str(e)}"
+
     def generate(self, prompt: str, system_prompt: str = None, tools: List[Dict] = None) -> str:
         """Generate response from Mistral model"""
-        
-        # Prepare the request
-        data = {
-            "model": self.model_name,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9
-            }
-        }
-        
-        if system_prompt:
-            data["system"] = system_prompt
-        
+        data = _build_generate_payload(self.model_name, prompt, system_prompt, keep_alive=self.keep_alive)
+        cache_key = _payload_cache_key("generate", data) if self.cache is not None else None
+        if cache_key is not None:
+            found, value = self.cache.get(cache_key)
+            if found:
+                count("llm_cache_hits_total", endpoint="generate")
+                return value
+
+        record, error = self.request_json("generate", data)
+        if error is not None:
+            return error
+        result = record.get("response", "")
+        if cache_key is not None:
+            self.cache.set(cache_key, result)
+        return result
+
+    def chat(self, messages: List[Dict[str, str]], tools: List[Dict] = None) -> str:
+        """Chat with Mistral model using conversation format"""
+        data = _build_chat_payload(self.model_name, messages, tools, keep_alive=self.keep_alive)
+        cache_key = _payload_cache_key("chat", data) if self.cache is not None else None
+        if cache_key is not None:
+            found, value = self.cache.get(cache_key)
+            if found:
+                count("llm_cache_hits_total", endpoint="chat")
+                return value
+
+        record, error = self.request_json("chat", data)
+        if error is not None:
+            return error
+        result = record.get("message", {}).get("content", "")
+        if cache_key is not None:
+            self.cache.set(cache_key, result)
+        return result
+
+    def _stream_records(self, path: str, data: Dict[str, Any], stats: StreamStats) -> Iterator[Dict[str, Any]]:
+        """POST a streaming request and yield decoded NDJSON records"""
+        stats.start()
         try:
-            response = requests.post(f"{self.base_url}/api/generate", json=data)
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("response", "")
+            response = self.session.post(f"{self.base_url}{path}", json=data,
+                                         timeout=self.timeout, stream=True)
+        except Exception as e:
+            yield {"response": f"Connection error: {str(e)}", "done": True}
+            return
+
+        with response:
+            if response.status_code != 200:
+                yield {"response": f"Error: {response.status_code} - {response.text}", "done": True}
+                return
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def generate_stream(self, prompt: str, system_prompt: str = None,
+                        on_tool_call: Callable[[Dict[str, Any]], Any] = None) -> TokenStream:
+        """Stream a response from Mistral model chunk by chunk"""
+        data = _build_generate_payload(self.model_name, prompt, system_prompt, stream=True,
+                                       keep_alive=self.keep_alive)
+        stats = StreamStats()
+        return TokenStream(self._stream_records("/api/generate", data, stats), stats, on_tool_call)
+
+    def chat_stream(self, messages: List[Dict[str, str]], tools: List[Dict] = None,
+                    on_tool_call: Callable[[Dict[str, Any]], Any] = None) -> TokenStream:
+        """Stream a chat response from Mistral model chunk by chunk"""
+        data = _build_chat_payload(self.model_name, messages, tools, stream=True, keep_alive=self.keep_alive)
+        stats = StreamStats()
+        return TokenStream(self._stream_records("/api/chat", data, stats), stats, on_tool_call)
+
+
+class AsyncOllamaClient:
+    """Asyncio client for the Ollama API with a concurrency cap
+
+    Mirrors the ``generate``/``chat`` surface of :class:`OllamaClient` so that
+    hundreds of prompts can be in flight on a single event loop. At most
+    ``max_concurrency`` requests hit the server at once; the rest wait on a
+    semaphore. Requires the optional ``aiohttp`` package. ``cache`` and
+    ``keep_alive`` behave as in :class:`OllamaClient`.
+
+    Usage::
+
+        async with AsyncOllamaClient(max_concurrency=32) as client:
+            answers = await client.generate_many(prompts)
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, model_name: str = DEFAULT_MODEL,
+                 max_concurrency: int = 16, pool_size: int = None,
+                 timeout: Timeout = (5.0, 120.0), max_retries: int = 3,
+                 backoff_factor: float = 0.5, cache=None, keep_alive: KeepAlive = None):
+        self.base_url = base_url
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size or max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+        self.keep_alive = keep_alive
+        self._semaphore = None
+        self._session = None
+
+    async def _get_session(self):
+        """Lazily create the aiohttp session on the running event loop"""
+        if self._session is None or self._session.closed:
+            try:
+                import aiohttp
+            except ImportError as e:
+                raise ImportError("AsyncOllamaClient requires aiohttp: pip install aiohttp") from e
+
+            if isinstance(self.timeout, tuple):
+                connect_timeout, read_timeout = self.timeout
             else:
-                return f"Error: {response.status_code} - {response.text}"
+                connect_timeout = read_timeout = self.timeout
+
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            client_timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=client_timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self) -> None:
+        """Release pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "AsyncOllamaClient":
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter, matching urllib3's schedule"""
+        return self.backoff_factor * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def _request(self, method: str, path: str, data: Dict[str, Any] = None) -> Tuple[int, str]:
+        """Send a request, retrying as ``OllamaClient`` does (POSTs only if never processed)"""
+        import aiohttp
+
+        session = await self._get_session()
+        url = f"{self.base_url}{path}"
+        is_post = method.upper() == "POST"
+        retry_statuses = POST_RETRY_STATUS_CODES if is_post else RETRY_STATUS_CODES
+        retry_errors = aiohttp.ClientConnectorError if is_post else (aiohttp.ClientError, asyncio.TimeoutError)
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with session.request(method, url, json=data) as response:
+                        body = await response.text()
+                        if response.status not in retry_statuses or attempt == self.max_retries:
+                            return response.status, body
+                except retry_errors:
+                    if attempt == self.max_retries:
+                        raise
+                await asyncio.sleep(self._backoff_delay(attempt))
+
+    async def is_available(self) -> bool:
+        """Check if Ollama is running and accessible"""
+        try:
+            status, _ = await self._request("GET", "/api/tags")
+            return status == 200
+        except Exception:
+            return False
+
+    async def list_models(self) -> List[str]:
+        """List available models"""
+        try:
+            status, body = await self._request("GET", "/api/tags")
+            if status == 200:
+                data = json.loads(body)
+                return [model["name"] for model in data.get("models", [])]
+            return []
+        except Exception:
+            return []
+
+    async def generate(self, prompt: str, system_prompt: str = None, tools: List[Dict] = None) -> str:
+        """Generate response from Mistral model"""
+        data = _build_generate_payload(self.model_name, prompt, system_prompt, keep_alive=self.keep_alive)
+        cache_key = _payload_cache_key("generate", data) if self.cache is not None else None
+        if cache_key is not None:
+            found, value = self.cache.get(cache_key)
+            if found:
+                count("llm_cache_hits_total", endpoint="generate")
+                return value
+
+        try:
+            with timed("llm_request", endpoint="generate"):
+                status, body = await self._request("POST", "/api/generate", data)
+                result = json.loads(body).get("response", "") if status == 200 else None
+            count("llm_requests_total", endpoint="generate", status=status)
+            if status == 200:
+                if cache_key is not None:
+                    self.cache.set(cache_key, result)
+                return result
+            else:
+                return f"Error: {status} - {body}"
         except Exception as e:
             return f"Connection error: {str(e)}"
-    
-    def chat(self, messages: List[Dict[str, str]], tools: List[Dict] = None) -> str:
+
+    async def chat(self, messages: List[Dict[str, str]], tools: List[Dict] = None) -> str:
         """Chat with Mistral model using conversation format"""
-        
-        data = {
-            "model": self.model_name,
-            "messages": messages,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9
-            }
-        }
-        
-        if tools:
-            # Format tools for Ollama (simplified)
-            data["tools"] = tools
-        
+        data = _build_chat_payload(self.model_name, messages, tools, keep_alive=self.keep_alive)
+        cache_key = _payload_cache_key("chat", data) if self.cache is not None else None
+        if cache_key is not None:
+            found, value = self.cache.get(cache_key)
+            if found:
+                count("llm_cache_hits_total", endpoint="chat")
+                return value
+
         try:
-            response = requests.post(f"{self.base_url}/api/chat", json=data)
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("message", {}).get("content", "")
+            with timed("llm_request", endpoint="chat"):
+                status, body = await self._request("POST", "/api/chat", data)
+                result = json.loads(body).get("message", {}).get("content", "") if status == 200 else None
+            count("llm_requests_total", endpoint="chat", status=status)
+            if status == 200:
+                if cache_key is not None:
+                    self.cache.set(cache_key, result)
+                return result
             else:
-                return f"Error: {response.status_code} - {response.text}"
+                return f"Error: {status} - {body}"
         except Exception as e:
             return f"Connection error: {str(e)}"
 
-def format_tool_call_prompt(user_message: str, available_tools: List[Dict]) -> str:
-    """Format a prompt for tool calling with Mistral"""
-    
+    async def _stream_records(self, path: str, data: Dict[str, Any],
+                              stats: StreamStats) -> AsyncIterator[Dict[str, Any]]:
+        """POST a streaming request and yield decoded NDJSON records"""
+        try:
+            session = await self._get_session()
+            async with self._semaphore:
+                stats.start()
+                async with session.post(f"{self.base_url}{path}", json=data) as response:
+                    if response.status != 200:
+                        body = await response.text()
+                        yield {"response": f"Error: {response.status} - {body}", "done": True}
+                        return
+                    async for line in response.content:
+                        line = line.strip()
+                        if line:
+                            yield json.loads(line)
+        except ImportError:
+            raise
+        except Exception as e:
+            yield {"response": f"Connection error: {str(e)}", "done": True}
+
+    def generate_stream(self, prompt: str, system_prompt: str = None,
+                        on_tool_call: Callable[[Dict[str, Any]], Any] = None) -> AsyncTokenStream:
+        """Stream a response from Mistral model chunk by chunk"""
+        data = _build_generate_payload(self.model_name, prompt, system_prompt, stream=True,
+                                       keep_alive=self.keep_alive)
+        stats = StreamStats()
+        return AsyncTokenStream(self._stream_records("/api/generate", data, stats), stats, on_tool_call)
+
+    def chat_stream(self, messages: List[Dict[str, str]], tools: List[Dict] = None,
+                    on_tool_call: Callable[[Dict[str, Any]], Any] = None) -> AsyncTokenStream:
+        """Stream a chat response from Mistral model chunk by chunk"""
+        data = _build_chat_payload(self.model_name, messages, tools, stream=True, keep_alive=self.keep_alive)
+        stats = StreamStats()
+        return AsyncTokenStream(self._stream_records("/api/chat", data, stats), stats, on_tool_call)
+
+    async def generate_many(self, prompts: Sequence[str], system_prompt: str = None) -> List[str]:
+        """Generate responses for many prompts concurrently, preserving order"""
+        return await asyncio.gather(*(self.generate(p, system_prompt) for p in prompts))
+
+    async def chat_many(self, conversations: Sequence[List[Dict[str, str]]],
+                        tools: List[Dict] = None) -> List[str]:
+        """Run many chat conversations concurrently, preserving order"""
+        return await asyncio.gather(*(self.chat(m, tools) for m in conversations))
+
+
+def format_tool_preamble(available_tools: List[Dict]) -> str:
+    """The static part of the tool calling prompt: tool list and call format
+
+    It depends only on the tools, so it is byte-identical across turns and
+    the server can reuse its evaluated prefix.
+    """
     tools_description = "\n".join([
         f"- {tool['function']['name']}: {tool['function']['description']}"
         for tool in available_tools
     ])
     
-    prompt = f"""You are an AI assistant with access to the following tools:
+    return f"""You are an AI assistant with access to the following tools:
 
 {tools_description}
 
@@ -110,26 +690,239 @@ When you need to use a tool, respond with a JSON object in this format:
     }}
 }}
 
-If you don't need to use any tools, respond normally.
+If you don't need to use any tools, respond normally."""
+
+
+def format_tool_call_prompt(user_message: str, available_tools: List[Dict]) -> str:
+    """Format a prompt for tool calling with Mistral"""
+    with timed("format_prompt"):
+        return f"{format_tool_preamble(available_tools)}\n\nUser message: {user_message}"
 
-User message: {user_message}"""
-    
-    return prompt
 
 def extract_tool_call(response: str) -> Optional[Dict[str, Any]]:
-    """Extract tool call from model response"""
-    try:
-        # Look for JSON in the response
-        start_idx = response.find("{")
-        end_idx = response.rfind("}") + 1
-        
-        if start_idx != -1 and end_idx != 0:
-            json_str = response[start_idx:end_idx]
-            parsed = json.loads(json_str)
-            
-            if "tool_call" in parsed:
-                return parsed["tool_call"]
-    except:
-        pass
-    
-    return None
+    """Extract the first tool call from model response"""
+    with timed("parse"):
+        tool_calls, errors = parse_tool_calls(response)
+    count("tool_calls_parsed_total", len(tool_calls))
+    count("tool_call_parse_errors_total", len(errors))
+    return tool_calls[0] if tool_calls else None
+
+
+def extract_tool_calls(response: str) -> List[Dict[str, Any]]:
+    """Extract every tool call from model response, in order"""
+    with timed("parse"):
+        tool_calls, errors = parse_tool_calls(response)
+    count("tool_calls_parsed_total", len(tool_calls))
+    count("tool_call_parse_errors_total", len(errors))
+    return tool_calls
+
+
+# Ollama's default num_ctx; raise it together with the model's num_ctx option
+DEFAULT_MAX_CONTEXT_TOKENS = 2048
+# Tokens kept free in the context window for the model's reply
+DEFAULT_RESPONSE_TOKENS = 512
+DEFAULT_KEEP_ALIVE = "30m"
+# Role markers and separators the chat template adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+class TurnStats:
+    """Server-side timing of one session turn
+
+    ``reused_tokens`` counts prompt tokens the server did not have to
+    evaluate again: the ``context`` sent with a ``generate`` turn, or for
+    ``chat`` the estimated prompt size minus ``prompt_eval_count``.
+    ``saved_ms`` prices those tokens at the turn's own prompt-eval rate.
+    ``trimmed`` is the number of history messages dropped before a ``chat``
+    turn, or 1 when a ``generate`` turn had to drop its context.
+    """
+
+    def __init__(self, mode: str, record: Dict[str, Any], reused_tokens: int, trimmed: int = 0):
+        self.mode = mode
+        self.prompt_eval_count = record.get("prompt_eval_count") or 0
+        self.prompt_eval_ms = (record.get("prompt_eval_duration") or 0) / 1e6
+        self.eval_count = record.get("eval_count") or 0
+        self.eval_ms = (record.get("eval_duration") or 0) / 1e6
+        self.load_ms = (record.get("load_duration") or 0) / 1e6
+        self.total_ms = (record.get("total_duration") or 0) / 1e6
+        self.reused_tokens = reused_tokens
+        self.trimmed = trimmed
+
+    @property
+    def saved_ms(self) -> Optional[float]:
+        """Estimated prompt-eval time avoided by reusing tokens"""
+        if not self.prompt_eval_count:
+            return None
+        return self.reused_tokens * self.prompt_eval_ms / self.prompt_eval_count
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "prompt_eval_count": self.prompt_eval_count,
+            "prompt_eval_ms": self.prompt_eval_ms,
+            "eval_count": self.eval_count,
+            "eval_ms": self.eval_ms,
+            "load_ms": self.load_ms,
+            "total_ms": self.total_ms,
+            "reused_tokens": self.reused_tokens,
+            "saved_ms": self.saved_ms,
+            "trimmed": self.trimmed
+        }
+
+
+class OllamaSession:
+    """Multi-turn conversation on top of :class:`OllamaClient`
+
+    The tool preamble (``format_tool_preamble``) plus ``system_prompt`` form a
+    prefix that is built once and sent byte-identical on every turn, so the
+    server's prompt cache covers it. Every request carries ``keep_alive`` so
+    the model stays loaded between bursts of turns.
+
+    Use one of the two modes per session:
+
+    - ``generate`` sends only the new user message together with the
+      ``context`` tokens returned by the previous turn, so earlier turns are
+      neither re-sent nor re-templated. When the context would exceed
+      ``max_context_tokens`` it is dropped and the next turn starts again
+      from the prefix.
+    - ``chat`` re-sends the prefix as the system message plus the history,
+      dropping the oldest turns once the estimated size exceeds
+      ``max_context_tokens`` minus ``response_tokens``. ``count_tokens`` can
+      be replaced with the model's tokenizer for an exact budget.
+
+    ``turns`` holds a :class:`TurnStats` per successful turn; ``summary()``
+    totals them. Errors are returned as text, as by ``OllamaClient``, and
+    leave the conversation state unchanged.
+
+    Usage::
+
+        with OllamaClient() as client:
+            session = OllamaSession(client, tools=list(TOOL_SCHEMAS.values()))
+            reply = session.generate("What's the weather in Rome?")
+            call = extract_tool_call(reply)
+    """
+
+    def __init__(self, client: OllamaClient, tools: List[Dict] = None, system_prompt: str = None,
+                 keep_alive: KeepAlive = DEFAULT_KEEP_ALIVE,
+                 max_context_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+                 response_tokens: int = DEFAULT_RESPONSE_TOKENS,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        self.client = client
+        self.keep_alive = keep_alive
+        self.max_context_tokens = max_context_tokens
+        self.response_tokens = response_tokens
+        self.count_tokens = count_tokens
+        parts = [format_tool_preamble(tools)] if tools else []
+        if system_prompt:
+            parts.append(system_prompt)
+        self.prefix = "\n\n".join(parts)
+        self.prefix_tokens = count_tokens(self.prefix) if self.prefix else 0
+        self.context: Optional[List[int]] = None
+        self.history: List[Dict[str, str]] = []
+        self._history_tokens: List[int] = []
+        self.turns: List[TurnStats] = []
+
+    @property
+    def history_budget(self) -> int:
+        """Tokens available to the chat history"""
+        return self.max_context_tokens - self.response_tokens - self.prefix_tokens
+
+    def reset(self) -> None:
+        """Forget the conversation; the prefix and statistics are kept"""
+        self.context = None
+        self.history = []
+        self._history_tokens = []
+
+    def load(self) -> bool:
+        """Load the model now and pin it for ``keep_alive``"""
+        data = {"model": self.client.model_name, "keep_alive": self.keep_alive}
+        _, error = self.client.request_json("generate", data)
+        return error is None
+
+    def unload(self) -> bool:
+        """Ask the server to release the model immediately"""
+        data = {"model": self.client.model_name, "keep_alive": 0}
+        _, error = self.client.request_json("generate", data)
+        return error is None
+
+    def generate(self, user_message: str) -> str:
+        """Send one turn through /api/generate, reusing the previous context"""
+        prompt = f"User message: {user_message}"
+        budget = self.max_context_tokens - self.response_tokens
+        trimmed = 0
+        if self.context and len(self.context) + self.count_tokens(prompt) > budget:
+            self.context = None
+            trimmed = 1
+
+        # The prefix is already part of the context after the first turn
+        system_prompt = None if self.context else (self.prefix or None)
+        data = _build_generate_payload(self.client.model_name, prompt, system_prompt,
+                                       context=self.context, keep_alive=self.keep_alive)
+        record, error = self.client.request_json("generate", data)
+        if error is not None:
+            return error
+
+        self.turns.append(TurnStats("generate", record, len(self.context or ()), trimmed))
+        self.context = record.get("context") or None
+        return record.get("response", "")
+
+    def chat(self, user_message: str) -> str:
+        """Send one turn through /api/chat with the trimmed history"""
+        self.history.append({"role": "user", "content": user_message})
+        self._history_tokens.append(self.count_tokens(user_message) + MESSAGE_OVERHEAD_TOKENS)
+        trimmed = self._trim_history()
+
+        messages = ([{"role": "system", "content": self.prefix}] if self.prefix else []) + self.history
+        data = _build_chat_payload(self.client.model_name, messages, keep_alive=self.keep_alive)
+        record, error = self.client.request_json("chat", data)
+        if error is not None:
+            self.history.pop()
+            self._history_tokens.pop()
+            return error
+
+        prompt_tokens = self.prefix_tokens + sum(self._history_tokens)
+        reused = max(0, prompt_tokens - (record.get("prompt_eval_count") or prompt_tokens))
+        self.turns.append(TurnStats("chat", record, reused, trimmed))
+
+        reply = record.get("message", {}).get("content", "")
+        self.history.append({"role": "assistant", "content": reply})
+        self._history_tokens.append(self.count_tokens(reply) + MESSAGE_OVERHEAD_TOKENS)
+        return reply
+
+    def _trim_history(self) -> int:
+        """Drop the oldest turns until the history fits; returns messages dropped"""
+        dropped = 0
+        total = sum(self._history_tokens)
+        # The newest user message is always kept, even if it alone is over budget
+        while total > self.history_budget and len(self.history) > 1:
+            total -= self._history_tokens.pop(0)
+            self.history.pop(0)
+            dropped += 1
+            # Never start the history with an orphaned assistant reply
+            if len(self.history) > 1 and self.history[0]["role"] == "assistant":
+                total -= self._history_tokens.pop(0)
+                self.history.pop(0)
+                dropped += 1
+        return dropped
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals over all turns, with prompt-eval tokens and time saved per turn"""
+        turns = len(self.turns)
+        saved_ms = sum(t.saved_ms or 0 for t in self.turns)
+        reused = sum(t.reused_tokens for t in self.turns)
+        return {
+            "turns": turns,
+            "prompt_eval_tokens": sum(t.prompt_eval_count for t in self.turns),
+            "prompt_eval_ms": sum(t.prompt_eval_ms for t in self.turns),
+            "load_ms": sum(t.load_ms for t in self.turns),
+            "reused_tokens": reused,
+            "reused_tokens_per_turn": reused / turns if turns else 0.0,
+            "saved_ms": saved_ms,
+            "saved_ms_per_turn": saved_ms / turns if turns else 0.0,
+            "trimmed": sum(t.trimmed for t in self.turns)
+        }
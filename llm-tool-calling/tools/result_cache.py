@@ -0,0 +1,206 @@
+"""
+Result caching for tool calls and LLM responses
+This module provides pluggable memoization backends: an in-memory LRU cache with
+optional TTL and an on-disk SQLite cache that survives restarts.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def canonical_key(*parts: Any) -> str:
+    """Hash arbitrary JSON-like parts into a stable cache key
+
+    Dictionaries are serialized with sorted keys so that parameter order does
+    not change the key.
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    """Hit, miss and eviction counters shared by all cache backends"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hit_rate
+        }
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with an optional time-to-live"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._data: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return ``(found, value)`` for a key"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return False, None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return False, None
+
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries if full"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """On-disk cache backed by a single SQLite table
+
+    Values are pickled. Entries carry an absolute expiry time and a last-access
+    time. The row count is tracked in memory; once it exceeds ``max_size``
+    the table is recounted and the least recently used rows are evicted,
+    down to ``evict_fraction`` below ``max_size`` so the next eviction is
+    many writes away.
+    """
+
+    def __init__(self, path: str = "cache/results.sqlite", max_size: int = 100000,
+                 ttl: Optional[float] = None, evict_fraction: float = 0.01):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evict_fraction = evict_fraction
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "expires_at REAL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access)")
+        self._conn.commit()
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return ``(found, value)`` for a key"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return False, None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return False, None
+
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats.hits += 1
+            return True, pickle.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used rows if full"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, blob, expires_at, now)
+            )
+            if exists is None:
+                self._count += 1
+            if self._count > self.max_size:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Recount, then drop least recently used rows to below max_size"""
+        # Other connections to the same file may have added or removed rows
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        overflow = self._count - self.max_size
+        if overflow <= 0:
+            return
+        overflow += int(self.max_size * self.evict_fraction)
+        deleted = self._conn.execute(
+            "DELETE FROM cache WHERE rowid IN "
+            "(SELECT rowid FROM cache ORDER BY last_access ASC LIMIT ?)",
+            (overflow,)
+        ).rowcount
+        self._count -= deleted
+        self.stats.evictions += deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self._count = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        return count
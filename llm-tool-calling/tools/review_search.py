@@ -0,0 +1,432 @@
+"""
+Inverted-index keyword search over review corpora
+This module builds a compact on-disk inverted index with BM25 ranking, so the
+model can look up the reviews that mention a term instead of reading whole files.
+"""
+
+import csv
+import json
+import math
+import os
+import shutil
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from custom_tools import TextAnalysisTool
+
+DEFAULT_INDEX_PATH = os.environ.get("REVIEW_INDEX_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "amazon-reviews", "data", "review_index"))
+DEFAULT_TEXT_FIELD = "review_text"
+DEFAULT_CHUNK_SIZE = 10000
+# Appends write one segment each; past this many they are merged into one
+DEFAULT_MAX_SEGMENTS = 8
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Characters of review text returned per hit
+SNIPPET_LENGTH = 300
+
+INDEX_VERSION = 1
+# Postings, document lengths and offsets are stored in native byte order
+POSTING_DTYPE = np.uint32
+OFFSET_DTYPE = np.uint64
+
+
+def index_terms(text: str) -> Counter:
+    """Term frequencies of a document, tokenized like TextAnalysisTool's keywords"""
+    counts = TextAnalysisTool.keyword_counts(text.lower().split())
+    counts.pop("", None)
+    return counts
+
+
+class Segment:
+    """One immutable batch of indexed documents
+
+    Files in the segment directory:
+        lexicon.json    term -> [offset, document frequency] into postings.bin
+        postings.bin    per term, the local document ids then their term frequencies
+        doclens.bin     number of indexed terms per document
+        docs.jsonl      the stored documents, one JSON object per line
+        docs.idx        byte offset of each line of docs.jsonl
+
+    postings.bin is memory-mapped, so a query only touches the pages of the
+    terms it looks up.
+    """
+
+    def __init__(self, path: str, base: int):
+        self.path = path
+        self.base = base
+        with open(os.path.join(path, "lexicon.json"), encoding="utf-8") as f:
+            self.lexicon: Dict[str, List[int]] = json.load(f)
+        self.doc_lengths = np.fromfile(os.path.join(path, "doclens.bin"), dtype=POSTING_DTYPE)
+        self.doc_offsets = np.fromfile(os.path.join(path, "docs.idx"), dtype=OFFSET_DTYPE)
+        postings_path = os.path.join(path, "postings.bin")
+        if os.path.getsize(postings_path):
+            self._postings = np.memmap(postings_path, dtype=POSTING_DTYPE, mode="r")
+        else:
+            self._postings = np.zeros(0, dtype=POSTING_DTYPE)
+        self._docs_file = open(os.path.join(path, "docs.jsonl"), "rb")
+        self._norm_cache = (None, None)
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Local document ids and term frequencies of a term (empty if absent)"""
+        entry = self.lexicon.get(term)
+        if entry is None:
+            return self._postings[0:0], self._postings[0:0]
+        offset, df = entry
+        return self._postings[offset:offset + df], self._postings[offset + df:offset + 2 * df]
+
+    def length_norms(self, k1: float, b: float, avg_length: float) -> np.ndarray:
+        """BM25 length normalization k1 * (1 - b + b * length / avg_length) per document
+
+        Cached until the average length changes, i.e. until documents are added.
+        """
+        key, norms = self._norm_cache
+        if key != (k1, b, avg_length):
+            norms = (k1 * (1 - b + b * self.doc_lengths / avg_length)).astype(np.float32)
+            self._norm_cache = ((k1, b, avg_length), norms)
+        return norms
+
+    def document(self, local_id: int) -> Dict[str, Any]:
+        self._docs_file.seek(int(self.doc_offsets[local_id]))
+        return json.loads(self._docs_file.readline())
+
+    def close(self) -> None:
+        # The memmap is unmapped once the last view of it is gone
+        self._postings = None
+        self._docs_file.close()
+
+    @staticmethod
+    def write(path: str, term_postings: Dict[str, Tuple[Sequence[int], Sequence[int]]],
+              doc_lengths: Sequence[int], documents: Iterable[bytes]) -> None:
+        """Write a segment to a temporary directory and move it into place"""
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        lexicon = {}
+        offset = 0
+        with open(os.path.join(tmp_path, "postings.bin"), "wb") as f:
+            for term in sorted(term_postings):
+                doc_ids, freqs = term_postings[term]
+                lexicon[term] = [offset, len(doc_ids)]
+                np.asarray(doc_ids, dtype=POSTING_DTYPE).tofile(f)
+                np.asarray(freqs, dtype=POSTING_DTYPE).tofile(f)
+                offset += 2 * len(doc_ids)
+        with open(os.path.join(tmp_path, "lexicon.json"), "w", encoding="utf-8") as f:
+            json.dump(lexicon, f, ensure_ascii=False, separators=(",", ":"))
+        np.asarray(doc_lengths, dtype=POSTING_DTYPE).tofile(os.path.join(tmp_path, "doclens.bin"))
+
+        offsets = []
+        with open(os.path.join(tmp_path, "docs.jsonl"), "wb") as f:
+            for line in documents:
+                offsets.append(f.tell())
+                f.write(line)
+        np.asarray(offsets, dtype=OFFSET_DTYPE).tofile(os.path.join(tmp_path, "docs.idx"))
+        os.replace(tmp_path, path)
+
+
+class ReviewIndex:
+    """Segmented on-disk inverted index with BM25 top-k search
+
+    Layout:
+        manifest.json    settings, document and term totals, segment list
+        seg-00000/       one :class:`Segment` per append (or merge)
+
+    ``add`` indexes a batch of documents into a new segment and rewrites
+    only the manifest, which is replaced last so a crash never references a
+    half-written segment. Once there are more than ``max_segments`` segments
+    they are merged into one. Document ids are assigned in insertion order.
+
+    Documents are strings or dicts holding the text under ``text_field``;
+    dicts are stored whole and returned with each hit.
+
+    Usage::
+
+        index = ReviewIndex('data/review_index')
+        index.add_csv('data/processed_amazon_reviews.csv')
+        index.search('battery life', top_k=5)
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, text_field: str = DEFAULT_TEXT_FIELD,
+                 max_segments: int = DEFAULT_MAX_SEGMENTS, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.text_field = text_field
+        self.max_segments = max_segments
+        self.k1 = k1
+        self.b = b
+        self.segments: List[Segment] = []
+        self.segment_names: List[str] = []
+        self.n_docs = 0
+        self.total_length = 0
+        self._manifest_mtime = None
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        self._close_segments()
+        self.n_docs = 0
+        self.total_length = 0
+        manifest_path = self._file("manifest.json")
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["version"] != INDEX_VERSION or manifest["byteorder"] != sys.byteorder:
+            raise ValueError(f"Incompatible review index at {self.path}; rebuild it")
+        self.text_field = manifest["text_field"]
+        self.total_length = manifest["total_length"]
+        base = 0
+        for name in manifest["segments"]:
+            segment = Segment(self._file(name), base)
+            self.segments.append(segment)
+            self.segment_names.append(name)
+            base += segment.n_docs
+        self.n_docs = base
+        self._manifest_mtime = os.stat(manifest_path).st_mtime_ns
+
+    def _save_manifest(self) -> None:
+        manifest = {
+            "version": INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "text_field": self.text_field,
+            "n_docs": self.n_docs,
+            "total_length": self.total_length,
+            "segments": self.segment_names
+        }
+        tmp_path = self._file("manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._file("manifest.json"))
+        self._manifest_mtime = os.stat(self._file("manifest.json")).st_mtime_ns
+
+    def refresh(self) -> bool:
+        """Reload if another process changed the index; returns True if reloaded"""
+        try:
+            mtime = os.stat(self._file("manifest.json")).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._manifest_mtime:
+            return False
+        self._load()
+        return True
+
+    def _next_segment_name(self) -> str:
+        taken = set(os.listdir(self.path))
+        number = len(self.segment_names)
+        while f"seg-{number:05d}" in taken:
+            number += 1
+        return f"seg-{number:05d}"
+
+    def add(self, documents: Iterable[Union[str, Dict[str, Any]]]) -> int:
+        """Index a batch of documents as a new segment; returns how many were added"""
+        term_postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        doc_lengths = []
+        stored = []
+        for local_id, document in enumerate(documents):
+            if isinstance(document, str):
+                document = {self.text_field: document}
+            document = {"id": self.n_docs + local_id, **document}
+            terms = index_terms(str(document.get(self.text_field) or ""))
+            for term, freq in terms.items():
+                postings = term_postings.get(term)
+                if postings is None:
+                    postings = term_postings[term] = ([], [])
+                postings[0].append(local_id)
+                postings[1].append(freq)
+            doc_lengths.append(sum(terms.values()))
+            stored.append((json.dumps(document, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+
+        if not stored:
+            return 0
+        name = self._next_segment_name()
+        Segment.write(self._file(name), term_postings, doc_lengths, stored)
+        self.segments.append(Segment(self._file(name), self.n_docs))
+        self.segment_names.append(name)
+        self.n_docs += len(stored)
+        self.total_length += sum(doc_lengths)
+        self._save_manifest()
+
+        if len(self.segments) > self.max_segments:
+            self.merge()
+        return len(stored)
+
+    def add_csv(self, csv_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, fields: List[str] = None) -> int:
+        """Index the rows of a CSV file, one segment per chunk of rows
+
+        ``fields`` limits the stored columns; the text field is always kept.
+        """
+        added = 0
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            chunk = []
+            for row in reader:
+                if fields is not None:
+                    row = {key: row.get(key) for key in set(fields) | {self.text_field}}
+                chunk.append(row)
+                if len(chunk) == chunk_size:
+                    added += self.add(chunk)
+                    chunk = []
+            added += self.add(chunk)
+        return added
+
+    def merge(self) -> None:
+        """Merge all segments into one"""
+        if len(self.segments) <= 1:
+            return
+        parts: Dict[str, Tuple[List[np.ndarray], List[np.ndarray]]] = {}
+        for segment in self.segments:
+            for term in segment.lexicon:
+                doc_ids, freqs = segment.postings(term)
+                term_parts = parts.get(term)
+                if term_parts is None:
+                    term_parts = parts[term] = ([], [])
+                term_parts[0].append(doc_ids + POSTING_DTYPE(segment.base))
+                term_parts[1].append(np.array(freqs))
+        term_postings = {term: (np.concatenate(ids), np.concatenate(freqs)) for term, (ids, freqs) in parts.items()}
+        doc_lengths = np.concatenate([segment.doc_lengths for segment in self.segments])
+
+        def documents() -> Iterator[bytes]:
+            for segment in self.segments:
+                with open(os.path.join(segment.path, "docs.jsonl"), "rb") as f:
+                    yield from f
+
+        old_names = self.segment_names
+        name = self._next_segment_name()
+        Segment.write(self._file(name), term_postings, doc_lengths, documents())
+        self._close_segments()
+        self.segments = [Segment(self._file(name), 0)]
+        self.segment_names = [name]
+        self._save_manifest()
+        for old_name in old_names:
+            shutil.rmtree(self._file(old_name), ignore_errors=True)
+
+    def idf(self, df: int) -> float:
+        """BM25 inverse document frequency (never negative)"""
+        return math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 10) -> Dict[str, Any]:
+        """BM25-ranked documents containing any of the query terms"""
+        start = time.perf_counter()
+        terms = list(index_terms(query))
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        if self.n_docs and terms:
+            avg_length = self.total_length / self.n_docs or 1.0
+            for term in terms:
+                df = sum(segment.lexicon[term][1] for segment in self.segments if term in segment.lexicon)
+                if not df:
+                    continue
+                weight = self.idf(df) * (self.k1 + 1)
+                for segment in self.segments:
+                    doc_ids, freqs = segment.postings(term)
+                    if not len(doc_ids):
+                        continue
+                    # Document ids are unique within a term's postings, so += does not drop updates
+                    freqs = freqs.astype(np.float32)
+                    norms = segment.length_norms(self.k1, self.b, avg_length)[doc_ids]
+                    scores[segment.base + doc_ids.astype(np.int64)] += weight * freqs / (freqs + norms)
+
+        hits = np.flatnonzero(scores)
+        top_k = max(0, top_k)
+        top = hits[np.argpartition(-scores[hits], top_k)[:top_k]] if len(hits) > top_k else hits
+        # Highest score first, ties by document id
+        top = top[np.lexsort((top, -scores[top]))]
+        return {
+            "query": query,
+            "terms": terms,
+            "total_hits": int(len(hits)),
+            "results": [{"score": round(float(scores[doc_id]), 4), **self.document(int(doc_id))} for doc_id in top],
+            "took_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+
+    def _segment_of(self, doc_id: int) -> Segment:
+        for segment in reversed(self.segments):
+            if doc_id >= segment.base:
+                return segment
+        raise IndexError(doc_id)
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        """Stored document, with its text cut to SNIPPET_LENGTH characters"""
+        if not 0 <= doc_id < self.n_docs:
+            raise IndexError(doc_id)
+        segment = self._segment_of(doc_id)
+        document = segment.document(doc_id - segment.base)
+        text = document.get(self.text_field)
+        if isinstance(text, str) and len(text) > SNIPPET_LENGTH:
+            document[self.text_field] = text[:SNIPPET_LENGTH].rstrip() + "..."
+        return document
+
+    def _close_segments(self) -> None:
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+        self.segment_names = []
+
+    def close(self) -> None:
+        self._close_segments()
+
+    def __enter__(self) -> "ReviewIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+
+# Open indexes reused across search_reviews calls, keyed by path
+_OPEN_INDEXES: Dict[str, ReviewIndex] = {}
+
+
+def open_index(path: str = DEFAULT_INDEX_PATH) -> Optional[ReviewIndex]:
+    """Shared read handle for an existing index, reloaded when it changes on disk"""
+    path = os.path.abspath(path)
+    if not os.path.exists(os.path.join(path, "manifest.json")):
+        return None
+    index = _OPEN_INDEXES.get(path)
+    if index is None:
+        index = _OPEN_INDEXES[path] = ReviewIndex(path)
+    else:
+        index.refresh()
+    return index
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query a review search index")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("add", help="index the rows of a CSV file")
+    build.add_argument("csv_path")
+    build.add_argument("--text-field", default=DEFAULT_TEXT_FIELD)
+    build.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    query = subparsers.add_parser("search", help="run a BM25 query")
+    query.add_argument("query")
+    query.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "add":
+        with ReviewIndex(args.index, text_field=args.text_field) as index:
+            added = index.add_csv(args.csv_path, args.chunk_size)
+            print(f"Indexed {added} documents; {len(index)} in {len(index.segments)} segment(s)")
+    else:
+        with ReviewIndex(args.index) as index:
+            print(json.dumps(index.search(args.query, args.top_k), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Tool call parser for model responses
+This module finds every ``{"tool_call": {...}}`` object in a model response with a
+single brace- and string-aware pass, and works on text that arrives in chunks.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ToolCallParseError(ValueError):
+    """A candidate tool call that could not be decoded
+
+    Instances are collected by :class:`ToolCallParser` rather than raised, so
+    one malformed call does not hide the others; callers may raise them.
+    """
+
+    def __init__(self, message: str, start: int, end: Optional[int], snippet: str):
+        super().__init__(message)
+        self.message = message
+        self.start = start
+        self.end = end
+        self.snippet = snippet
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "message": self.message,
+            "start": self.start,
+            "end": self.end,
+            "snippet": self.snippet
+        }
+
+
+class _Span:
+    """A balanced ``{...}`` region and the balanced regions nested inside it"""
+
+    __slots__ = ("start", "end", "children")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.end = None
+        self.children = []
+
+
+TOOL_CALL_MARKER = '"tool_call'
+SNIPPET_LENGTH = 80
+
+# Characters that can change scanner state inside an object (outside strings)
+STRUCTURAL_CHARS = re.compile(r'[{}"]')
+
+
+class ToolCallParser:
+    """Incremental scanner that extracts tool calls from model output
+
+    The text is scanned once to track object nesting, ignoring braces inside
+    JSON strings and, outside objects, quotes in prose. Runs of characters that
+    cannot change the state are skipped with ``str.find`` and compiled regex
+    searches rather than inspected one by one. When a top-level
+    object closes it is decoded once with ``json.loads``. If it is not valid
+    JSON (for example prose with a stray ``{``), the balanced objects nested
+    inside it are tried instead, so a tool call wrapped in broken text is still
+    found.
+
+    Usage::
+
+        parser = ToolCallParser()
+        for chunk in stream:
+            for call in parser.feed(chunk):
+                dispatch(call)
+        parser.close()
+        parser.errors  # structured ToolCallParseError records
+    """
+
+    def __init__(self):
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.errors: List[ToolCallParseError] = []
+        # Text from the outermost open object onwards, kept as a list of
+        # chunks so streaming many small chunks stays linear
+        self._chunks: List[str] = []
+        self._length = 0
+        self._base = 0
+        self._stack: List[_Span] = []
+        self._in_string = False
+        self._escaped = False
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk and return the tool calls completed by it"""
+        if self._closed:
+            raise RuntimeError("ToolCallParser.feed() called after close()")
+
+        found = []
+        offset = self._base + self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        stack = self._stack
+
+        pos = 0
+        while True:
+            if not stack:
+                j = chunk.find("{", pos)
+                if j == -1:
+                    break
+                stack.append(_Span(offset + j))
+            elif self._in_string:
+                if self._escaped:
+                    if pos >= len(chunk):
+                        break
+                    self._escaped = False
+                    pos += 1
+                    continue
+                # Two bounded finds beat a regex on long string values
+                j = chunk.find('"', pos)
+                backslash = chunk.find("\\", pos, len(chunk) if j == -1 else j)
+                if backslash != -1:
+                    j = backslash
+                    self._escaped = True
+                elif j == -1:
+                    break
+                else:
+                    self._in_string = False
+            else:
+                match = STRUCTURAL_CHARS.search(chunk, pos)
+                if match is None:
+                    break
+                j = match.start()
+                char = chunk[j]
+                if char == '"':
+                    self._in_string = True
+                elif char == "{":
+                    stack.append(_Span(offset + j))
+                else:
+                    span = stack.pop()
+                    span.end = offset + j + 1
+                    if stack:
+                        stack[-1].children.append(span)
+                    else:
+                        self._handle_span(span, found)
+            pos = j + 1
+
+        if not stack:
+            # Nothing is open, so earlier text can never be part of an object
+            self._base += self._length
+            self._chunks = []
+            self._length = 0
+        elif stack[0].start >= offset:
+            # The outermost open object started in this chunk; drop the prose before it
+            drop = stack[0].start - self._base
+            self._chunks = [self._joined()[drop:]]
+            self._length -= drop
+            self._base += drop
+
+        return found
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Finish parsing; salvage calls nested inside an unterminated object"""
+        found = []
+        if not self._closed:
+            self._closed = True
+            if self._stack:
+                outer = self._stack[0]
+                for span in self._stack:
+                    for child in span.children:
+                        self._handle_span(child, found)
+                if not found and TOOL_CALL_MARKER in self._text(outer.start, None):
+                    self._error("Unterminated tool call object", outer.start, None)
+                self._stack = []
+        return found
+
+    def _joined(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def _text(self, start: int, end: Optional[int]) -> str:
+        local_end = None if end is None else end - self._base
+        return self._joined()[start - self._base:local_end]
+
+    def _error(self, message: str, start: int, end: Optional[int]) -> None:
+        snippet = self._text(start, end)[:SNIPPET_LENGTH]
+        self.errors.append(ToolCallParseError(message, start, end, snippet))
+
+    def _handle_span(self, span: _Span, found: List[Dict[str, Any]]) -> None:
+        """Decode a balanced region, falling back to its nested regions"""
+        text = self._text(span.start, span.end)
+        if TOOL_CALL_MARKER not in text:
+            return
+
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as e:
+            before = len(found)
+            for child in span.children:
+                self._handle_span(child, found)
+            if len(found) == before:
+                self._error(f"Invalid JSON: {e.msg} at offset {e.pos}", span.start, span.end)
+            return
+
+        for call in self._tool_calls_from(parsed, span):
+            found.append(call)
+            self.tool_calls.append(call)
+
+    def _tool_calls_from(self, parsed: Any, span: _Span) -> List[Dict[str, Any]]:
+        """Accept ``{"tool_call": {...}}`` and ``{"tool_calls": [...]}``"""
+        if not isinstance(parsed, dict):
+            return []
+
+        if "tool_call" in parsed:
+            candidates = [parsed["tool_call"]]
+        elif isinstance(parsed.get("tool_calls"), list):
+            candidates = [c.get("tool_call", c) if isinstance(c, dict) else c for c in parsed["tool_calls"]]
+        else:
+            return []
+
+        calls = []
+        for candidate in candidates:
+            if isinstance(candidate, dict):
+                calls.append(candidate)
+            else:
+                self._error("tool_call is not a JSON object", span.start, span.end)
+        return calls
+
+
+def parse_tool_calls(response: str) -> Tuple[List[Dict[str, Any]], List[ToolCallParseError]]:
+    """Return every tool call in a complete response and any parse errors"""
+    parser = ToolCallParser()
+    parser.feed(response)
+    parser.close()
+    return parser.tool_calls, parser.errors
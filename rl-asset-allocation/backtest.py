@@ -0,0 +1,259 @@
+"""
+Vectorized backtesting of baseline allocation strategies
+
+The notebook's `evaluate_baseline_strategy` replays a strategy by stepping
+PortfolioEnv one day at a time. This module computes the same portfolio value
+paths, turnover and transaction costs for many strategies and rebalance
+frequencies at once, as array operations over the whole returns matrix.
+
+By default the engine follows PortfolioEnv's accounting: between rebalances
+the portfolio keeps its target weights (they do not drift with prices), each
+step pays `transaction_cost` times the absolute weight change, and weights are
+normalized as in `PortfolioEnv.step`. With `drift=True` weights instead drift
+with asset returns between rebalances, as they would in a real account.
+
+Usage:
+    from backtest import backtest_env
+    result = backtest_env(train_env, ['buy_hold', 'equal_weight', 'random'],
+                          rebalance_freqs=[5, 20, 60])
+    result.stats()      # one row per strategy, same columns as get_portfolio_stats
+"""
+
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ('buy_hold', 'equal_weight', 'random')
+
+# Rebalance frequency used by evaluate_baseline_strategy for each strategy;
+# random draws new weights every step
+DEFAULT_REBALANCE_FREQ = {'equal_weight': 20, 'random': 1}
+
+
+def normalize_weights(weights):
+    """Clip to [0, 1] and normalize along the last axis, as PortfolioEnv.step does"""
+    weights = np.clip(weights, 0, 1)
+    return weights / (weights.sum(axis=-1, keepdims=True) + 1e-8)
+
+
+def batch_portfolio_stats(values):
+    """
+    get_portfolio_stats for every row of an (M, S + 1) array of value paths.
+
+    Returns a dict of (M,) arrays with the same keys and formulas.
+    """
+    values = np.atleast_2d(values)
+    returns = np.diff(values, axis=1) / values[:, :-1]
+
+    total_return = values[:, -1] / values[:, 0] - 1
+    annualized_return = (1 + total_return) ** (252 / returns.shape[1]) - 1
+    volatility = returns.std(axis=1) * np.sqrt(252)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe_ratio = np.where(volatility > 0, annualized_return / volatility, 0)
+
+    cumulative = values / np.maximum.accumulate(values, axis=1)
+    max_drawdown = 1 - cumulative.min(axis=1)
+
+    return {
+        'total_return': total_return,
+        'annualized_return': annualized_return,
+        'volatility': volatility,
+        'sharpe_ratio': sharpe_ratio,
+        'max_drawdown': max_drawdown,
+        'final_value': values[:, -1]
+    }
+
+
+class BacktestResult:
+    """
+    Output of a batched backtest over M strategies and S steps.
+
+    values: (M, S + 1) portfolio values, starting with the initial balance
+    weights: (M, S, n_assets) weights held during each step
+    turnover: (M, S) sum of absolute weight changes traded at each step
+    costs: (M, S) transaction costs as a fraction of portfolio value
+    """
+
+    def __init__(self, labels, values, weights, turnover, costs):
+        self.labels = list(labels)
+        self.values = values
+        self.weights = weights
+        self.turnover = turnover
+        self.costs = costs
+
+    def stats(self):
+        """Performance statistics per strategy, as returned by get_portfolio_stats"""
+        stats = pd.DataFrame(batch_portfolio_stats(self.values), index=self.labels)
+        stats['total_turnover'] = self.turnover.sum(axis=1)
+        stats['total_costs'] = self.costs.sum(axis=1)
+        return stats
+
+    def portfolio_values(self, label):
+        """Value path of one strategy, like env.portfolio_values"""
+        return self.values[self.labels.index(label)].tolist()
+
+
+def simulate(returns, targets, rebalance, initial_weights, initial_balance=100000,
+             transaction_cost=0.001, drift=False):
+    """
+    Value paths of M strategies in one pass over an (S, n_assets) returns matrix.
+
+    targets is an (M, S, n_assets) array of normalized target weights and
+    rebalance an (M, S) boolean array marking the steps that trade to the
+    target; on other steps the strategy holds its weights.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    n_strategies, n_steps, n_assets = targets.shape
+    steps = np.arange(n_steps)
+    initial_weights = np.broadcast_to(initial_weights, (n_strategies, n_assets))
+
+    # Step of the most recent rebalance at or before each step (-1: none yet)
+    anchor = np.maximum.accumulate(np.where(rebalance, steps, -1), axis=1)
+    rows = np.arange(n_strategies)[:, None]
+    anchor_weights = np.where((anchor >= 0)[..., None],
+                              targets[rows, np.maximum(anchor, 0)],
+                              initial_weights[:, None, :])
+
+    if drift:
+        # Growth of each asset before step k: prod_{j < k} (1 + r_j)
+        growth = np.vstack([np.ones(n_assets), np.cumprod(1 + returns, axis=0)[:-1]])
+        anchor_growth = growth[np.maximum(anchor, 0)]
+        held = anchor_weights * (growth / anchor_growth)
+        held *= (anchor_weights.sum(axis=-1) / held.sum(axis=-1))[..., None]
+        # Weights just before trading: last step's weights after its return
+        pre_trade = np.empty_like(held)
+        pre_trade[:, 0] = initial_weights
+        drifted = held[:, :-1] * (1 + returns[:-1])
+        pre_trade[:, 1:] = drifted * (held[:, :-1].sum(axis=-1) / drifted.sum(axis=-1))[..., None]
+    else:
+        held = anchor_weights
+        pre_trade = np.concatenate([initial_weights[:, None, :], held[:, :-1]], axis=1)
+
+    turnover = np.abs(held - pre_trade).sum(axis=-1)
+    costs = turnover * transaction_cost
+    portfolio_returns = np.einsum('msn,sn->ms', held, returns)
+
+    values = np.empty((n_strategies, n_steps + 1))
+    values[:, 0] = initial_balance
+    np.cumprod(1 + portfolio_returns - costs, axis=1, out=values[:, 1:])
+    values[:, 1:] *= initial_balance
+
+    return values, held, turnover, costs
+
+
+def run_backtest(returns, strategies=STRATEGIES, rebalance_freqs=None, initial_balance=100000,
+                 transaction_cost=0.001, drift=False, rng=None):
+    """
+    Backtest every combination of strategy and rebalance frequency in one batch.
+
+    returns is an (S, n_assets) array or DataFrame of the per-step asset returns.
+    buy_hold never rebalances, so it runs once regardless of rebalance_freqs;
+    without rebalance_freqs each strategy uses its evaluate_baseline_strategy
+    default. rng (a numpy Generator or RandomState, e.g. seeded like the env)
+    draws the random strategy's weights.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    n_steps, n_assets = returns.shape
+    steps = np.arange(n_steps)
+    rng = np.random.default_rng() if rng is None else rng
+
+    equal = normalize_weights(np.full(n_assets, 1.0 / n_assets))
+    labels, targets, rebalance = [], [], []
+
+    for strategy in strategies:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+
+        if strategy == 'buy_hold':
+            # Holding the initial weights still normalizes them once on the first step
+            labels.append(strategy)
+            targets.append(np.broadcast_to(equal, (n_steps, n_assets)))
+            rebalance.append(steps == 0)
+            continue
+
+        for freq in rebalance_freqs or [DEFAULT_REBALANCE_FREQ[strategy]]:
+            labels.append(strategy if not rebalance_freqs else f"{strategy}_{freq}")
+            rebalance.append(steps % freq == 0)
+            if strategy == 'equal_weight':
+                targets.append(np.broadcast_to(equal, (n_steps, n_assets)))
+            else:
+                draws = rng.random((n_steps, n_assets))
+                targets.append(normalize_weights(draws / draws.sum(axis=1, keepdims=True)))
+
+    # PortfolioEnv.reset starts every episode from exactly equal weights
+    values, weights, turnover, costs = simulate(
+        returns, np.stack(targets), np.stack(rebalance), np.full(n_assets, 1.0 / n_assets), initial_balance,
+        transaction_cost, drift
+    )
+    return BacktestResult(labels, values, weights, turnover, costs)
+
+
+def env_returns(env):
+    """The asset returns PortfolioEnv applies over one episode, one row per step"""
+    returns = np.asarray(env.returns.loc[env.dates].values, dtype=np.float64)
+    return returns[env.lookback_window:len(env.dates) - 1]
+
+
+def backtest_env(env, strategies=STRATEGIES, rebalance_freqs=None, drift=False, rng=None):
+    """run_backtest over the episode of a PortfolioEnv, with its balance and costs"""
+    return run_backtest(env_returns(env), strategies, rebalance_freqs, env.initial_balance,
+                        env.transaction_cost, drift, rng)
+
+
+def evaluate_baseline_strategy(env, strategy='equal_weight', rebalance_freq=20):
+    """
+    Step-wise reference: evaluate_baseline_strategy from the notebook
+
+    Strategies:
+    - 'buy_hold': Buy and hold equal weights
+    - 'equal_weight': Rebalance to equal weights periodically
+    - 'random': Random allocations, drawn with np.random
+    """
+    obs, info = env.reset()
+    done = False
+    step_count = 0
+
+    equal_weights = np.ones(env.n_assets) / env.n_assets
+
+    while not done:
+        if strategy == 'buy_hold':
+            action = env.weights
+        elif strategy == 'equal_weight':
+            action = equal_weights if step_count % rebalance_freq == 0 else env.weights
+        elif strategy == 'random':
+            action = np.random.random(env.n_assets)
+            action = action / action.sum()
+        else:
+            raise ValueError(f"Unknown strategy: {strategy}")
+
+        obs, reward, terminated, truncated, info = env.step(action)
+        done = terminated or truncated
+        step_count += 1
+
+    return env.get_portfolio_stats(), env.portfolio_values, env.weight_history
+
+
+def verify_against_env(env, strategies=STRATEGIES, rebalance_freqs=(20,), seed=0):
+    """
+    Largest relative difference between the batched value paths and stepping
+    env with evaluate_baseline_strategy. Deterministic strategies are checked
+    at every frequency in rebalance_freqs. The random strategy only has a
+    step-wise counterpart when it rebalances every step, so it is always
+    checked separately at frequency 1, drawn from the same np.random stream
+    in both.
+    """
+    def compare(result):
+        worst = 0.0
+        for label, values in zip(result.labels, result.values):
+            strategy, _, freq = label.rpartition('_') if label != 'buy_hold' else (label, '', '1')
+            np.random.seed(seed)
+            _, env_values, _ = evaluate_baseline_strategy(env, strategy, int(freq))
+            worst = max(worst, np.max(np.abs(np.asarray(env_values) / values - 1)))
+        return worst
+
+    worst = 0.0
+    deterministic = [strategy for strategy in strategies if strategy != 'random']
+    if deterministic:
+        worst = compare(backtest_env(env, deterministic, list(rebalance_freqs)))
+    if 'random' in strategies:
+        worst = max(worst, compare(backtest_env(env, ['random'], [1], rng=np.random.RandomState(seed))))
+    return worst
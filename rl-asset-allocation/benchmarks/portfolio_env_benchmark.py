@@ -0,0 +1,79 @@
+"""
+Benchmark: PortfolioEnv (pandas lookups) vs ArrayPortfolioEnv (NumPy arrays)
+vs BatchPortfolioEnv (N portfolios per step)
+Steps the environments through full episodes with random actions on synthetic
+prices and reports portfolio steps per second.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from portfolio_env import (ArrayPortfolioEnv, BatchPortfolioEnv, MarketData, PortfolioEnv,
+                           compute_features, synthetic_prices)
+
+
+def run_episodes(env, actions, n_steps):
+    """Step env n_steps times, resetting at the end of each episode"""
+    env.reset()
+    start = time.perf_counter()
+    for i in range(n_steps):
+        _, _, terminated, truncated, _ = env.step(actions[i % len(actions)])
+        if terminated or truncated:
+            env.reset()
+    return n_steps / (time.perf_counter() - start)
+
+
+def run_batch(env, actions, n_steps):
+    """Step a BatchPortfolioEnv (which resets finished portfolios itself)"""
+    env.reset()
+    n_envs = env.n_envs
+    start = time.perf_counter()
+    for i in range(n_steps // n_envs):
+        offset = (i * n_envs) % (len(actions) - n_envs)
+        env.step(actions[offset:offset + n_envs])
+    return (n_steps // n_envs) * n_envs / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=1500)
+    parser.add_argument("--assets", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--lookback", type=int, default=10)
+    parser.add_argument("--n-envs", type=int, nargs="+", default=[16, 128])
+    args = parser.parse_args()
+
+    assets = [f"ASSET{i}" for i in range(args.assets)]
+    prices = synthetic_prices(args.days, assets)
+    returns, tech_indicators = compute_features(prices)
+    actions = np.random.default_rng(0).random((4096, args.assets)).astype(np.float32)
+
+    results = {}
+    for name, env_class in (('PortfolioEnv', PortfolioEnv), ('ArrayPortfolioEnv', ArrayPortfolioEnv)):
+        env = env_class(prices, returns, tech_indicators, lookback_window=args.lookback)
+        results[name] = run_episodes(env, actions, args.steps)
+
+    market = MarketData.from_frames(prices, returns, tech_indicators)
+    for n_envs in args.n_envs:
+        env = BatchPortfolioEnv(market, n_envs=n_envs, lookback_window=args.lookback, seed=0)
+        results[f"Batch (N={n_envs})"] = run_batch(env, actions, args.steps * 4)
+
+    print(f"{args.days} days x {args.assets} assets, lookback {args.lookback}, {args.steps} steps")
+    print("(a batched step of N portfolios counts as N steps)")
+    print(f"{'environment':>18} | {'steps/s':>10}")
+    print("-" * 32)
+    for name, rate in results.items():
+        print(f"{name:>18} | {rate:>10,.0f}")
+    for name, rate in results.items():
+        if name != 'PortfolioEnv':
+            print(f"speedup {name}: {rate / results['PortfolioEnv']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Local market data store with incremental technical indicators
+
+The notebook's `download_data` calls `yf.download` on every run and then
+recomputes every indicator over the full price history, one asset and one
+pandas `rolling` call at a time. This module:
+
+- keeps prices, returns and indicators in a local Parquet store and only
+  downloads (and appends) bars newer than the last stored date,
+- can load prices from a CSV file instead, so the lab runs without network
+  access,
+- updates SMA_10, SMA_30, VOL_10 and MOMENTUM incrementally: each indicator
+  keeps a fixed-size rolling window per asset (O(1) work per new bar) and is
+  computed for all assets at once with array operations.
+
+The indicator state is saved with the store, so appending a day of data does
+not touch the earlier history. Yahoo rebases adjusted prices after dividends
+and splits; delete the store directory to rebuild it on the new basis.
+
+Usage:
+    from market_data import download_data
+    prices, returns, tech_indicators = download_data(ASSETS, START_DATE, END_DATE)
+
+    # Offline
+    from market_data import load_csv_data
+    prices, returns, tech_indicators = load_csv_data('data/prices.csv')
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_DIR = os.path.join("data", "market_data")
+
+# Indicator columns per asset, in the order download_data creates them
+INDICATORS = ('SMA_10', 'SMA_30', 'VOL_10', 'MOMENTUM')
+
+# Bars before the first complete indicator row (SMA_30 needs 30 prices; the
+# other indicators need fewer)
+WARMUP_BARS = 30
+
+# Calendar days between a requested start date and the first trading bar:
+# a weekend plus a holiday on either side
+MAX_START_GAP_DAYS = 4
+
+
+class RollingWindow:
+    """
+    Rolling sum (and optionally sum of squares) over the last `window` values
+    of every asset, updated in O(1) per value.
+
+    The running sums are recomputed exactly from the buffer once per cycle, so
+    floating-point error from adding and subtracting does not accumulate.
+    """
+
+    def __init__(self, window, n_assets, squares=False):
+        self.window = window
+        self.squares = squares
+        self.values = np.zeros((window, n_assets))
+        self.sum = np.zeros(n_assets)
+        self.sum_sq = np.zeros(n_assets)
+        self.count = 0
+        self.position = 0
+
+    @property
+    def full(self):
+        return self.count >= self.window
+
+    def push(self, x):
+        if self.full:
+            old = self.values[self.position]
+            self.sum -= old
+            if self.squares:
+                self.sum_sq -= old * old
+        self.values[self.position] = x
+        self.sum += x
+        if self.squares:
+            self.sum_sq += x * x
+
+        self.count += 1
+        self.position = (self.position + 1) % self.window
+        if self.position == 0:
+            self.sum = self.values.sum(axis=0)
+            if self.squares:
+                self.sum_sq = (self.values * self.values).sum(axis=0)
+
+    def mean(self):
+        return self.sum / self.window
+
+    def std(self):
+        """Sample standard deviation (ddof=1), as pandas rolling().std()"""
+        variance = (self.sum_sq - self.sum * self.sum / self.window) / (self.window - 1)
+        return np.sqrt(np.maximum(variance, 0))
+
+    def state(self):
+        return {'values': self.values, 'sum': self.sum, 'sum_sq': self.sum_sq,
+                'count': self.count, 'position': self.position}
+
+    def load_state(self, state):
+        self.values = np.array(state['values'], dtype=np.float64)
+        self.sum = np.array(state['sum'], dtype=np.float64)
+        self.sum_sq = np.array(state['sum_sq'], dtype=np.float64)
+        self.count = int(state['count'])
+        self.position = int(state['position'])
+
+
+class IncrementalIndicators:
+    """
+    download_data's technical indicators, updated one bar at a time.
+
+    update() takes the closing prices of all assets for one bar and returns
+    that bar's asset returns and indicator row, with NaN until each rolling
+    window is full, exactly where pandas would produce NaN.
+    """
+
+    def __init__(self, asset_names):
+        self.asset_names = list(asset_names)
+        n_assets = len(self.asset_names)
+        self.previous_price = None
+        self.sma_10 = RollingWindow(10, n_assets)
+        self.sma_30 = RollingWindow(30, n_assets)
+        self.vol_10 = RollingWindow(10, n_assets, squares=True)
+        self.momentum = RollingWindow(5, n_assets)
+        self._row = np.empty((n_assets, len(INDICATORS)))
+
+    @property
+    def columns(self):
+        return [f'{asset}_{name}' for asset in self.asset_names for name in INDICATORS]
+
+    def update(self, price):
+        """Consume one bar of prices; return (returns, indicators) for it"""
+        price = np.asarray(price, dtype=np.float64)
+
+        if self.previous_price is None:
+            returns = np.full_like(price, np.nan)
+        else:
+            returns = price / self.previous_price - 1
+            self.vol_10.push(returns)
+            self.momentum.push(returns)
+        self.previous_price = price
+        self.sma_10.push(price)
+        self.sma_30.push(price)
+
+        row = self._row
+        row[:, 0] = self.sma_10.mean() / price - 1 if self.sma_10.full else np.nan
+        row[:, 1] = self.sma_30.mean() / price - 1 if self.sma_30.full else np.nan
+        row[:, 2] = self.vol_10.std() if self.vol_10.full else np.nan
+        row[:, 3] = self.momentum.sum if self.momentum.full else np.nan
+        # Asset-major, like the columns download_data adds asset by asset
+        return returns, row.reshape(-1).copy()
+
+    def update_many(self, prices):
+        """
+        Consume a DataFrame of new bars; return (returns, tech_indicators)
+        DataFrames for them, with the rows pandas would drop already dropped.
+        """
+        prices = prices[self.asset_names]
+        return_rows, indicator_rows = [], []
+        for price in prices.values:
+            returns, indicators = self.update(price)
+            return_rows.append(returns)
+            indicator_rows.append(indicators)
+
+        returns = pd.DataFrame(return_rows, index=prices.index, columns=self.asset_names)
+        tech_indicators = pd.DataFrame(indicator_rows, index=prices.index, columns=self.columns)
+        return returns.dropna(), tech_indicators.dropna()
+
+    def state(self):
+        state = {'previous_price': self.previous_price}
+        for name in ('sma_10', 'sma_30', 'vol_10', 'momentum'):
+            for key, value in getattr(self, name).state().items():
+                state[f'{name}.{key}'] = value
+        return state
+
+    def load_state(self, state):
+        previous_price = state['previous_price']
+        self.previous_price = None if previous_price is None or np.ndim(previous_price) == 0 else \
+            np.array(previous_price, dtype=np.float64)
+        for name in ('sma_10', 'sma_30', 'vol_10', 'momentum'):
+            prefix = f'{name}.'
+            getattr(self, name).load_state({key[len(prefix):]: value for key, value in state.items()
+                                            if key.startswith(prefix)})
+
+
+class MarketDataStore:
+    """
+    Append-only local store of prices, returns and indicators.
+
+    Layout:
+        manifest.json              symbols, last stored date, part files, state file
+        indicator_state-*.npz      rolling-window state after the last bar
+        prices/part-*.parquet      one part file per append
+        returns/part-*.parquet
+        indicators/part-*.parquet
+
+    append() only processes bars after the last stored date and writes them
+    as new part files; earlier data is never rewritten. The manifest is
+    written last and lists the part files and state file it covers, so an
+    append interrupted before it leaves only unlisted files, which are
+    ignored and removed the next time the store is opened.
+    """
+
+    TABLES = ('prices', 'returns', 'indicators')
+
+    def __init__(self, path=DEFAULT_STORE_DIR):
+        self.path = path
+        self.symbols = None
+        self.last_date = None
+        self.indicators = None
+        self.parts = []
+        self.state_file = None
+
+        manifest_path = os.path.join(path, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.symbols = manifest['symbols']
+            self.last_date = pd.Timestamp(manifest['last_date'])
+            # Stores written before parts were listed: every part file on disk is valid
+            self.parts = manifest['parts'] if 'parts' in manifest else self._part_files('prices')
+            self.state_file = manifest.get('indicator_state', 'indicator_state.npz')
+            self.indicators = IncrementalIndicators(self.symbols)
+            with np.load(os.path.join(path, self.state_file), allow_pickle=False) as state:
+                self.indicators.load_state(dict(state))
+        if os.path.isdir(path):
+            self._remove_unlisted()
+
+    def _part_files(self, table):
+        directory = os.path.join(self.path, table)
+        return sorted(f for f in os.listdir(directory) if f.endswith('.parquet')) \
+            if os.path.isdir(directory) else []
+
+    def _remove_unlisted(self):
+        """Delete files left by appends that did not reach their manifest update"""
+        listed = set(self.parts)
+        for table in self.TABLES:
+            directory = os.path.join(self.path, table)
+            if os.path.isdir(directory):
+                for name in os.listdir(directory):
+                    if name not in listed:
+                        os.remove(os.path.join(directory, name))
+        for name in os.listdir(self.path):
+            if name.startswith('indicator_state') and name != self.state_file:
+                os.remove(os.path.join(self.path, name))
+
+    def append(self, prices):
+        """Add bars newer than the last stored date; return how many were added"""
+        prices = prices.dropna().sort_index()
+        if self.symbols is None:
+            self.symbols = list(prices.columns)
+            self.indicators = IncrementalIndicators(self.symbols)
+        elif set(prices.columns) != set(self.symbols):
+            raise ValueError(f"Store at {self.path} holds {self.symbols}, got {list(prices.columns)}; "
+                             f"use a separate store for a different asset universe")
+
+        prices = prices[self.symbols]
+        if self.last_date is not None:
+            prices = prices[prices.index > self.last_date]
+        if prices.empty:
+            return 0
+
+        returns, tech_indicators = self.indicators.update_many(prices)
+        stamp = time.time_ns()
+        part = f"part-{stamp}.parquet"
+        for table, frame in zip(self.TABLES, (prices, returns, tech_indicators)):
+            if not frame.empty:
+                os.makedirs(os.path.join(self.path, table), exist_ok=True)
+                path = os.path.join(self.path, table, part)
+                frame.to_parquet(path + '.tmp')
+                os.replace(path + '.tmp', path)
+
+        previous_state_file = self.state_file
+        self.last_date = prices.index[-1]
+        self.parts.append(part)
+        self.state_file = f"indicator_state-{stamp}.npz"
+        self._save_state()
+        if previous_state_file is not None:
+            os.remove(os.path.join(self.path, previous_state_file))
+        return len(prices)
+
+    def _save_state(self):
+        state_path = os.path.join(self.path, self.state_file)
+        state = {key: (np.array(np.nan) if value is None else value)
+                 for key, value in self.indicators.state().items()}
+        np.savez(state_path + '.tmp.npz', **state)
+        os.replace(state_path + '.tmp.npz', state_path)
+
+        # The manifest is written last, so it never points past stored data
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump({'symbols': self.symbols, 'last_date': self.last_date.isoformat(),
+                       'parts': self.parts, 'indicator_state': self.state_file}, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    def load(self, start_date=None, end_date=None):
+        """Return (prices, returns, tech_indicators) between the given dates"""
+        frames = []
+        for table in self.TABLES:
+            directory = os.path.join(self.path, table)
+            # Only listed parts; a table has no part for appends too short to fill it
+            parts = [p for p in self.parts if os.path.exists(os.path.join(directory, p))]
+            frame = pd.concat([pd.read_parquet(os.path.join(directory, p)) for p in parts]) \
+                if parts else pd.DataFrame()
+            if not frame.empty:
+                frame = frame.loc[start_date:end_date]
+            frames.append(frame)
+        return tuple(frames)
+
+
+def fetch_yahoo_prices(symbols, start_date, end_date):
+    """Closing prices from Yahoo Finance, selected as in download_data"""
+    import yfinance as yf
+
+    data = yf.download(symbols, start=start_date, end=end_date, progress=False)
+    if data.empty:
+        return pd.DataFrame(columns=list(symbols))
+
+    if isinstance(data.columns, pd.MultiIndex):
+        available_columns = data.columns.get_level_values(0).unique()
+        price_col = 'Adj Close' if 'Adj Close' in available_columns else \
+            'Close' if 'Close' in available_columns else available_columns[0]
+        prices = data[price_col].copy()
+    else:
+        prices = (data['Adj Close'] if 'Adj Close' in data.columns else data['Close']).to_frame()
+        prices.columns = list(symbols)
+    return prices[list(symbols)]
+
+
+def download_data(symbols, start_date, end_date, store_dir=DEFAULT_STORE_DIR):
+    """
+    Cached replacement for the notebook's download_data.
+
+    Only dates after the last stored bar are downloaded; indicators for them
+    are computed from the saved rolling state. If the store is empty, or its
+    first bar is more than MAX_START_GAP_DAYS after start_date (so it was
+    built for a later start), the full range is downloaded into a fresh store.
+    A store holding other symbols raises ValueError.
+
+    The result matches the notebook's download_data for the same dates even
+    when the store starts earlier: returns and indicator rows that would need
+    bars from before start_date are left out.
+    """
+    store = MarketDataStore(store_dir)
+    if store.symbols is not None and set(store.symbols) != set(symbols):
+        raise ValueError(f"Store at {store_dir} holds {store.symbols}, not {list(symbols)}; "
+                         f"use a separate store_dir")
+
+    # start_date may fall on a weekend or holiday, so the first stored bar can be a few days later
+    if store.last_date is not None and \
+            store.load()[0].index[0] > pd.Timestamp(start_date) + pd.Timedelta(days=MAX_START_GAP_DAYS):
+        print(f"🔄 {store_dir} starts after {start_date}; downloading the full range again")
+        shutil.rmtree(store_dir)
+        store = MarketDataStore(store_dir)
+
+    fetch_from = start_date if store.last_date is None else store.last_date + pd.Timedelta(days=1)
+    if pd.Timestamp(fetch_from) < pd.Timestamp(end_date):
+        added = store.append(fetch_yahoo_prices(symbols, fetch_from, end_date))
+        print(f"📥 Appended {added} new bars to {store_dir}")
+    else:
+        print(f"✅ {store_dir} is up to date")
+
+    # The end date is exclusive, as in yf.download
+    end = pd.Timestamp(end_date) - pd.Timedelta(days=1)
+    prices, returns, tech_indicators = store.load(start_date, end)
+    # The notebook computes returns and indicators from start_date's bar onwards
+    returns = returns.loc[prices.index[1]:] if len(prices) > 1 else returns.iloc[:0]
+    tech_indicators = tech_indicators.loc[prices.index[WARMUP_BARS - 1]:] if len(prices) >= WARMUP_BARS \
+        else tech_indicators.iloc[:0]
+    return prices[list(symbols)], returns[list(symbols)], tech_indicators
+
+
+def read_price_csv(csv_path):
+    """
+    Read closing prices from a CSV file in either layout:
+    wide (a date column plus one column per symbol) or long
+    (date, symbol/ticker and close/adj close columns).
+    """
+    frame = pd.read_csv(csv_path)
+    date_col = next(c for c in frame.columns if c.lower() in ('date', 'datetime', 'timestamp'))
+    frame[date_col] = pd.to_datetime(frame[date_col])
+
+    symbol_col = next((c for c in frame.columns if c.lower() in ('symbol', 'ticker')), None)
+    if symbol_col is None:
+        return frame.set_index(date_col).sort_index()
+
+    lower = {c.lower(): c for c in frame.columns}
+    price_col = lower.get('adj close', lower.get('close'))
+    return frame.pivot(index=date_col, columns=symbol_col, values=price_col).sort_index()
+
+
+def load_csv_data(csv_path, store_dir=None):
+    """
+    Offline replacement for download_data: prices from a CSV file.
+
+    With store_dir, the bars are appended to that store (only those newer than
+    its last date) and the store's contents are returned.
+    """
+    prices = read_price_csv(csv_path).dropna()
+    if store_dir is None:
+        indicators = IncrementalIndicators(prices.columns)
+        returns, tech_indicators = indicators.update_many(prices)
+        return prices, returns, tech_indicators
+
+    store = MarketDataStore(store_dir)
+    store.append(prices)
+    return store.load()
@@ -0,0 +1,686 @@
+"""
+Portfolio management environments for the RL Asset Allocation Lab
+
+`PortfolioEnv` is the environment built in `rl_asset_allocation.ipynb`. It
+looks up indicators and returns with pandas `.loc`/`.iloc` on every step,
+which is easy to read but dominates the cost of PPO rollouts.
+
+`ArrayPortfolioEnv` is a drop-in replacement with the same observations,
+rewards and statistics that:
+
+- converts prices, returns and indicators to contiguous float32 arrays once,
+  at construction,
+- precomputes every lookback window of returns as a strided view (no copies),
+- writes observations into one preallocated buffer, so stepping does not
+  allocate arrays.
+
+Usage:
+    from portfolio_env import ArrayPortfolioEnv
+    train_env = ArrayPortfolioEnv(train_prices, train_returns, train_tech)
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import gymnasium
+from gymnasium import spaces
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Number of portfolio values the Sharpe-like reward looks back over
+REWARD_WINDOW = 20
+
+
+class PortfolioEnv(gymnasium.Env):
+    """
+    Custom Portfolio Management Environment
+
+    State: [current_weights, tech_indicators, returns_history]
+    Action: New portfolio weights (must sum to 1)
+    Reward: Risk-adjusted returns minus transaction costs
+    """
+
+    def __init__(self, prices, returns, tech_indicators,
+                 initial_balance=100000, transaction_cost=0.001,
+                 lookback_window=10):
+        super(PortfolioEnv, self).__init__()
+
+        self.prices = prices
+        self.returns = returns
+        self.tech_indicators = tech_indicators
+        self.initial_balance = initial_balance
+        self.transaction_cost = transaction_cost
+        self.lookback_window = lookback_window
+
+        # Asset information
+        self.n_assets = len(prices.columns)
+        self.asset_names = list(prices.columns)
+
+        # Find common dates across all dataframes
+        common_dates = prices.index.intersection(returns.index).intersection(tech_indicators.index)
+        self.dates = sorted(common_dates)
+
+        # Filter data to common dates
+        self.prices = self.prices.loc[self.dates]
+        self.returns = self.returns.loc[self.dates]
+        self.tech_indicators = self.tech_indicators.loc[self.dates]
+
+        # Define action and observation spaces
+        # Action: portfolio weights (continuous, must sum to 1)
+        self.action_space = spaces.Box(low=0, high=1, shape=(self.n_assets,), dtype=np.float32)
+
+        # Observation: current weights + tech indicators + recent returns
+        n_tech_features = len(self.tech_indicators.columns)
+        n_return_features = self.n_assets * self.lookback_window
+        obs_dim = self.n_assets + n_tech_features + n_return_features
+
+        self.observation_space = spaces.Box(
+            low=-np.inf, high=np.inf, shape=(obs_dim,), dtype=np.float32
+        )
+
+        # Initialize state
+        self.reset()
+
+    def reset(self, seed=None, options=None):
+        """Reset environment to initial state"""
+        if seed is not None:
+            np.random.seed(seed)
+
+        self.current_step = self.lookback_window
+        self.balance = self.initial_balance
+
+        # Start with equal weight portfolio
+        self.weights = np.ones(self.n_assets) / self.n_assets
+
+        # Track portfolio value history
+        self.portfolio_values = [self.initial_balance]
+        self.weight_history = [self.weights.copy()]
+
+        observation = self._get_observation()
+        info = {}
+
+        return observation, info
+
+    def _get_observation(self):
+        """Get current observation state"""
+        if self.current_step >= len(self.dates):
+            return np.zeros(self.observation_space.shape[0], dtype=np.float32)
+
+        # Current portfolio weights
+        obs = list(self.weights)
+
+        # Technical indicators
+        current_date = self.dates[self.current_step]
+        tech_values = self.tech_indicators.loc[current_date].values
+        obs.extend(tech_values)
+
+        # Recent returns history
+        start_idx = max(0, self.current_step - self.lookback_window)
+        recent_returns = self.returns.iloc[start_idx:self.current_step].values
+
+        # Flatten and pad if necessary
+        recent_returns_flat = recent_returns.flatten()
+        expected_length = self.n_assets * self.lookback_window
+
+        if len(recent_returns_flat) < expected_length:
+            # Pad with zeros if we don't have enough history
+            padding = np.zeros(expected_length - len(recent_returns_flat))
+            recent_returns_flat = np.concatenate([padding, recent_returns_flat])
+
+        obs.extend(recent_returns_flat)
+
+        return np.array(obs, dtype=np.float32)
+
+    def step(self, action):
+        """Execute one step in the environment"""
+        if self.current_step >= len(self.dates) - 1:
+            return self._get_observation(), 0, True, True, {}
+
+        # Normalize action to ensure weights sum to 1
+        new_weights = np.array(action)
+        new_weights = np.clip(new_weights, 0, 1)
+        new_weights = new_weights / (new_weights.sum() + 1e-8)
+
+        # Calculate transaction costs
+        weight_changes = np.abs(new_weights - self.weights)
+        transaction_costs = np.sum(weight_changes) * self.transaction_cost
+
+        # Update weights
+        self.weights = new_weights
+
+        # Calculate portfolio return
+        current_date = self.dates[self.current_step]
+        asset_returns = self.returns.loc[current_date].values
+        portfolio_return = np.dot(self.weights, asset_returns)
+
+        # Update portfolio value
+        self.balance = self.balance * (1 + portfolio_return - transaction_costs)
+        self.portfolio_values.append(self.balance)
+        self.weight_history.append(self.weights.copy())
+
+        # Calculate reward (Sharpe-like ratio with transaction cost penalty)
+        if len(self.portfolio_values) >= REWARD_WINDOW:  # Need some history
+            recent_values = np.array(self.portfolio_values[-REWARD_WINDOW:])
+            recent_returns = np.diff(recent_values) / recent_values[:-1]
+            mean_return = np.mean(recent_returns)
+            std_return = np.std(recent_returns) + 1e-8
+            sharpe_ratio = mean_return / std_return
+            reward = sharpe_ratio - transaction_costs * 100  # Scale transaction cost penalty
+        else:
+            reward = portfolio_return - transaction_costs * 100
+
+        # Move to next step
+        self.current_step += 1
+
+        # Check if episode is done
+        terminated = self.current_step >= len(self.dates) - 1
+        truncated = False  # We don't truncate episodes
+
+        info = {
+            'portfolio_value': self.balance,
+            'portfolio_return': portfolio_return,
+            'transaction_costs': transaction_costs,
+            'weights': self.weights.copy()
+        }
+
+        return self._get_observation(), reward, terminated, truncated, info
+
+    def get_portfolio_stats(self):
+        """Calculate portfolio performance statistics"""
+        if len(self.portfolio_values) < 2:
+            return {}
+
+        return portfolio_stats(np.array(self.portfolio_values))
+
+
+def portfolio_stats(values):
+    """Performance statistics of one portfolio value path, as in get_portfolio_stats"""
+    returns = np.diff(values) / values[:-1]
+
+    total_return = (values[-1] / values[0]) - 1
+    annualized_return = (1 + total_return) ** (252 / len(returns)) - 1
+    volatility = np.std(returns) * np.sqrt(252)
+    sharpe_ratio = annualized_return / volatility if volatility > 0 else 0
+
+    # Maximum drawdown
+    cumulative = values / np.maximum.accumulate(values)
+    max_drawdown = (1 - np.min(cumulative))
+
+    return {
+        'total_return': total_return,
+        'annualized_return': annualized_return,
+        'volatility': volatility,
+        'sharpe_ratio': sharpe_ratio,
+        'max_drawdown': max_drawdown,
+        'final_value': values[-1]
+    }
+
+
+class MarketData:
+    """
+    Date-aligned market arrays used by the array-backed environments.
+
+    Prices and indicators are float32 (the observation dtype); returns are kept
+    in float64 for portfolio accounting, as in PortfolioEnv, and in float32 for
+    observations.
+    """
+
+    ARRAYS = ('dates', 'price_array', 'return_array', 'return_array32', 'tech_array')
+
+    def __init__(self, dates, asset_names, tech_columns, price_array, return_array,
+                 return_array32, tech_array):
+        self.dates = dates
+        self.asset_names = list(asset_names)
+        self.tech_columns = list(tech_columns)
+        self.price_array = price_array
+        self.return_array = return_array
+        self.return_array32 = return_array32
+        self.tech_array = tech_array
+
+    @classmethod
+    def from_frames(cls, prices, returns, tech_indicators):
+        """Align the DataFrames on their common dates, as PortfolioEnv does"""
+        dates = sorted(prices.index.intersection(returns.index).intersection(tech_indicators.index))
+        return_array = np.ascontiguousarray(returns.loc[dates].values, dtype=np.float64)
+        return cls(
+            dates=np.array(dates, dtype='datetime64[ns]'),
+            asset_names=prices.columns,
+            tech_columns=tech_indicators.columns,
+            price_array=np.ascontiguousarray(prices.loc[dates].values, dtype=np.float32),
+            return_array=return_array,
+            return_array32=np.ascontiguousarray(return_array, dtype=np.float32),
+            tech_array=np.ascontiguousarray(tech_indicators.loc[dates].values, dtype=np.float32)
+        )
+
+    @property
+    def n_dates(self):
+        return len(self.dates)
+
+    @property
+    def n_assets(self):
+        return len(self.asset_names)
+
+    @property
+    def n_tech(self):
+        return len(self.tech_columns)
+
+    def observation_size(self, lookback_window):
+        return self.n_assets + self.n_tech + self.n_assets * lookback_window
+
+    def return_windows(self, lookback_window):
+        """View whose row t - lookback_window is returns[t - lookback_window:t] flattened"""
+        return sliding_window_view(
+            self.return_array32.reshape(-1), self.n_assets * lookback_window
+        )[::self.n_assets]
+
+    def share(self):
+        """Copy the arrays into shared memory; see SharedMarketData"""
+        return SharedMarketData(self)
+
+
+class SharedMarketData:
+    """
+    MarketData held in shared memory blocks, for worker processes.
+
+    Pickling an instance sends only the block names, shapes and dtypes; the
+    unpickled copy in a worker attaches to the same memory instead of
+    receiving copies of the data. The creating process owns the blocks and
+    must call unlink() once the workers are done.
+    """
+
+    def __init__(self, market):
+        self.asset_names = market.asset_names
+        self.tech_columns = market.tech_columns
+        self._specs = {}
+        self._blocks = {}
+        self._owner = True
+        for name in MarketData.ARRAYS:
+            array = getattr(market, name)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self._specs[name] = (block.name, array.shape, array.dtype.str)
+            self._blocks[name] = block
+
+    def __getstate__(self):
+        return {'asset_names': self.asset_names, 'tech_columns': self.tech_columns, 'specs': self._specs}
+
+    def __setstate__(self, state):
+        self.asset_names = state['asset_names']
+        self.tech_columns = state['tech_columns']
+        self._specs = state['specs']
+        self._owner = False
+        # Processes started by multiprocessing share the creator's resource
+        # tracker, so attaching only re-registers names it already tracks
+        self._blocks = {name: shared_memory.SharedMemory(name=block_name)
+                        for name, (block_name, _, _) in self._specs.items()}
+
+    def market_data(self):
+        """A MarketData whose arrays are views of the shared blocks"""
+        arrays = {
+            name: np.ndarray(shape, np.dtype(dtype), buffer=self._blocks[name].buf)
+            for name, (_, shape, dtype) in self._specs.items()
+        }
+        return MarketData(asset_names=self.asset_names, tech_columns=self.tech_columns, **arrays)
+
+    def close(self):
+        for block in self._blocks.values():
+            block.close()
+
+    def unlink(self):
+        """Free the shared memory (creating process only)"""
+        if self._owner:
+            for block in self._blocks.values():
+                block.unlink()
+
+
+class ArrayPortfolioEnv(PortfolioEnv):
+    """
+    PortfolioEnv on precomputed NumPy arrays.
+
+    Observations are identical to PortfolioEnv's. The returned observation is
+    a view of a buffer that is overwritten by the next step or reset, which is
+    how vectorized wrappers consume it (they copy it into their own buffer);
+    copy it if you need to keep it. The final observation of an episode is
+    returned as a copy, since vectorized wrappers keep it across the reset.
+    Portfolio values, weights and the reward window are also kept in
+    preallocated arrays.
+    """
+
+    def __init__(self, prices, returns, tech_indicators,
+                 initial_balance=100000, transaction_cost=0.001,
+                 lookback_window=10):
+        self.market = market = MarketData.from_frames(prices, returns, tech_indicators)
+        n_assets = market.n_assets
+        n_dates = market.n_dates
+        if n_dates <= lookback_window:
+            raise ValueError(f"Need more than lookback_window={lookback_window} common dates, got {n_dates}")
+
+        self.return_array = market.return_array
+        self.tech_array = market.tech_array
+        self.return_windows = market.return_windows(lookback_window)
+
+        self._tech_slice = slice(n_assets, n_assets + market.n_tech)
+        self._returns_slice = slice(n_assets + market.n_tech, None)
+        self._obs = np.zeros(market.observation_size(lookback_window), dtype=np.float32)
+        self._zero_obs = np.zeros_like(self._obs)
+
+        # At most one value and weight row per date
+        self._values = np.empty(n_dates, dtype=np.float64)
+        self._weights = np.empty((n_dates, n_assets), dtype=np.float64)
+        self._step_returns = np.empty(n_dates, dtype=np.float64)
+        self._scratch = np.empty(REWARD_WINDOW - 1, dtype=np.float64)
+        self._action = np.empty(n_assets, dtype=np.float64)
+        self._changes = np.empty(n_assets, dtype=np.float64)
+        self._n_values = 0
+
+        super().__init__(prices, returns, tech_indicators, initial_balance,
+                         transaction_cost, lookback_window)
+
+    @property
+    def portfolio_values(self):
+        return self._values[:self._n_values].tolist()
+
+    @property
+    def weight_history(self):
+        return list(self._weights[:self._n_values].copy())
+
+    @property
+    def weights(self):
+        return self._weights[self._n_values - 1]
+
+    def reset(self, seed=None, options=None):
+        """Reset environment to initial state"""
+        if seed is not None:
+            np.random.seed(seed)
+
+        self.current_step = self.lookback_window
+        self.balance = self.initial_balance
+
+        self._values[0] = self.initial_balance
+        self._weights[0] = 1.0 / self.n_assets
+        self._n_values = 1
+
+        return self._get_observation(), {}
+
+    def _get_observation(self):
+        """Write the current observation into the preallocated buffer"""
+        t = self.current_step
+        if t >= len(self.dates):
+            return self._zero_obs
+
+        obs = self._obs
+        obs[:self.n_assets] = self._weights[self._n_values - 1]
+        obs[self._tech_slice] = self.tech_array[t]
+        obs[self._returns_slice] = self.return_windows[t - self.lookback_window]
+        return obs
+
+    def step(self, action):
+        """Execute one step in the environment"""
+        t = self.current_step
+        if t >= len(self.dates) - 1:
+            return self._get_observation(), 0, True, True, {}
+
+        n = self._n_values
+        previous = self._weights[n - 1]
+        new_weights = self._weights[n]
+
+        # Normalize action to ensure weights sum to 1
+        np.clip(action, 0, 1, out=self._action)
+        np.divide(self._action, self._action.sum() + 1e-8, out=new_weights)
+
+        # Calculate transaction costs
+        np.subtract(new_weights, previous, out=self._changes)
+        np.abs(self._changes, out=self._changes)
+        transaction_costs = self._changes.sum() * self.transaction_cost
+
+        # Calculate portfolio return and update portfolio value
+        portfolio_return = new_weights.dot(self.return_array[t])
+        previous_balance = self.balance
+        self.balance = previous_balance * (1 + portfolio_return - transaction_costs)
+        self._values[n] = self.balance
+        self._step_returns[n] = (self.balance - previous_balance) / previous_balance
+        self._n_values = n + 1
+
+        # Sharpe-like reward over the last REWARD_WINDOW portfolio values
+        if n + 1 >= REWARD_WINDOW:
+            window = self._step_returns[n + 2 - REWARD_WINDOW:n + 1]
+            mean_return = window.mean()
+            deviations = self._scratch
+            np.subtract(window, mean_return, out=deviations)
+            np.multiply(deviations, deviations, out=deviations)
+            std_return = np.sqrt(deviations.mean()) + 1e-8
+            reward = mean_return / std_return - transaction_costs * 100
+        else:
+            reward = portfolio_return - transaction_costs * 100
+
+        self.current_step = t + 1
+        terminated = self.current_step >= len(self.dates) - 1
+
+        info = {
+            'portfolio_value': self.balance,
+            'portfolio_return': portfolio_return,
+            'transaction_costs': transaction_costs,
+            'weights': new_weights.copy()
+        }
+
+        obs = self._get_observation()
+        return (obs.copy() if terminated else obs), reward, terminated, False, info
+
+    def get_portfolio_stats(self):
+        """Calculate portfolio performance statistics"""
+        if self._n_values < 2:
+            return {}
+        return portfolio_stats(self._values[:self._n_values])
+
+
+class BatchPortfolioEnv:
+    """
+    N independent portfolios stepped together with array operations.
+
+    Every portfolio follows PortfolioEnv's rules (weight normalization,
+    transaction costs, Sharpe-like reward over the last REWARD_WINDOW values),
+    but weights, costs, returns and rewards are computed as (N, n_assets) and
+    (N,) array operations, so one step advances all N portfolios.
+
+    Each portfolio starts its episode at a random date when random_start is
+    True (at the first date with a full lookback window otherwise), and runs
+    until the last date or for episode_length steps. Portfolios that finish are
+    reset automatically when autoreset is True; their final observations are
+    returned in infos['final_observation'].
+
+    Observations are rows of one preallocated (N, obs_dim) float32 buffer that
+    is overwritten by the next step or reset.
+    """
+
+    render_mode = None
+
+    def __init__(self, market, n_envs=8, initial_balance=100000, transaction_cost=0.001,
+                 lookback_window=10, episode_length=None, random_start=True, autoreset=True,
+                 seed=None):
+        self.market = market
+        self.n_envs = n_envs
+        self.n_assets = market.n_assets
+        self.initial_balance = initial_balance
+        self.transaction_cost = transaction_cost
+        self.lookback_window = lookback_window
+        self.episode_length = episode_length
+        self.random_start = random_start
+        self.autoreset = autoreset
+
+        # Episodes end when the step index reaches the last date, as in PortfolioEnv
+        self.last_step = market.n_dates - 1
+        self.latest_start = self.last_step - (episode_length or 1)
+        if self.latest_start < lookback_window:
+            raise ValueError(f"Not enough dates ({market.n_dates}) for lookback_window={lookback_window} "
+                             f"and episode_length={episode_length}")
+
+        self.return_windows = market.return_windows(lookback_window)
+        obs_dim = market.observation_size(lookback_window)
+        self.action_space = spaces.Box(low=0, high=1, shape=(self.n_assets,), dtype=np.float32)
+        self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(obs_dim,), dtype=np.float32)
+
+        self._tech_slice = slice(self.n_assets, self.n_assets + market.n_tech)
+        self._returns_slice = slice(self.n_assets + market.n_tech, None)
+        self._obs = np.zeros((n_envs, obs_dim), dtype=np.float32)
+
+        self.current_step = np.zeros(n_envs, dtype=np.int64)
+        self.episode_steps = np.zeros(n_envs, dtype=np.int64)
+        self.balance = np.zeros(n_envs, dtype=np.float64)
+        self.weights = np.zeros((n_envs, self.n_assets), dtype=np.float64)
+        # Ring buffer of the last REWARD_WINDOW - 1 portfolio returns per portfolio
+        self._recent_returns = np.zeros((n_envs, REWARD_WINDOW - 1), dtype=np.float64)
+        self._rows = np.arange(n_envs)
+
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self, seed=None, indices=None):
+        """Reset all portfolios (or only those in indices) and return the observations"""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        indices = self._rows if indices is None else np.asarray(indices)
+
+        if self.random_start:
+            self.current_step[indices] = self.rng.integers(self.lookback_window, self.latest_start + 1,
+                                                           size=len(indices))
+        else:
+            self.current_step[indices] = self.lookback_window
+        self.episode_steps[indices] = 0
+        self.balance[indices] = self.initial_balance
+        self.weights[indices] = 1.0 / self.n_assets
+        self._recent_returns[indices] = 0.0
+
+        self._write_observations(indices)
+        return self._obs
+
+    def _write_observations(self, indices):
+        t = self.current_step[indices]
+        obs = self._obs
+        obs[indices, :self.n_assets] = self.weights[indices]
+        obs[indices, self._tech_slice] = self.market.tech_array[t]
+        obs[indices, self._returns_slice] = self.return_windows[t - self.lookback_window]
+
+    def step(self, actions):
+        """
+        Step every portfolio with an (N, n_assets) array of target weights.
+
+        Returns (observations, rewards, terminated, truncated, infos) where the
+        first four are arrays and infos is a dict of per-portfolio arrays.
+        """
+        new_weights = np.clip(actions, 0, 1).astype(np.float64, copy=False)
+        new_weights /= new_weights.sum(axis=1, keepdims=True) + 1e-8
+
+        transaction_costs = np.abs(new_weights - self.weights).sum(axis=1) * self.transaction_cost
+        self.weights = new_weights
+
+        t = self.current_step
+        asset_returns = self.market.return_array[t]
+        portfolio_return = np.einsum('ij,ij->i', new_weights, asset_returns)
+
+        previous_balance = self.balance
+        self.balance = previous_balance * (1 + portfolio_return - transaction_costs)
+        self._recent_returns[self._rows, self.episode_steps % (REWARD_WINDOW - 1)] = \
+            (self.balance - previous_balance) / previous_balance
+        self.episode_steps += 1
+
+        # Sharpe-like reward once REWARD_WINDOW values exist, as in PortfolioEnv
+        mean_return = self._recent_returns.mean(axis=1)
+        std_return = self._recent_returns.std(axis=1) + 1e-8
+        rewards = np.where(self.episode_steps >= REWARD_WINDOW - 1,
+                           mean_return / std_return, portfolio_return) - transaction_costs * 100
+
+        self.current_step += 1
+        terminated = self.current_step >= self.last_step
+        if self.episode_length is not None:
+            truncated = (self.episode_steps >= self.episode_length) & ~terminated
+        else:
+            truncated = np.zeros(self.n_envs, dtype=bool)
+
+        infos = {
+            'portfolio_value': self.balance.copy(),
+            'portfolio_return': portfolio_return,
+            'transaction_costs': transaction_costs
+        }
+
+        self._write_observations(self._rows)
+        done = terminated | truncated
+        if self.autoreset and done.any():
+            infos['final_observation'] = self._obs.copy()
+            self.reset(indices=np.flatnonzero(done))
+
+        return self._obs, rewards, terminated, truncated, infos
+
+
+class PortfolioGymEnv(gymnasium.Env):
+    """
+    Single-portfolio gymnasium env over MarketData, with BatchPortfolioEnv's
+    random episode starts. Used as the per-process env of a SubprocVecEnv.
+    """
+
+    def __init__(self, market, **env_kwargs):
+        super().__init__()
+        self.batch = BatchPortfolioEnv(market, n_envs=1, autoreset=False, **env_kwargs)
+        self.n_assets = market.n_assets
+        self.asset_names = market.asset_names
+        self.action_space = self.batch.action_space
+        self.observation_space = self.batch.observation_space
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        return self.batch.reset(seed=seed)[0].copy(), {}
+
+    def step(self, action):
+        obs, rewards, terminated, truncated, infos = self.batch.step(np.asarray(action).reshape(1, -1))
+        info = {key: value[0] for key, value in infos.items()}
+        return obs[0].copy(), float(rewards[0]), bool(terminated[0]), bool(truncated[0]), info
+
+
+class SharedPortfolioEnvFactory:
+    """
+    Picklable env factory for SubprocVecEnv that ships only a SharedMarketData
+    handle to the worker, which then attaches to the shared market arrays.
+
+    Usage:
+        shared = MarketData.from_frames(prices, returns, tech).share()
+        vec_env = SubprocVecEnv(make_shared_env_fns(shared, n_envs=4, episode_length=252))
+        ...
+        vec_env.close()
+        shared.unlink()
+    """
+
+    def __init__(self, shared_market, seed=None, **env_kwargs):
+        self.shared_market = shared_market
+        self.seed = seed
+        self.env_kwargs = env_kwargs
+
+    def __call__(self):
+        return PortfolioGymEnv(self.shared_market.market_data(), seed=self.seed, **self.env_kwargs)
+
+
+def make_shared_env_fns(shared_market, n_envs, seed=0, **env_kwargs):
+    """One SharedPortfolioEnvFactory per worker, each with its own seed"""
+    return [SharedPortfolioEnvFactory(shared_market, seed=seed + i, **env_kwargs) for i in range(n_envs)]
+
+
+def synthetic_prices(n_days=1500, assets=('SPY', 'AAPL', 'MSFT', 'GOOGL'), seed=42, start='2018-01-01'):
+    """Geometric random-walk prices on business days, for offline runs and benchmarks"""
+    rng = np.random.default_rng(seed)
+    daily_returns = rng.normal(0.0005, 0.015, size=(n_days, len(assets)))
+    values = 100 * np.cumprod(1 + daily_returns, axis=0)
+    index = pd.bdate_range(start, periods=n_days)
+    return pd.DataFrame(values, index=index, columns=list(assets))
+
+
+def compute_features(prices):
+    """Returns and technical indicators exactly as computed in download_data"""
+    returns = prices.pct_change().dropna()
+
+    tech_indicators = pd.DataFrame(index=prices.index)
+    for asset in prices.columns:
+        tech_indicators[f'{asset}_SMA_10'] = prices[asset].rolling(10).mean() / prices[asset] - 1
+        tech_indicators[f'{asset}_SMA_30'] = prices[asset].rolling(30).mean() / prices[asset] - 1
+        tech_indicators[f'{asset}_VOL_10'] = returns[asset].rolling(10).std()
+        tech_indicators[f'{asset}_MOMENTUM'] = returns[asset].rolling(5).sum()
+    tech_indicators = tech_indicators.dropna()
+
+    return returns, tech_indicators
@@ -0,0 +1,129 @@
+"""
+Vectorized portfolio environments for stable-baselines3
+
+The notebook trains PPO on `DummyVecEnv([lambda: train_env])`: one portfolio,
+stepped in a Python loop. This module offers two multi-environment setups:
+
+- `BatchPortfolioVecEnv`: a natively vectorized VecEnv that steps N
+  portfolios at once with array operations (`portfolio_env.BatchPortfolioEnv`).
+- `make_subproc_vec_env`: a `SubprocVecEnv` whose workers share the market
+  data through shared memory instead of each receiving pickled DataFrames.
+
+Usage:
+    from portfolio_env import MarketData
+    from portfolio_vec_env import BatchPortfolioVecEnv
+
+    market = MarketData.from_frames(train_prices, train_returns, train_tech)
+    vec_env = BatchPortfolioVecEnv(market, n_envs=16, episode_length=252, seed=0)
+    model = PPO("MlpPolicy", vec_env, n_steps=128)
+"""
+
+import inspect
+
+import numpy as np
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecEnv
+
+from portfolio_env import BatchPortfolioEnv, make_shared_env_fns
+
+
+class BatchPortfolioVecEnv(VecEnv):
+    """
+    stable-baselines3 VecEnv over a BatchPortfolioEnv.
+
+    Finished portfolios are reset automatically, with their last observation
+    in info['terminal_observation'], as in DummyVecEnv and SubprocVecEnv.
+    """
+
+    def __init__(self, market, n_envs=8, **env_kwargs):
+        self.batch = BatchPortfolioEnv(market, n_envs=n_envs, autoreset=True, **env_kwargs)
+        self._actions = None
+        super().__init__(n_envs, self.batch.observation_space, self.batch.action_space)
+
+    def reset(self):
+        seed = self._seeds[0]
+        obs = self.batch.reset(seed=seed).copy()
+        self._reset_seeds()
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return obs
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        obs, rewards, terminated, truncated, infos = self.batch.step(self._actions)
+        dones = terminated | truncated
+        final_obs = infos.get('final_observation')
+
+        env_infos = []
+        for i in range(self.num_envs):
+            info = {
+                'portfolio_value': infos['portfolio_value'][i],
+                'portfolio_return': infos['portfolio_return'][i],
+                'transaction_costs': infos['transaction_costs'][i]
+            }
+            if dones[i]:
+                info['terminal_observation'] = final_obs[i]
+                info['TimeLimit.truncated'] = bool(truncated[i] and not terminated[i])
+            env_infos.append(info)
+
+        # Copy: SB3 keeps the previous observation while stepping
+        return obs.copy(), rewards.astype(np.float32), dones, env_infos
+
+    def close(self):
+        pass
+
+    def _indices(self, indices):
+        return list(self._get_indices(indices))
+
+    def _is_per_env(self, value):
+        return isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,)
+
+    def _selects_all(self, indices):
+        return indices is None or sorted(self._indices(indices)) == list(range(self.num_envs))
+
+    def get_attr(self, attr_name, indices=None):
+        value = getattr(self.batch, attr_name)
+        if self._is_per_env(value):
+            return [value[i] for i in self._indices(indices)]
+        return [value for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        """Set per-portfolio array rows in place; shared attributes only for all envs"""
+        current = getattr(self.batch, attr_name, None)
+        if self._is_per_env(current):
+            current[self._indices(indices)] = value
+        elif self._selects_all(indices):
+            setattr(self.batch, attr_name, value)
+        else:
+            raise NotImplementedError(f"'{attr_name}' is shared by all portfolios and cannot be set per env")
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        """
+        Call a BatchPortfolioEnv method once for the batch. For a subset of
+        envs the method must take an indices argument (as reset does).
+        """
+        method = getattr(self.batch, method_name)
+        selected = self._indices(indices)
+        if not self._selects_all(indices):
+            if 'indices' not in inspect.signature(method).parameters:
+                raise NotImplementedError(f"{method_name}() applies to every portfolio; "
+                                          f"it cannot be called for indices={selected}")
+            method_kwargs['indices'] = selected
+        result = method(*method_args, **method_kwargs)
+        if self._is_per_env(result):
+            return [result[i].copy() for i in selected]
+        return [result for _ in selected]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._indices(indices)]
+
+
+def make_subproc_vec_env(shared_market, n_envs, seed=0, start_method=None, **env_kwargs):
+    """
+    SubprocVecEnv of single-portfolio envs attached to shared market data.
+
+    shared_market comes from MarketData.share(); call its unlink() after
+    closing the VecEnv.
+    """
+    return SubprocVecEnv(make_shared_env_fns(shared_market, n_envs, seed=seed, **env_kwargs),
+                         start_method=start_method)
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import market_data
+
+pytest.importorskip('pyarrow')
+
+SYMBOLS = ['SPY', 'AAPL']
+
+
+def trading_days(start_date, end_date):
+    """Weekdays in [start_date, end_date) without New Year's Day"""
+    days = pd.bdate_range(start_date, pd.Timestamp(end_date) - pd.Timedelta(days=1))
+    return days[~((days.month == 1) & (days.day == 1))]
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Serve deterministic prices instead of Yahoo; record the requested ranges"""
+    calendar = trading_days('2017-01-01', '2025-01-01')
+    rng = np.random.default_rng(0)
+    history = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(calendar), len(SYMBOLS))), axis=0)),
+                           index=calendar, columns=SYMBOLS)
+    requests = []
+
+    def fetch(symbols, start_date, end_date):
+        requests.append((pd.Timestamp(start_date), pd.Timestamp(end_date)))
+        return history.loc[start_date:pd.Timestamp(end_date) - pd.Timedelta(days=1), list(symbols)]
+
+    monkeypatch.setattr(market_data, 'fetch_yahoo_prices', fetch)
+    return requests
+
+
+def test_rerun_with_holiday_start_date_uses_the_store(tmp_path, fetches):
+    store_dir = str(tmp_path / 'store')
+    first = market_data.download_data(SYMBOLS, '2018-01-01', '2024-03-15', store_dir)
+    assert first[0].index[0] == pd.Timestamp('2018-01-02')
+
+    second = market_data.download_data(SYMBOLS, '2018-01-01', '2024-03-15', store_dir)
+    assert len(fetches) == 1
+    for before, after in zip(first, second):
+        pd.testing.assert_frame_equal(before, after)
+
+
+def test_store_starting_after_start_date_is_rebuilt(tmp_path, fetches):
+    store_dir = str(tmp_path / 'store')
+    market_data.download_data(SYMBOLS, '2020-01-01', '2024-03-15', store_dir)
+
+    prices, _, _ = market_data.download_data(SYMBOLS, '2018-01-01', '2024-03-15', store_dir)
+    assert fetches[-1][0] == pd.Timestamp('2018-01-01')
+    assert prices.index[0] == pd.Timestamp('2018-01-02')
+    assert market_data.MarketDataStore(store_dir).load()[0].index[0] == pd.Timestamp('2018-01-02')
+
+
+def test_store_with_other_symbols_raises(tmp_path, fetches):
+    store_dir = str(tmp_path / 'store')
+    market_data.download_data(SYMBOLS, '2018-01-01', '2019-01-01', store_dir)
+
+    with pytest.raises(ValueError):
+        market_data.download_data(['SPY'], '2018-01-01', '2019-01-01', store_dir)
@@ -0,0 +1,104 @@
+"""
+Benchmark: fixed max_length padding vs the dynamic padding pipeline
+Fine-tunes for a few steps three ways and reports training steps per second
+and the tokens computed:
+- the lab's pipeline: every ticket padded to max_length=256;
+- dynamic padding: DynamicPaddingCollator with random batches;
+- dynamic padding with length-grouped batches (TrainingArguments.group_by_length).
+Also times tokenize_splits on a cold and a warm cache.
+
+Without --model-dir pointing at a model, a randomly initialized DistilBERT
+(same architecture, toy vocabulary) is used.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from data_pipeline import LENGTH_COLUMN, DynamicPaddingCollator, padding_report, tokenize_splits
+from inference_server_benchmark import LABELS, resolve_model_dir, synthetic_tickets
+
+
+def fixed_padding_dataset(frame, tokenizer, max_length):
+    """tokenize_function from the lab"""
+    from datasets import Dataset
+
+    dataset = Dataset.from_pandas(frame[['text', 'labels']], preserve_index=False)
+    dataset = dataset.map(lambda examples: tokenizer(examples['text'], truncation=True, padding='max_length',
+                                                     max_length=max_length), batched=True, remove_columns=['text'])
+    dataset.set_format(type='torch', columns=['input_ids', 'attention_mask', 'labels'])
+    return dataset
+
+
+def train_steps_per_second(model_dir, dataset, steps, batch_size, output_dir, collator=None, grouped=False):
+    from transformers import AutoModelForSequenceClassification, Trainer, TrainingArguments
+
+    args = TrainingArguments(output_dir=output_dir, max_steps=steps, per_device_train_batch_size=batch_size,
+                             learning_rate=2e-5, save_strategy='no', logging_strategy='no', report_to='none',
+                             group_by_length=grouped, length_column_name=LENGTH_COLUMN, seed=42, use_cpu=True)
+    trainer = Trainer(model=AutoModelForSequenceClassification.from_pretrained(model_dir), args=args,
+                      train_dataset=dataset, data_collator=collator)
+    start = time.perf_counter()
+    trainer.train()
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-dir", default='./fine_tuned_model')
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--threads", type=int, default=os.cpu_count(), help="torch intra-op threads")
+    args = parser.parse_args()
+
+    import torch
+    from transformers import AutoTokenizer
+
+    torch.set_num_threads(args.threads)
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({'text': synthetic_tickets(args.tickets),
+                          'labels': rng.integers(len(LABELS), size=args.tickets)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = resolve_model_dir(args.model_dir, tmp)
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        cache_dir = os.path.join(tmp, 'tokenized_cache')
+
+        start = time.perf_counter()
+        tokenize_splits({'train': frame}, tokenizer, args.max_length, cache_dir)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        train = tokenize_splits({'train': frame}, tokenizer, args.max_length, cache_dir)['train']
+        print(f"tokenize_splits: {cold:.2f}s cold, {time.perf_counter() - start:.3f}s from cache\n")
+
+        print(padding_report(train['length'], args.batch_size, args.max_length).to_string(
+            formatters={'padding_share': '{:.1%}'.format, 'tokens_saved': '{:.1%}'.format}))
+
+        print(f"\n{args.steps} training steps, batch size {args.batch_size}, {args.threads} threads")
+        print(f"{'pipeline':>28} | {'steps/s':>7} | {'speedup':>7} | padding efficiency")
+        print("-" * 70)
+        runs = [
+            ('max_length padding', fixed_padding_dataset(frame, tokenizer, args.max_length), None, False),
+            ('dynamic padding', train, DynamicPaddingCollator(tokenizer), False),
+            ('dynamic + length-grouped', train, DynamicPaddingCollator(tokenizer), True),
+        ]
+        baseline = None
+        for name, dataset, collator, grouped in runs:
+            rate = train_steps_per_second(model_dir, dataset, args.steps, args.batch_size,
+                                          os.path.join(tmp, 'results'), collator, grouped)
+            baseline = baseline or rate
+            efficiency = f"{collator.padding_efficiency:.0%}" if collator else '-'
+            print(f"{name:>28} | {rate:>7.2f} | {rate / baseline:>6.1f}x | {efficiency}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark: one-at-a-time pipeline vs the micro-batching inference server
+Classifies the same tickets with the lab's pipeline (one call per ticket, as
+predict_ticket_category does) and through BatchedClassifier with concurrent
+client threads, reporting throughput, latency percentiles and batch sizes.
+
+Without --model-dir pointing at a fine-tuned model, a randomly initialized
+DistilBERT (same architecture, toy vocabulary) is used: the timings are
+representative, the predictions are not.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+LABELS = ['Technical Issue', 'Billing', 'Account Management', 'General Inquiry']
+
+SAMPLE_TICKETS = [
+    "The website keeps showing a server error when I try to log in",
+    "I was charged for a subscription I never signed up for",
+    "How do I reset my password? I can't remember it",
+    "What's the difference between your basic and premium plans?",
+    "My credit card was declined but I have sufficient funds",
+    "The mobile app crashes every time I try to open it",
+    "I want to cancel my subscription and get a refund",
+    "Can you help me understand how to use the new feature?",
+    "I need help setting up my account with two-factor authentication",
+    "Getting timeout errors when trying to save my work",
+    "Invoice shows wrong tax calculation for my region",
+    "Do you offer training sessions for new users?",
+]
+
+
+def synthetic_tickets(n, seed=0, long_fraction=0.1):
+    """Mostly one-sentence tickets with a long tail of multi-sentence ones"""
+    rng = random.Random(seed)
+    tickets = []
+    for _ in range(n):
+        sentences = rng.randint(3, 12) if rng.random() < long_fraction else 1
+        tickets.append(" ".join(rng.choice(SAMPLE_TICKETS) for _ in range(sentences)))
+    return tickets
+
+
+def make_synthetic_model(path):
+    """Save a randomly initialized DistilBERT classifier and a toy WordPiece tokenizer"""
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification, DistilBertTokenizerFast
+
+    words = sorted({word.strip("?,.'").lower() for ticket in SAMPLE_TICKETS for word in ticket.split()})
+    vocab_file = os.path.join(path, 'vocab.txt')
+    os.makedirs(path, exist_ok=True)
+    with open(vocab_file, 'w') as f:
+        f.write("\n".join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + words + list("?,.'")) + "\n")
+
+    DistilBertTokenizerFast(vocab_file=vocab_file).save_pretrained(path)
+    config = DistilBertConfig(num_labels=len(LABELS), id2label=dict(enumerate(LABELS)),
+                              label2id={label: i for i, label in enumerate(LABELS)})
+    DistilBertForSequenceClassification(config).save_pretrained(path)
+    return path
+
+
+def resolve_model_dir(model_dir, tmp):
+    if model_dir and os.path.isdir(model_dir):
+        return model_dir
+    print("No fine-tuned model found; using a randomly initialized DistilBERT")
+    return make_synthetic_model(os.path.join(tmp, 'synthetic_model'))
+
+
+def run_pipeline(model_dir, tickets, threads):
+    import torch
+    from transformers import pipeline
+
+    torch.set_num_threads(threads)
+    classifier = pipeline("text-classification", model=model_dir, tokenizer=model_dir, top_k=None)
+    latencies = []
+    start = time.perf_counter()
+    for ticket in tickets:
+        request_start = time.perf_counter()
+        classifier(ticket)
+        latencies.append(time.perf_counter() - request_start)
+    return time.perf_counter() - start, np.array(latencies) * 1000, None
+
+
+def run_batched(model_dir, tickets, threads, clients, max_batch_size, max_wait_ms):
+    from inference_server import BatchedClassifier, TicketClassifier
+
+    classifier = TicketClassifier.from_pretrained(model_dir, num_threads=threads)
+    with BatchedClassifier(classifier, max_batch_size, max_wait_ms) as server:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(server.classify, tickets))
+        elapsed = time.perf_counter() - start
+        snapshot = server.metrics.snapshot()
+    return elapsed, np.array(server.metrics.latencies) * 1000, snapshot
+
+
+def report(name, n, elapsed, latencies_ms):
+    p50, p99 = np.percentile(latencies_ms, [50, 99])
+    print(f"{name:>30} | {n / elapsed:>10.1f} | {p50:>8.1f} | {p99:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-dir", default='./fine_tuned_model')
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent client threads")
+    parser.add_argument("--threads", type=int, default=os.cpu_count(), help="torch intra-op threads")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    tickets = synthetic_tickets(args.requests)
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = resolve_model_dir(args.model_dir, tmp)
+        print(f"{args.requests} tickets, {args.threads} torch threads")
+        print(f"{'method':>30} | {'tickets/s':>10} | {'p50 ms':>8} | {'p99 ms':>8}")
+        print("-" * 66)
+
+        elapsed, latencies, _ = run_pipeline(model_dir, tickets, args.threads)
+        report("pipeline, one at a time", len(tickets), elapsed, latencies)
+
+        elapsed, latencies, snapshot = run_batched(model_dir, tickets, args.threads, args.clients,
+                                                   args.max_batch_size, args.max_wait_ms)
+        report(f"batched, {args.clients} clients", len(tickets), elapsed, latencies)
+
+    print(f"\nmean batch size {snapshot['mean_batch_size']:.1f}, {snapshot['forward_passes']} forward passes, "
+          f"padding efficiency {snapshot['padding_efficiency']:.0%}")
+    print(f"batch size histogram: {snapshot['batch_size_histogram']}")
+
+
+if __name__ == "__main__":
+    main()
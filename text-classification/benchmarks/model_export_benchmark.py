@@ -0,0 +1,81 @@
+"""
+Benchmark: fp32 vs INT8 vs ONNX Runtime variants of the ticket classifier
+Exports the model with model_export, then for every variant reports the size
+of its weights, single-ticket latency, throughput on batches of tickets,
+agreement of its predictions with fp32 and agreement of the same tickets
+served through BatchedClassifier with direct predictions.
+
+Without --model-dir pointing at a fine-tuned model, a randomly initialized
+DistilBERT (same architecture, toy vocabulary) is used: the timings are
+representative, the predictions are not.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from inference_server import BatchedClassifier
+from inference_server_benchmark import resolve_model_dir, synthetic_tickets
+from model_export import VARIANTS, batch_logits, export_models, load_classifier, model_size_mb
+
+
+def single_latencies_ms(classifier, tickets):
+    latencies = []
+    for ticket in tickets:
+        start = time.perf_counter()
+        classifier.predict([ticket])
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def served_agreement(classifier, tickets):
+    """Share of tickets whose top label through BatchedClassifier matches classifier.predict"""
+    with BatchedClassifier(classifier) as batcher:
+        served = batcher.classify_many(tickets, timeout=60)
+    direct = classifier.predict(tickets)
+    return np.mean([s[0]['label'] == d[0]['label'] for s, d in zip(served, direct)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-dir", default='./fine_tuned_model')
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=os.cpu_count(), help="intra-op threads")
+    args = parser.parse_args()
+
+    tickets = synthetic_tickets(args.requests)
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = resolve_model_dir(args.model_dir, tmp)
+        export_dir = os.path.join(tmp, 'exported_model')
+        export_models(model_dir, export_dir)
+
+        print(f"{args.requests} tickets, {args.threads} threads, batches of {args.batch_size}")
+        print(f"{'variant':>10} | {'size MB':>8} | {'p50 ms':>7} | {'p99 ms':>7} | {'tickets/s':>9} | "
+              f"agreement | served")
+        print("-" * 77)
+        reference = None
+        for variant in VARIANTS:
+            classifier = load_classifier(variant, model_dir, export_dir, num_threads=args.threads)
+            classifier.predict(tickets[:args.batch_size])  # warm-up
+            p50, p99 = np.percentile(single_latencies_ms(classifier, tickets), [50, 99])
+
+            start = time.perf_counter()
+            predictions = batch_logits(classifier, tickets, args.batch_size).argmax(axis=1)
+            throughput = len(tickets) / (time.perf_counter() - start)
+            if reference is None:
+                reference = predictions
+
+            print(f"{variant:>10} | {model_size_mb(variant, model_dir, export_dir):>8.1f} | {p50:>7.1f} | "
+                  f"{p99:>7.1f} | {throughput:>9.1f} | {np.mean(predictions == reference):>9.3f} | "
+                  f"{served_agreement(classifier, tickets):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Tokenization and batching pipeline for fine-tuning the ticket classifier
+
+The lab's `tokenize_function` pads every ticket to `max_length=256` and
+re-tokenizes the three splits on every run, although most tickets are a
+couple of dozen tokens long. This module replaces those steps:
+
+- `tokenize_splits` tokenizes without padding, adds a `length` column and
+  saves the splits as Arrow datasets under `./tokenized_cache/<key>`. The key
+  hashes the tokenizer (vocabulary and settings), max_length and the split
+  contents, so later runs load the cache (memory-mapped) instead of
+  re-tokenizing, and any change to the data or tokenizer gets a new entry.
+- `DynamicPaddingCollator` pads each batch to its own longest ticket and
+  counts the real and padded tokens it produced.
+- Training with `TrainingArguments(group_by_length=True,
+  length_column_name='length')` draws batches of similar length with
+  transformers' `LengthGroupedSampler` (shuffled groups of ~50 batches,
+  sorted by length), so short tickets are rarely batched with long ones.
+  Evaluation and prediction keep the dataset order.
+- `padding_report` compares the tokens computed per epoch with fixed,
+  dynamic and length-grouped padding.
+
+Usage:
+    from data_pipeline import LENGTH_COLUMN, DynamicPaddingCollator, tokenize_splits
+
+    tokenized = tokenize_splits({'train': train_df, 'validation': val_df, 'test': test_df}, tokenizer)
+    args = TrainingArguments(output_dir='./results', group_by_length=True, length_column_name=LENGTH_COLUMN)
+    trainer = Trainer(model=model, args=args, train_dataset=tokenized['train'],
+                      eval_dataset=tokenized['validation'], data_collator=DynamicPaddingCollator(tokenizer),
+                      compute_metrics=compute_metrics)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import torch
+from datasets import Dataset, DatasetDict
+from transformers import DataCollatorWithPadding
+from transformers.trainer_pt_utils import LengthGroupedSampler
+
+DEFAULT_CACHE_DIR = './tokenized_cache'
+
+# Truncation length used by tokenize_function in the lab
+MAX_LENGTH = 256
+
+LENGTH_COLUMN = 'length'
+
+# Bump when the stored columns change, so old cache entries are not reused
+CACHE_VERSION = 1
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash of everything that determines the tokenizer's output"""
+    if getattr(tokenizer, 'is_fast', False):
+        # The serialized backend covers vocabulary, normalizer, pre-tokenizer and post-processor
+        state = tokenizer.backend_tokenizer.to_str()
+    else:
+        state = json.dumps(sorted(tokenizer.get_vocab().items()))
+    settings = json.dumps([type(tokenizer).__name__, tokenizer.padding_side, tokenizer.truncation_side,
+                           tokenizer.model_input_names], sort_keys=True)
+    return hashlib.sha1((state + settings).encode('utf-8')).hexdigest()
+
+
+def cache_key(splits, tokenizer, max_length=MAX_LENGTH, text_column='text', label_column='labels'):
+    """Cache entry name for tokenizing splits ({name: DataFrame}) with tokenizer"""
+    digest = hashlib.sha1(tokenizer_fingerprint(tokenizer).encode('ascii'))
+    digest.update(json.dumps([CACHE_VERSION, max_length, text_column, label_column]).encode('utf-8'))
+    for name in sorted(splits):
+        frame = splits[name][[text_column, label_column]]
+        digest.update(name.encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def tokenize_splits(splits, tokenizer, max_length=MAX_LENGTH, cache_dir=DEFAULT_CACHE_DIR,
+                    text_column='text', label_column='labels'):
+    """
+    Tokenized DatasetDict of splits ({name: DataFrame}), cached on disk.
+
+    Each split has input_ids and attention_mask (truncated at max_length, not
+    padded), the labels and the token count in a 'length' column. With
+    cache_dir=None nothing is read or written.
+    """
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, cache_key(splits, tokenizer, max_length, text_column, label_column))
+        if os.path.isdir(path):
+            return DatasetDict.load_from_disk(path)
+
+    def tokenize(examples):
+        encoded = tokenizer(examples[text_column], truncation=True, max_length=max_length)
+        encoded[LENGTH_COLUMN] = [len(ids) for ids in encoded['input_ids']]
+        return encoded
+
+    tokenized = DatasetDict({
+        name: Dataset.from_pandas(frame[[text_column, label_column]], preserve_index=False)
+                     .map(tokenize, batched=True, remove_columns=[text_column])
+        for name, frame in splits.items()
+    })
+    if path:
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tokenized.save_to_disk(tmp_path)
+        os.replace(tmp_path, path)
+        # Reload so the splits are backed by the cache files like on later runs
+        tokenized = DatasetDict.load_from_disk(path)
+    return tokenized
+
+
+class DynamicPaddingCollator:
+    """
+    Pad each batch to its longest sequence.
+
+    Columns in drop_columns (the 'length' column by default) are removed
+    before the batch reaches the model, in case the Trainer keeps them
+    (remove_unused_columns=False). real_tokens and padded_tokens count
+    the tokens of every batch collated so far.
+    """
+
+    def __init__(self, tokenizer, pad_to_multiple_of=None, drop_columns=(LENGTH_COLUMN,)):
+        self.collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=pad_to_multiple_of)
+        self.drop_columns = set(drop_columns)
+        self.real_tokens = 0
+        self.padded_tokens = 0
+
+    def __call__(self, features):
+        batch = self.collator([{key: value for key, value in feature.items() if key not in self.drop_columns}
+                               for feature in features])
+        self.real_tokens += int(batch['attention_mask'].sum())
+        self.padded_tokens += batch['attention_mask'].numel()
+        return batch
+
+    @property
+    def padding_efficiency(self):
+        return self.real_tokens / self.padded_tokens if self.padded_tokens else 1.0
+
+
+def _batch_tokens(lengths, order, batch_size):
+    """Padded tokens when the sequences are batched in the given order"""
+    ordered = np.asarray(lengths)[np.asarray(order)]
+    return sum(int(batch.max()) * len(batch) for batch in np.array_split(ordered, range(batch_size, len(ordered), batch_size)))
+
+
+def padding_report(lengths, batch_size=8, max_length=MAX_LENGTH, seed=42):
+    """
+    Tokens computed in one epoch over sequences of the given lengths with
+    padding to max_length, dynamic padding of random batches, and dynamic
+    padding of length-grouped batches.
+    """
+    lengths = [int(length) for length in lengths]
+    real = sum(lengths)
+    generator = torch.Generator()
+    generator.manual_seed(seed)
+    tokens = {
+        'max_length': max_length * len(lengths),
+        'dynamic': _batch_tokens(lengths, torch.randperm(len(lengths), generator=generator).tolist(), batch_size),
+        'length_grouped': _batch_tokens(lengths, list(LengthGroupedSampler(batch_size, lengths=lengths,
+                                                                           generator=generator)), batch_size),
+    }
+    report = pd.DataFrame({'tokens': tokens}).rename_axis('padding')
+    report['padding_tokens'] = report['tokens'] - real
+    report['padding_share'] = report['padding_tokens'] / report['tokens']
+    report['tokens_saved'] = 1 - report['tokens'] / tokens['max_length']
+    return report
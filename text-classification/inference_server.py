@@ -0,0 +1,372 @@
+"""
+Batched CPU inference service for the fine-tuned ticket classifier
+
+`predict_ticket_category` runs the Hugging Face pipeline on one ticket at a
+time. This module serves the model from `./fine_tuned_model` with dynamic
+micro-batching:
+
+- Requests are queued. A single worker thread collects them until
+  `max_batch_size` tickets are waiting or `max_wait_ms` have passed since the
+  first one, then classifies the whole batch in one forward pass.
+- Tickets are padded to the longest ticket of their forward pass (still
+  truncated at 256 tokens), not to a fixed `max_length=256`. A collected batch
+  is sorted by token length and split into forward passes of similar length
+  (at most `max_batch_tokens` padded tokens each), so one long ticket does not
+  inflate the padding of every short ticket that arrived with it.
+- Inference runs under `torch.inference_mode()` with a configurable number of
+  intra-op threads.
+- `ServerMetrics` records request latencies (percentiles), a histogram of
+  batch sizes and the share of computed tokens that were padding.
+
+Usage:
+    from inference_server import BatchedClassifier, TicketClassifier
+
+    classifier = TicketClassifier.from_pretrained('./fine_tuned_model', num_threads=4)
+    with BatchedClassifier(classifier, max_batch_size=32, max_wait_ms=5) as server:
+        server.classify("My account has been locked")   # [{'label': ..., 'score': ...}, ...]
+        server.metrics.snapshot()
+
+    # Or as an HTTP service: POST /classify {"text": ...} or {"texts": [...]}, GET /metrics
+    python inference_server.py --model-dir ./fine_tuned_model --port 8000 --threads 4
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+DEFAULT_MODEL_DIR = './fine_tuned_model'
+
+# Truncation length used by tokenize_function in the lab
+MAX_LENGTH = 256
+
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+# Fixed cost of one forward pass, in padded-token equivalents (DistilBERT on
+# CPU: roughly the time of ~50 extra tokens); used to decide when splitting a
+# batch by length pays off
+PASS_COST_TOKENS = 48
+
+
+def length_groups(lengths, max_batch_tokens, pass_cost=PASS_COST_TOKENS):
+    """
+    Split items into forward passes of similar length.
+
+    Items are sorted by length and cut into consecutive groups minimizing the
+    padded tokens computed plus pass_cost per forward pass, with at most
+    max_batch_tokens padded tokens per pass (a single longer item still gets
+    its own pass). Returns lists of indices into lengths.
+    """
+    order = np.argsort(lengths, kind='stable')
+    sorted_lengths = [lengths[i] for i in order]
+    n = len(order)
+    # best[j]: cheapest way to run the j shortest items; cut[j]: start of its last group
+    best = [0] + [float('inf')] * n
+    cut = [0] * (n + 1)
+    for j in range(1, n + 1):
+        longest = sorted_lengths[j - 1]
+        for i in range(j - 1, -1, -1):
+            size = j - i
+            if size > 1 and size * longest > max_batch_tokens:
+                break
+            cost = best[i] + size * longest + pass_cost
+            if cost < best[j]:
+                best[j], cut[j] = cost, i
+
+    groups, j = [], n
+    while j > 0:
+        groups.append([int(i) for i in order[cut[j]:j]])
+        j = cut[j]
+    return groups[::-1]
+
+
+class TicketClassifier:
+    """
+    Tokenizer plus model, classifying a list of tickets in one forward pass.
+
+    Predictions have the pipeline's return_all_scores format: for each text,
+    a list of {'label', 'score'} dicts, sorted by score (highest first).
+    """
+
+    def __init__(self, model, tokenizer, max_length=MAX_LENGTH, num_threads=None):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+
+    @classmethod
+    def from_pretrained(cls, model_dir=DEFAULT_MODEL_DIR, **kwargs):
+        return cls(AutoModelForSequenceClassification.from_pretrained(model_dir),
+                   AutoTokenizer.from_pretrained(model_dir), **kwargs)
+
+    def encode(self, texts):
+        """Token ids of each text, truncated at max_length and not padded"""
+        return self.tokenizer(list(texts), truncation=True, max_length=self.max_length)['input_ids']
+
+    def pad(self, input_ids):
+        """Tensors padded to the longest sequence in input_ids"""
+        return self.tokenizer.pad({'input_ids': list(input_ids)}, padding='longest', return_tensors='pt')
+
+    def tokenize(self, texts):
+        return self.pad(self.encode(texts))
+
+    def logits(self, inputs):
+        with torch.inference_mode():
+            return self.model(**inputs).logits.float().numpy()
+
+    def predict_inputs(self, inputs):
+        """Predictions for an already tokenized batch"""
+        logits = self.logits(inputs)
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return [[{'label': self.labels[i], 'score': float(row[i])} for i in np.argsort(-row)]
+                for row in probabilities]
+
+    def predict(self, texts):
+        return self.predict_inputs(self.tokenize(texts))
+
+
+class ServerMetrics:
+    """Latency percentiles and batch-size histogram over the most recent requests"""
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.forward_passes = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.started = time.perf_counter()
+
+    def record_batch(self, latencies, forward_passes, tokens, padded_tokens):
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.batch_sizes[len(latencies)] += 1
+            self.requests += len(latencies)
+            self.forward_passes += forward_passes
+            self.tokens += tokens
+            self.padded_tokens += padded_tokens
+
+    def snapshot(self):
+        with self._lock:
+            latencies_ms = np.array(self.latencies) * 1000
+            batches = sum(self.batch_sizes.values())
+            elapsed = time.perf_counter() - self.started
+            return {
+                'requests': self.requests,
+                'batches': batches,
+                'throughput_per_s': self.requests / elapsed if elapsed > 0 else 0.0,
+                'latency_ms': {f'p{p}': float(np.percentile(latencies_ms, p)) if len(latencies_ms) else None
+                               for p in LATENCY_PERCENTILES},
+                'mean_batch_size': self.requests / batches if batches else 0.0,
+                'batch_size_histogram': dict(sorted(self.batch_sizes.items())),
+                'forward_passes': self.forward_passes,
+                # Share of the tokens run through the model that were real, not padding
+                'padding_efficiency': self.tokens / self.padded_tokens if self.padded_tokens else 1.0,
+            }
+
+
+class BatchedClassifier:
+    """
+    Dynamic micro-batching in front of a TicketClassifier.
+
+    submit() is thread-safe and returns a Future; a worker thread runs the
+    batches, so concurrent callers (e.g. HTTP handler threads) share forward
+    passes.
+    """
+
+    _STOP = object()
+
+    def __init__(self, classifier, max_batch_size=32, max_wait_ms=5.0, max_batch_tokens=4096):
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_tokens = max_batch_tokens
+        self.metrics = ServerMetrics()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='batched-classifier', daemon=True)
+            self._worker.start()
+        return self
+
+    def stop(self):
+        if self._worker is not None:
+            self._queue.put(self._STOP)
+            self._worker.join()
+            self._worker = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, text):
+        if not isinstance(text, str):
+            # Rejected here, so one bad request cannot fail the batch it would join
+            raise TypeError(f"Expected a ticket string, got {type(text).__name__}")
+        future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        return future
+
+    def classify(self, text, timeout=None):
+        return self.submit(text).result(timeout)
+
+    def classify_many(self, texts, timeout=None):
+        futures = [self.submit(text) for text in texts]
+        return [future.result(timeout) for future in futures]
+
+    def _collect(self):
+        """Block for one request, then gather more until the batch is full or max_wait passes"""
+        first = self._queue.get()
+        if first is self._STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Callers may have cancelled while queued; running futures can no longer be cancelled
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                predictions, passes, tokens, padded_tokens = self._predict([text for text, _, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            self.metrics.record_batch([finished - queued for _, queued, _ in batch], passes, tokens, padded_tokens)
+            for (_, _, future), prediction in zip(batch, predictions):
+                future.set_result(prediction)
+
+    def _predict(self, texts):
+        """Predictions in input order, running one forward pass per length group"""
+        input_ids = self.classifier.encode(texts)
+        lengths = [len(ids) for ids in input_ids]
+        groups = length_groups(lengths, self.max_batch_tokens)
+        predictions = [None] * len(texts)
+        padded_tokens = 0
+        for group in groups:
+            inputs = self.classifier.pad([input_ids[i] for i in group])
+            # shape works for torch tensors and the NumPy arrays of OnnxTicketClassifier
+            padded_tokens += int(np.prod(inputs['input_ids'].shape))
+            for i, prediction in zip(group, self.classifier.predict_inputs(inputs)):
+                predictions[i] = prediction
+        return predictions, len(groups), sum(lengths), padded_tokens
+
+
+def make_http_server(batcher, host='127.0.0.1', port=8000):
+    """
+    A ThreadingHTTPServer in front of batcher; each connection gets a thread,
+    and concurrent requests are batched together.
+
+    POST /classify  {"text": "..."} -> {"prediction": [...]}
+                    {"texts": [...]} -> {"predictions": [[...], ...]}
+    GET  /metrics   ServerMetrics.snapshot()
+    GET  /health    {"status": "ok"}
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send(200, batcher.metrics.snapshot())
+            elif self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            else:
+                self._send(404, {'error': f'Unknown path: {self.path}'})
+
+        def do_POST(self):
+            if self.path != '/classify':
+                self._send(404, {'error': f'Unknown path: {self.path}'})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except json.JSONDecodeError as e:
+                self._send(400, {'error': f'Invalid JSON: {e}'})
+                return
+            if not isinstance(request, dict):
+                self._send(400, {'error': 'Expected {"text": str} or {"texts": [str, ...]}'})
+                return
+            try:
+                if 'text' in request:
+                    self._send(200, {'prediction': batcher.classify(request['text'])})
+                elif isinstance(request.get('texts'), list):
+                    self._send(200, {'predictions': batcher.classify_many(request['texts'])})
+                else:
+                    self._send(400, {'error': 'Expected {"text": str} or {"texts": [str, ...]}'})
+            except TypeError as e:
+                self._send(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the fine-tuned ticket classifier over HTTP")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-tokens", type=int, default=4096, help="padded tokens per forward pass")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    classifier = TicketClassifier.from_pretrained(args.model_dir, num_threads=args.threads)
+    with BatchedClassifier(classifier, args.max_batch_size, args.max_wait_ms, args.max_batch_tokens) as batcher:
+        server = make_http_server(batcher, args.host, args.port)
+        print(f"Serving {args.model_dir} on http://{args.host}:{args.port} "
+              f"(batch <= {args.max_batch_size}, wait <= {args.max_wait_ms} ms, "
+              f"{torch.get_num_threads()} threads)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
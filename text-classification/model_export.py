@@ -0,0 +1,242 @@
+"""
+INT8 and ONNX Runtime variants of the fine-tuned ticket classifier
+
+The fp32 checkpoint saved by the lab (`./fine_tuned_model`) is slow and large
+on CPU-only machines. This module runs after `Trainer` training and produces:
+
+- `int8/`: the PyTorch model with every `nn.Linear` dynamically quantized to
+  INT8 (weights stored as int8, activations quantized on the fly per batch).
+  About three quarters of DistilBERT's weights are in linear layers.
+- `model.onnx`: the fp32 graph exported for ONNX Runtime, with dynamic batch
+  and sequence axes.
+- `model.int8.onnx`: the same graph with its MatMul weights quantized to INT8
+  by ONNX Runtime.
+
+Every variant loads as a `TicketClassifier`, so it can be passed to
+`BatchedClassifier` or compared with `parity_report`, which scores each one
+with the lab's `compute_metrics` on the test split.
+
+Usage:
+    from model_export import export_models, load_classifier, parity_report
+
+    export_models('./fine_tuned_model', './exported_model')
+    classifiers = {variant: load_classifier(variant) for variant in VARIANTS}
+    parity_report(classifiers, test_df['text'], test_df['labels'], compute_metrics)
+
+    # Or from the command line
+    python model_export.py --model-dir ./fine_tuned_model --output-dir ./exported_model
+"""
+
+import argparse
+import inspect
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+from inference_server import DEFAULT_MODEL_DIR, MAX_LENGTH, TicketClassifier
+
+DEFAULT_EXPORT_DIR = './exported_model'
+
+VARIANTS = ('fp32', 'int8', 'onnx', 'onnx-int8')
+
+INT8_DIR = 'int8'
+INT8_WEIGHTS = 'quantized_state_dict.pt'
+ONNX_FILE = 'model.onnx'
+ONNX_INT8_FILE = 'model.int8.onnx'
+ONNX_OPSET = 17
+
+# Largest accuracy drop against fp32 accepted by parity_report
+ACCURACY_TOLERANCE = 0.01
+
+
+def quantize_model(model):
+    """Copy of model with its nn.Linear layers dynamically quantized to INT8"""
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def save_quantized(model, tokenizer, path):
+    """
+    Save a dynamically quantized model.
+
+    Quantized modules have no save_pretrained, so the config, the tokenizer
+    and the quantized state dict are saved; load_quantized rebuilds the fp32
+    architecture from the config, quantizes it and loads the weights.
+    """
+    os.makedirs(path, exist_ok=True)
+    model.config.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    tmp_path = os.path.join(path, INT8_WEIGHTS + '.tmp')
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, os.path.join(path, INT8_WEIGHTS))
+    return path
+
+
+def load_quantized(path):
+    model = quantize_model(AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(path)))
+    model.load_state_dict(torch.load(os.path.join(path, INT8_WEIGHTS)))
+    return model.eval()
+
+
+def export_onnx(model, tokenizer, path, opset=ONNX_OPSET):
+    """Export the fp32 model to ONNX with dynamic batch and sequence axes"""
+    os.makedirs(path, exist_ok=True)
+    example = tokenizer(["Example ticket", "A somewhat longer example ticket"], padding=True, return_tensors='pt')
+    axes = {0: 'batch', 1: 'sequence'}
+    tmp_path = os.path.join(path, ONNX_FILE + '.tmp')
+    # The TorchScript-based exporter: it needs no extra dependency and
+    # handles dynamic_axes on every torch version the lab supports
+    export_kwargs = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(
+        model.eval(),
+        (example['input_ids'], example['attention_mask']),
+        tmp_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={'input_ids': axes, 'attention_mask': axes, 'logits': {0: 'batch'}},
+        opset_version=opset,
+        **export_kwargs,
+    )
+    os.replace(tmp_path, os.path.join(path, ONNX_FILE))
+    model.config.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return os.path.join(path, ONNX_FILE)
+
+
+def quantize_onnx(onnx_path, output_path):
+    """Quantize the MatMul weights of an exported graph to INT8"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(onnx_path, output_path, op_types_to_quantize=['MatMul'], weight_type=QuantType.QInt8)
+    return output_path
+
+
+def export_models(model_dir=DEFAULT_MODEL_DIR, output_dir=DEFAULT_EXPORT_DIR, onnx=True):
+    """
+    Write the INT8 PyTorch model and, with onnx=True, the fp32 and INT8 ONNX
+    graphs for the checkpoint in model_dir. Returns {variant: path}.
+    """
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    paths = {'fp32': model_dir,
+             'int8': save_quantized(quantize_model(model), tokenizer, os.path.join(output_dir, INT8_DIR))}
+    if onnx:
+        paths['onnx'] = export_onnx(model, tokenizer, output_dir)
+        paths['onnx-int8'] = quantize_onnx(paths['onnx'], os.path.join(output_dir, ONNX_INT8_FILE))
+    return paths
+
+
+class OnnxTicketClassifier(TicketClassifier):
+    """TicketClassifier running an exported graph with ONNX Runtime"""
+
+    def __init__(self, session, tokenizer, labels, max_length=MAX_LENGTH):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.labels = list(labels)
+        self.input_names = [node.name for node in session.get_inputs()]
+
+    @classmethod
+    def from_pretrained(cls, export_dir=DEFAULT_EXPORT_DIR, quantized=False, num_threads=None, **kwargs):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(os.path.join(export_dir, ONNX_INT8_FILE if quantized else ONNX_FILE),
+                                       options, providers=['CPUExecutionProvider'])
+        config = AutoConfig.from_pretrained(export_dir)
+        labels = [config.id2label[i] for i in range(config.num_labels)]
+        return cls(session, AutoTokenizer.from_pretrained(export_dir), labels, **kwargs)
+
+    def pad(self, input_ids):
+        return self.tokenizer.pad({'input_ids': list(input_ids)}, padding='longest', return_tensors='np')
+
+    def logits(self, inputs):
+        feed = {name: np.asarray(inputs[name], dtype=np.int64) for name in self.input_names}
+        return self.session.run(['logits'], feed)[0].astype(np.float32)
+
+
+def load_classifier(variant, model_dir=DEFAULT_MODEL_DIR, export_dir=DEFAULT_EXPORT_DIR, num_threads=None):
+    """TicketClassifier for one of VARIANTS, loaded from model_dir / export_dir"""
+    if variant == 'fp32':
+        return TicketClassifier.from_pretrained(model_dir, num_threads=num_threads)
+    if variant == 'int8':
+        path = os.path.join(export_dir, INT8_DIR)
+        return TicketClassifier(load_quantized(path), AutoTokenizer.from_pretrained(path), num_threads=num_threads)
+    if variant in ('onnx', 'onnx-int8'):
+        return OnnxTicketClassifier.from_pretrained(export_dir, quantized=variant == 'onnx-int8',
+                                                    num_threads=num_threads)
+    raise ValueError(f"Unknown variant {variant!r}; expected one of {VARIANTS}")
+
+
+def model_size_mb(variant, model_dir=DEFAULT_MODEL_DIR, export_dir=DEFAULT_EXPORT_DIR):
+    """Size on disk of a variant's weights (tokenizer and config files excluded)"""
+    if variant == 'fp32':
+        files = [os.path.join(model_dir, name) for name in os.listdir(model_dir)
+                 if name.endswith(('.safetensors', '.bin'))]
+    elif variant == 'int8':
+        files = [os.path.join(export_dir, INT8_DIR, INT8_WEIGHTS)]
+    else:
+        onnx_file = ONNX_INT8_FILE if variant == 'onnx-int8' else ONNX_FILE
+        # Large graphs keep their weights in an external .data file next to the graph
+        files = [os.path.join(export_dir, name) for name in os.listdir(export_dir)
+                 if name == onnx_file or name == onnx_file + '.data']
+    return sum(os.path.getsize(f) for f in files) / 1e6
+
+
+def batch_logits(classifier, texts, batch_size=32):
+    """
+    Logits for every text, in order, computed batch_size texts at a time.
+    Texts are batched in order of token length to keep padding low.
+    """
+    input_ids = classifier.encode(texts)
+    order = np.argsort([len(ids) for ids in input_ids], kind='stable')
+    logits = np.concatenate([classifier.logits(classifier.pad([input_ids[i] for i in order[start:start + batch_size]]))
+                             for start in range(0, len(order), batch_size)])
+    return logits[np.argsort(order)]
+
+
+def parity_report(classifiers, texts, labels, compute_metrics, reference='fp32', tolerance=ACCURACY_TOLERANCE):
+    """
+    Score each classifier with compute_metrics on the same texts.
+
+    classifiers maps a variant name to a TicketClassifier. Besides the
+    metrics, each row has the share of predictions that agree with the
+    reference variant, the largest logit difference from it, and 'parity':
+    whether accuracy is within tolerance of the reference's.
+    """
+    texts, labels = list(texts), np.asarray(labels)
+    logits = {name: batch_logits(classifier, texts) for name, classifier in classifiers.items()}
+    reference_logits = logits[reference]
+    rows = []
+    for name, variant_logits in logits.items():
+        row = {'variant': name, **compute_metrics((variant_logits, labels))}
+        row['agreement'] = float(np.mean(variant_logits.argmax(axis=1) == reference_logits.argmax(axis=1)))
+        row['max_logit_diff'] = float(np.abs(variant_logits - reference_logits).max())
+        rows.append(row)
+
+    report = pd.DataFrame(rows).set_index('variant')
+    if 'accuracy' in report:
+        report['parity'] = report['accuracy'] >= report.loc[reference, 'accuracy'] - tolerance
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export INT8 and ONNX variants of the ticket classifier")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--output-dir", default=DEFAULT_EXPORT_DIR)
+    parser.add_argument("--no-onnx", action="store_true", help="only write the INT8 PyTorch model")
+    args = parser.parse_args()
+
+    paths = export_models(args.model_dir, args.output_dir, onnx=not args.no_onnx)
+    for variant, path in paths.items():
+        print(f"{variant:>10}: {model_size_mb(variant, args.model_dir, args.output_dir):7.1f} MB  {path}")
+
+
+if __name__ == "__main__":
+    main()